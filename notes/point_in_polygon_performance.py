@@ -37,6 +37,28 @@ Still not sure why it's faster, but it doeos make sense that the numpy overhead
 
 However, if you had more vertices than points, the Cython way would likely be faster. (untested)
 
+UPDATE: there is now a compiled edge-major version (``points_in_poly_edges``): it loops
+over the edges on the outside, over blocks of 512 points at a time. With the 20 vertex
+polygon, it's about 1.5x faster than the point-major loop for more than about 100 points.
+They are about the same at 200 vertices, and the point-major loop wins for bigger polygons.
+``polygon_inside`` picks the loop order based on those numbers.
+
+UPDATE 2: the edge-major kernel now adds up the signed crossings in a double, rather
+than toggling a char flag, so GCC vectorizes the inner loop (plain SSE2, at -O3). It's
+about 2x faster than it was, and faster than the point-major loop for every polygon
+size tried (4 -- 10,000 vertices) once there are more than about 100 points, so
+``polygon_inside`` now uses it for any polygon with enough points.
+A PreparedPolygon (slab index) is still faster for more than about 32 vertices.
+
+UPDATE 3: for big polygons there is a sweep line version (``points_in_poly_sweep``):
+the points are sorted by y, and only tested against the edges that straddle their y.
+With 1 million random points it beats the edge-major loop at about 128 vertices for
+a smooth (coastline-like) polygon, and at about 500 for a very spiky one, so
+``polygon_inside`` uses it from 512 vertices. It even wins for only 1,000 points
+against a 300,000 vertex coastline (0.045s vs 0.46s point-major), and for 1 million
+points in that coastline, it takes 0.8s -- vs 2.4s with a PreparedPolygon, which can't
+make its slabs fine enough for that many vertices.
+
 NOTE: for a many-vertex polygon, the *right* way to make it fast would be to build some sort of
       spatial index of the polygon, and then use that to do the point in polygon check.
       The question is how may vertices you need to make that worth it. (and how many points)
@@ -5,6 +5,11 @@ functions for 2-d line crossing checks
 # cython: language_level=3
 
 from libc.stdint cimport  int32_t, uint32_t
+from libc.math cimport isfinite, sqrt, floor, INFINITY, NAN
+from libc.stdlib cimport malloc, calloc, realloc, free
+from libc.string cimport memcpy
+
+import cython
 
 import numpy as np
 cimport numpy as cnp
@@ -52,7 +57,7 @@ cimport numpy as cnp
 #     return obj
 
 
-cdef inline double c_cross_product(double x1, double x2, double y1, double y2):
+cdef inline double c_cross_product(double x1, double x2, double y1, double y2) noexcept nogil:
     """
     compute the cross product of two 2-d vectors
 
@@ -78,7 +83,7 @@ def cross_product(double x1, double x2, double y1, double y2):
 
 cpdef double side_of_line(double x1, double y1,
                           double x2, double y2,
-                          double Px, double Py):
+                          double Px, double Py) noexcept nogil:
 
     """
     Given a line segment x1,y1 to x2,y2
@@ -113,7 +118,7 @@ cdef int32_t c_segment_cross(double px1, double py1,
                              double px2, double py2,
                              double px3, double py3,
                              double px4, double py4,
-                             ):
+                             ) noexcept nogil:
     """
     cython version of segment crossing.
 
@@ -169,58 +174,642 @@ def segment_cross(s1, s2):
                                 ))
 
 
-def multi_segment_cross(double[:,:]points, int32_t[:,:] segments):
+def _as_start_end(segs):
+    """
+    the (start, end) float64 arrays of a collection of segments:
+    either an (..., 2, 2) array, or a (start, end) tuple of (..., 2) arrays
+    """
+    if (isinstance(segs, tuple) and len(segs) == 2
+            and isinstance(segs[0], np.ndarray) and isinstance(segs[1], np.ndarray)):
+        start = np.asarray(segs[0], dtype=np.float64)
+        end = np.asarray(segs[1], dtype=np.float64)
+    else:
+        segs = np.asarray(segs, dtype=np.float64)
+        if segs.ndim < 2 or segs.shape[-2] != 2:
+            raise ValueError("segments must be an (..., 2, 2) array, or a (start, end) tuple of arrays")
+        start = segs[..., 0, :]
+        end = segs[..., 1, :]
+    if start.ndim < 1 or start.shape[-1] != 2 or end.ndim < 1 or end.shape[-1] != 2:
+        raise ValueError("segment ends must be (x, y) points")
+    return start, end
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _segments_cross(const double[:, :] a1, const double[:, :] a2,
+                          const double[:, :] b1, const double[:, :] b2,
+                          unsigned char[::1] result) noexcept nogil:
+    cdef Py_ssize_t i
+    for i in range(result.shape[0]):
+        result[i] = c_segment_cross(a1[i, 0], a1[i, 1], a2[i, 0], a2[i, 1],
+                                    b1[i, 0], b1[i, 1], b2[i, 0], b2[i, 1])
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _segments_cross_pairwise(const double[:, :] a1, const double[:, :] a2,
+                                   const double[:, :] b1, const double[:, :] b2,
+                                   unsigned char[:, ::1] result) noexcept nogil:
+    cdef Py_ssize_t i, j
+    for i in range(result.shape[0]):
+        for j in range(result.shape[1]):
+            result[i, j] = c_segment_cross(a1[i, 0], a1[i, 1], a2[i, 0], a2[i, 1],
+                                           b1[j, 0], b1[j, 1], b2[j, 0], b2[j, 1])
+
+
+def segments_cross(a, b, bint pairwise=False):
+    """
+    segment_cross for arrays of segments, all in one compiled loop
+
+    :param a, b: the segments: each an (..., 2, 2) array: ((x1, y1), (x2, y2))
+                 for each segment, or a (start, end) tuple of (..., 2) arrays
+                 of the ends. Either way, a and b are broadcast together, so
+                 one segment can be checked against lots, etc.
+
+    :param pairwise=False: if True, check every segment in a against every
+                           segment in b, instead of one to one.
+
+    :returns: boolean array, True where they cross (or touch) -- the same as
+              segment_cross on each pair. Shape is the broadcast shape of a and b
+              (without the last two dimensions), or (N, M) for pairwise, for
+              N segments in a and M in b.
+    """
+    a_start, a_end = _as_start_end(a)
+    b_start, b_end = _as_start_end(b)
+
+    cdef unsigned char[::1] res
+    cdef unsigned char[:, ::1] res2
+    cdef const double[:, :] a1, a2, b1, b2
+    if pairwise:
+        a1, a2 = np.broadcast_arrays(a_start.reshape(-1, 2), a_end.reshape(-1, 2))
+        b1, b2 = np.broadcast_arrays(b_start.reshape(-1, 2), b_end.reshape(-1, 2))
+        result = np.zeros((a1.shape[0], b1.shape[0]), dtype=np.uint8)
+        res2 = result
+        with nogil:
+            _segments_cross_pairwise(a1, a2, b1, b2, res2)
+        return result.view(np.bool_)
+
+    a_start, a_end, b_start, b_end = np.broadcast_arrays(a_start, a_end, b_start, b_end)
+    shape = a_start.shape[:-1]
+    a1 = a_start.reshape(-1, 2)
+    a2 = a_end.reshape(-1, 2)
+    b1 = b_start.reshape(-1, 2)
+    b2 = b_end.reshape(-1, 2)
+    result = np.zeros((a1.shape[0],), dtype=np.uint8)
+    res = result
+    with nogil:
+        _segments_cross(a1, a2, b1, b2, res)
+    return result.view(np.bool_).reshape(shape)
+
+
+@cython.cdivision(True)
+cdef int _segment_intersection(double ax1, double ay1, double ax2, double ay2,
+                               double bx1, double by1, double bx2, double by2,
+                               double *x, double *y, double *t, double *u) noexcept nogil:
+    """
+    where segment a crosses segment b
+
+    The same test as c_segment_cross, except that collinear segments
+    only cross if they overlap.
+
+    :returns: 0 if they don't cross, 1 if they cross (or touch) at a point,
+              2 if they are collinear and overlap (maybe just at one point).
+              x, y, t, u are set to the crossing point and how far it is along
+              a and b (0 to 1) -- for an overlap, the start of it closest to
+              the start of a. Otherwise they are NaN.
+    """
+    cdef double D1, D2, D3, D4, len_a, len_b, t0, t1, tb1, tb2
+    x[0] = y[0] = t[0] = u[0] = NAN
+
+    D1 = side_of_line(ax1, ay1, ax2, ay2, bx1, by1)
+    D2 = side_of_line(ax1, ay1, ax2, ay2, bx2, by2)
+    if D1 * D2 > 0.0:
+        return 0
+    D3 = side_of_line(bx1, by1, bx2, by2, ax1, ay1)
+    D4 = side_of_line(bx1, by1, bx2, by2, ax2, ay2)
+    if D3 * D4 > 0.0:
+        return 0
+    if D1 != D2 and D3 != D4:
+        t[0] = D3 / (D3 - D4)
+        u[0] = D1 / (D1 - D2)
+        x[0] = ax1 + t[0] * (ax2 - ax1)
+        y[0] = ay1 + t[0] * (ay2 - ay1)
+        return 1
+
+    # collinear (or a zero length segment): they have to overlap
+    len_a = (ax2 - ax1) * (ax2 - ax1) + (ay2 - ay1) * (ay2 - ay1)
+    len_b = (bx2 - bx1) * (bx2 - bx1) + (by2 - by1) * (by2 - by1)
+    if len_a > 0.0:
+        tb1 = ((bx1 - ax1) * (ax2 - ax1) + (by1 - ay1) * (ay2 - ay1)) / len_a
+        tb2 = ((bx2 - ax1) * (ax2 - ax1) + (by2 - ay1) * (ay2 - ay1)) / len_a
+        t0 = max(0.0, min(tb1, tb2))
+        t1 = min(1.0, max(tb1, tb2))
+        if t0 > t1:
+            return 0
+        t[0] = t0
+        x[0] = ax1 + t0 * (ax2 - ax1)
+        y[0] = ay1 + t0 * (ay2 - ay1)
+        u[0] = ((x[0] - bx1) * (bx2 - bx1) + (y[0] - by1) * (by2 - by1)) / len_b if len_b > 0.0 else 0.0
+        return 2
+    if len_b > 0.0:
+        # a is a point on the line through b
+        t0 = ((ax1 - bx1) * (bx2 - bx1) + (ay1 - by1) * (by2 - by1)) / len_b
+        if t0 < 0.0 or t0 > 1.0:
+            return 0
+        u[0] = t0
+    elif ax1 != bx1 or ay1 != by1:
+        return 0
+    else:
+        u[0] = 0.0
+    t[0] = 0.0
+    x[0] = ax1
+    y[0] = ay1
+    return 2
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _segment_intersections(const double[:, :] a1, const double[:, :] a2,
+                                 const double[:, :] b1, const double[:, :] b2,
+                                 bint pairwise,
+                                 unsigned char[::1] result,
+                                 double[:, ::1] points,
+                                 double[::1] t,
+                                 double[::1] u) noexcept nogil:
+    """
+    one to one, or every a against every b, with the results in order
+    """
+    cdef Py_ssize_t i, j, k, na = a1.shape[0], nb = b1.shape[0]
+    if pairwise:
+        k = 0
+        for i in range(na):
+            for j in range(nb):
+                result[k] = _segment_intersection(a1[i, 0], a1[i, 1], a2[i, 0], a2[i, 1],
+                                                  b1[j, 0], b1[j, 1], b2[j, 0], b2[j, 1],
+                                                  &points[k, 0], &points[k, 1], &t[k], &u[k])
+                k += 1
+    else:
+        for i in range(na):
+            result[i] = _segment_intersection(a1[i, 0], a1[i, 1], a2[i, 0], a2[i, 1],
+                                              b1[i, 0], b1[i, 1], b2[i, 0], b2[i, 1],
+                                              &points[i, 0], &points[i, 1], &t[i], &u[i])
+
+
+def segment_intersections(a, b, bint pairwise=False):
+    """
+    Where segments cross: the points, and how far along each segment,
+    all in one compiled loop
+
+    :param a, b: the segments: each an (..., 2, 2) array: ((x1, y1), (x2, y2))
+                 for each segment, or a (start, end) tuple of (..., 2) arrays
+                 of the ends. Either way, a and b are broadcast together, so
+                 one segment can be checked against lots, etc.
+
+    :param pairwise=False: if True, check every segment in a against every
+                           segment in b, instead of one to one.
+
+    :returns: crosses, points, t, u, collinear:
+
+              crosses: boolean array, True where they cross (or touch). The same
+              as segments_cross, except that collinear segments only cross if
+              they overlap.
+
+              points: (..., 2) array of where they cross.
+
+              t, u: how far along a and b the point is: 0 at the start, 1 at the end.
+              (i.e. ``points == a_start + t * (a_end - a_start)``)
+
+              collinear: boolean array, True where the segments are on the same
+              line and overlap. points, t and u are then the start of the overlap
+              closest to the start of a.
+
+              points, t and u are NaN where they don't cross. The shape is the
+              broadcast shape of a and b (without the last two dimensions),
+              or (N, M) for pairwise, for N segments in a and M in b.
+    """
+    a_start, a_end = _as_start_end(a)
+    b_start, b_end = _as_start_end(b)
+
+    cdef const double[:, :] a1, a2, b1, b2
+    if pairwise:
+        a1, a2 = np.broadcast_arrays(a_start.reshape(-1, 2), a_end.reshape(-1, 2))
+        b1, b2 = np.broadcast_arrays(b_start.reshape(-1, 2), b_end.reshape(-1, 2))
+        shape = (a1.shape[0], b1.shape[0])
+    else:
+        a_start, a_end, b_start, b_end = np.broadcast_arrays(a_start, a_end, b_start, b_end)
+        shape = a_start.shape[:-1]
+        a1 = a_start.reshape(-1, 2)
+        a2 = a_end.reshape(-1, 2)
+        b1 = b_start.reshape(-1, 2)
+        b2 = b_end.reshape(-1, 2)
+    n = int(np.prod(shape))
+
+    result = np.empty((n,), dtype=np.uint8)
+    points = np.empty((n, 2), dtype=np.float64)
+    t = np.empty((n,), dtype=np.float64)
+    u = np.empty((n,), dtype=np.float64)
+    cdef unsigned char[::1] res = result
+    cdef double[:, ::1] pts = points
+    cdef double[::1] a_t = t
+    cdef double[::1] a_u = u
+    with nogil:
+        _segment_intersections(a1, a2, b1, b2, pairwise, res, pts, a_t, a_u)
+
+    result = result.reshape(shape)
+    return (result > 0, points.reshape(shape + (2,)),
+            t.reshape(shape), u.reshape(shape), result == 2)
+
+
+cdef inline Py_ssize_t _grid_index(double v, double v0, double cell, Py_ssize_t n) noexcept nogil:
+    """
+    which grid cell v is in, along one axis
+    """
+    cdef double i = (v - v0) / cell
+    # clamped before the cast: it may be huge, or infinite
+    return 0 if not i > 0.0 else (n - 1 if i >= n else <Py_ssize_t>i)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef Py_ssize_t _multi_segment_cross(const double[:, :] points,
+                                     const int32_t[:, :] segments,
+                                     int32_t **crosses) noexcept nogil:
+    """
+    find the crossing segments, checking only pairs that share a grid cell
+
+    The grid cells are about the size of the average segment, and each segment
+    is put in all the cells its bounding box covers. A pair that shares more
+    than one cell is only checked in the cell with the lower left corner of
+    the overlap of their bounding boxes.
+
+    :returns: the number of crossings, with the pairs in crosses[0]
+              (to be freed), or -1 if out of memory
+    """
+    cdef Py_ssize_t num_lines = segments.shape[0], ncells, nx, ny, nfound = 0, size = 0
+    cdef Py_ssize_t i, a, b, c, ix, iy, cx, cy
+    cdef int32_t s, t
+    cdef int32_t *found = NULL
+    cdef int32_t *new_found
+    cdef double *bbox
+    cdef double x0 = INFINITY, y0 = INFINITY, x1 = -INFINITY, y1 = -INFINITY
+    cdef double cell = 0.0, max_cells
+    cdef Py_ssize_t *cell_starts
+    cdef int32_t *cell_segs
+    cdef Py_ssize_t *cells  # the cells each segment covers: ix0, iy0, ix1, iy1
+
+    crosses[0] = NULL
+    bbox = <double *>malloc(4 * num_lines * sizeof(double))
+    cells = <Py_ssize_t *>malloc(4 * num_lines * sizeof(Py_ssize_t))
+    if bbox == NULL or cells == NULL:
+        free(bbox)
+        free(cells)
+        return -1
+
+    # the bounding boxes, and the grid cell size: the average size of a segment
+    for i in range(num_lines):
+        bbox[4 * i] = min(points[segments[i, 0], 0], points[segments[i, 1], 0])
+        bbox[4 * i + 1] = min(points[segments[i, 0], 1], points[segments[i, 1], 1])
+        bbox[4 * i + 2] = max(points[segments[i, 0], 0], points[segments[i, 1], 0])
+        bbox[4 * i + 3] = max(points[segments[i, 0], 1], points[segments[i, 1], 1])
+        if not (isfinite(bbox[4 * i]) and isfinite(bbox[4 * i + 1])
+                and isfinite(bbox[4 * i + 2]) and isfinite(bbox[4 * i + 3])):
+            # these never cross anything
+            bbox[4 * i] = NAN
+            continue
+        x0 = min(x0, bbox[4 * i])
+        y0 = min(y0, bbox[4 * i + 1])
+        x1 = max(x1, bbox[4 * i + 2])
+        y1 = max(y1, bbox[4 * i + 3])
+        cell += max(bbox[4 * i + 2] - bbox[4 * i], bbox[4 * i + 3] - bbox[4 * i + 1])
+    if x1 < x0:
+        # nothing to check
+        free(bbox)
+        free(cells)
+        return 0
+    cell /= num_lines
+    if cell == 0.0:
+        cell = 1.0
+    # but not so many cells there's more of them than segments -- worked out
+    # in doubles, as the extent can be a huge number of cells, or infinite
+    max_cells = 4.0 * num_lines + 16.0
+    cell = max(cell, (x1 - x0) / max_cells, (y1 - y0) / max_cells)
+    if isfinite(cell):
+        cell = max(cell, sqrt(x1 - x0) * sqrt((y1 - y0) / max_cells))
+        while (floor((x1 - x0) / cell) + 1.0) * (floor((y1 - y0) / cell) + 1.0) > max_cells:
+            cell *= 2.0
+    if isfinite(cell):
+        nx = <Py_ssize_t>((x1 - x0) / cell) + 1
+        ny = <Py_ssize_t>((y1 - y0) / cell) + 1
+    else:
+        nx = ny = 1
+    ncells = nx * ny
+
+    # the segments in each cell
+    cell_starts = <Py_ssize_t *>calloc(ncells + 1, sizeof(Py_ssize_t))
+    if cell_starts == NULL:
+        free(bbox)
+        free(cells)
+        return -1
+    for i in range(num_lines):
+        if bbox[4 * i] != bbox[4 * i]:
+            continue
+        cells[4 * i] = _grid_index(bbox[4 * i], x0, cell, nx)
+        cells[4 * i + 1] = _grid_index(bbox[4 * i + 1], y0, cell, ny)
+        cells[4 * i + 2] = _grid_index(bbox[4 * i + 2], x0, cell, nx)
+        cells[4 * i + 3] = _grid_index(bbox[4 * i + 3], y0, cell, ny)
+        for iy in range(cells[4 * i + 1], cells[4 * i + 3] + 1):
+            for ix in range(cells[4 * i], cells[4 * i + 2] + 1):
+                cell_starts[iy * nx + ix + 1] += 1
+    for c in range(ncells):
+        cell_starts[c + 1] += cell_starts[c]
+    cell_segs = <int32_t *>malloc(cell_starts[ncells] * sizeof(int32_t) + 1)
+    if cell_segs == NULL:
+        free(bbox)
+        free(cells)
+        free(cell_starts)
+        return -1
+    # going through the segments in order, so each cell is sorted
+    for i in range(num_lines):
+        if bbox[4 * i] != bbox[4 * i]:
+            continue
+        for iy in range(cells[4 * i + 1], cells[4 * i + 3] + 1):
+            for ix in range(cells[4 * i], cells[4 * i + 2] + 1):
+                cell_segs[cell_starts[iy * nx + ix]] = <int32_t>i
+                cell_starts[iy * nx + ix] += 1
+    for c in range(ncells, 0, -1):
+        cell_starts[c] = cell_starts[c - 1]
+    cell_starts[0] = 0
+
+    for c in range(ncells):
+        cx = c % nx
+        cy = c // nx
+        for a in range(cell_starts[c], cell_starts[c + 1]):
+            s = cell_segs[a]
+            for b in range(a + 1, cell_starts[c + 1]):
+                t = cell_segs[b]
+                # bounding boxes have to overlap
+                if (bbox[4 * t] > bbox[4 * s + 2] or bbox[4 * s] > bbox[4 * t + 2]
+                        or bbox[4 * t + 1] > bbox[4 * s + 3] or bbox[4 * s + 1] > bbox[4 * t + 3]):
+                    continue
+                # only check each pair in one cell
+                if (max(cells[4 * s], cells[4 * t]) != cx
+                        or max(cells[4 * s + 1], cells[4 * t + 1]) != cy):
+                    continue
+                if ((segments[s, 0] == segments[t, 0] and segments[s, 1] == segments[t, 1])
+                        or (segments[s, 0] == segments[t, 1] and segments[s, 1] == segments[t, 0])):
+                    pass  # the same two points: they cross
+                elif (segments[s, 0] == segments[t, 0] or segments[s, 0] == segments[t, 1]
+                        or segments[s, 1] == segments[t, 0] or segments[s, 1] == segments[t, 1]):
+                    continue  # share one point
+                elif not c_segment_cross(points[segments[s, 0], 0], points[segments[s, 0], 1],
+                                         points[segments[s, 1], 0], points[segments[s, 1], 1],
+                                         points[segments[t, 0], 0], points[segments[t, 0], 1],
+                                         points[segments[t, 1], 0], points[segments[t, 1], 1]):
+                    continue
+                if nfound == size:
+                    size = 2 * size + 64
+                    new_found = <int32_t *>realloc(found, 2 * size * sizeof(int32_t))
+                    if new_found == NULL:
+                        nfound = -1
+                        break
+                    found = new_found
+                found[2 * nfound] = s
+                found[2 * nfound + 1] = t
+                nfound += 1
+            if nfound < 0:
+                break
+        if nfound < 0:
+            break
+
+    free(bbox)
+    free(cells)
+    free(cell_starts)
+    free(cell_segs)
+    if nfound < 0:
+        free(found)
+        return -1
+    crosses[0] = found
+    return nfound
+
+
+def multi_segment_cross(const double[:, :] points, const int32_t[:, :] segments):
     """
     does a line-segment cross check on a set of segments
-    
+
     line segments are defined by indexing into an array of points
-    
+
+    Segments that share both points cross; segments that share one point don't.
+
+    Only the pairs of segments in the same cells of a grid (about the size of
+    the segments) are checked, so it's about O(N), rather than O(N^2), for
+    segments that are spread out.
+
     NOTE: pure python version took about 1 minute to run with 1000 segments on my machine.
-          this version took 1.5 seconds
+          the all pairs cython version took 1.5 seconds,
+          this one takes about 0.15 seconds for a 500,000 segment coastline.
+          (but lots of long segments all over each other is still slow)
+
+    :param points: the points
+    :type points: Nx2 array of floats
+
+    :param segments: the indexes into points of the ends of each segment
+    :type segments: Mx2 array of int32
+
+    :returns: Kx2 int32 array of the indexes of the segments that cross,
+              each pair in order, and sorted. Segments with a NaN or inf end
+              don't cross anything.
     """
-    cdef double s1x1, s1y1, s1x2, s1y2, s2x1, s2y1, s2x2, s2y2
-    cdef uint32_t i, j, num_lines
-    cdef int32_t p11, p12, p21, p22
-    num_lines = segments.shape[0]
-    crosses = []
-    for i in range(num_lines):
-        s1x1 = points[segments[i,0]][0]
-        s1y1 = points[segments[i,0]][1]
-        s1x2 = points[segments[i,1]][0]
-        s1y2 = points[segments[i,1]][1]
-        p11 = segments[i,0]
-        p12 = segments[i,1]
-        for j in range(i+1, num_lines):
-            p21 = segments[j,0]
-            p22 = segments[j,1]
-            # check if the segments match
-            #print "segment 1:",p11, p12
-            #print "segment 2:",p21, p22
-            if (p11 == p21 and p12 == p22) or (p11 == p22 and p12 == p21): # they are the same two points:
-                #print "segments are the same"
-                crosses.append( (<int32_t> i, <int32_t> j) )
-                break # no need to check further
-            elif p11 == p21:
-                #print "first point matches first point"
-                break                    
-            elif p11 == p22:
-                #print "first point matches second point"
-                break                    
-            elif p12 == p21:
-                #print "second point matches first point"
-                break                    
-            elif p12 == p22:
-                #print "second point matches second point"
-                break                    
-            s2x1 = points[p21][0]
-            s2y1 = points[p21][1]
-            s2x2 = points[p22][0]
-            s2y2 = points[p22][1]
-            if c_segment_cross( s1x1,  s1y1,
-                                s1x2,  s1y2,
-                                s2x1,  s2y1,
-                                s2x2,  s2y2,
-                               ):
-                crosses.append( (<int32_t> i, <int32_t> j) )
-    return crosses
+    cdef int32_t *crosses
+    cdef Py_ssize_t nfound
+    cdef int32_t[:, ::1] res
+
+    if segments.shape[0] > 0 and (np.min(segments) < 0 or np.max(segments) >= points.shape[0]):
+        raise IndexError("segments has indexes past the end of points")
+    with nogil:
+        nfound = _multi_segment_cross(points, segments, &crosses)
+    if nfound < 0:
+        raise MemoryError()
+    try:
+        result = np.empty((nfound, 2), dtype=np.int32)
+        res = result
+        if nfound > 0:
+            memcpy(&res[0, 0], crosses, 2 * nfound * sizeof(int32_t))
+    finally:
+        free(crosses)
+    return result[np.lexsort((result[:, 1], result[:, 0]))]
+
+
+@cython.cdivision(True)
+cdef inline double _distance2_to_segment(double px, double py,
+                                         double x1, double y1, double x2, double y2,
+                                         double *frac) noexcept nogil:
+    """
+    squared distance from P to the closest point on the segment,
+    which is frac of the way along it
+    """
+    cdef double dx = x2 - x1, dy = y2 - y1, length2, f
+    length2 = dx * dx + dy * dy
+    f = ((px - x1) * dx + (py - y1) * dy) / length2 if length2 > 0.0 else 0.0
+    f = 0.0 if f < 0.0 else (1.0 if f > 1.0 else f)
+    frac[0] = f
+    dx = px - (x1 + f * dx)
+    dy = py - (y1 + f * dy)
+    return dx * dx + dy * dy
 
+
+cdef inline double _distance2_to_box(double px, double py, const double *box) noexcept nogil:
+    """
+    squared distance from P to the box: xmin, ymin, xmax, ymax
+    """
+    cdef double dx = max(box[0] - px, 0.0, px - box[2])
+    cdef double dy = max(box[1] - py, 0.0, py - box[3])
+    return dx * dx + dy * dy
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _side_of_polyline(const double[:, :] points,
+                           const double[:, :] line,
+                           double[::1] result) noexcept nogil:
+    """
+    signed distance from each point to the polyline: positive to the left
+
+    The index is a binary tree of the bounding boxes of runs of consecutive
+    segments -- node n has children 2n and 2n + 1, and segment s is leaf
+    size + s -- which, for a polyline, are close together. Runs that are
+    further away than the closest segment so far are skipped.
+
+    :returns: 0, or -1 if out of memory
+    """
+    cdef Py_ssize_t nseg = line.shape[0] - 1, npoints = points.shape[0]
+    cdef Py_ssize_t size = 1, i, n, s, best, nstack
+    cdef Py_ssize_t stack[130]
+    cdef double px, py, d2, dl, dr, frac, best2, best_frac, side, s1, s2, turn
+    cdef double *boxes
+
+    while size < nseg:
+        size *= 2
+    boxes = <double *>malloc(8 * size * sizeof(double))
+    if boxes == NULL:
+        return -1
+    for n in range(size, 2 * size):
+        s = n - size
+        if s < nseg:
+            boxes[4 * n] = min(line[s, 0], line[s + 1, 0])
+            boxes[4 * n + 1] = min(line[s, 1], line[s + 1, 1])
+            boxes[4 * n + 2] = max(line[s, 0], line[s + 1, 0])
+            boxes[4 * n + 3] = max(line[s, 1], line[s + 1, 1])
+        else:
+            boxes[4 * n] = boxes[4 * n + 1] = INFINITY
+            boxes[4 * n + 2] = boxes[4 * n + 3] = -INFINITY
+    for n in range(size - 1, 0, -1):
+        boxes[4 * n] = min(boxes[8 * n], boxes[8 * n + 4])
+        boxes[4 * n + 1] = min(boxes[8 * n + 1], boxes[8 * n + 5])
+        boxes[4 * n + 2] = max(boxes[8 * n + 2], boxes[8 * n + 6])
+        boxes[4 * n + 3] = max(boxes[8 * n + 3], boxes[8 * n + 7])
+
+    for i in range(npoints):
+        px = points[i, 0]
+        py = points[i, 1]
+        if not (isfinite(px) and isfinite(py)):
+            result[i] = NAN
+            continue
+        best = -1
+        best2 = INFINITY
+        best_frac = 0.0
+        stack[0] = 1
+        nstack = 1
+        while nstack > 0:
+            nstack -= 1
+            n = stack[nstack]
+            if _distance2_to_box(px, py, boxes + 4 * n) >= best2:
+                continue
+            if n >= size:
+                s = n - size
+                d2 = _distance2_to_segment(px, py, line[s, 0], line[s, 1],
+                                           line[s + 1, 0], line[s + 1, 1], &frac)
+                if d2 < best2:
+                    best2 = d2
+                    best = s
+                    best_frac = frac
+                continue
+            # the closer child goes on top, to be looked at first
+            dl = _distance2_to_box(px, py, boxes + 8 * n)
+            dr = _distance2_to_box(px, py, boxes + 8 * n + 4)
+            if dl <= dr:
+                stack[nstack] = 2 * n + 1
+                stack[nstack + 1] = 2 * n
+            else:
+                stack[nstack] = 2 * n
+                stack[nstack + 1] = 2 * n + 1
+            nstack += 2
+
+        s = best
+        if best_frac == 0.0 and s > 0:
+            s -= 1
+        if (best_frac == 0.0 and s != best) or (best_frac == 1.0 and s < nseg - 1):
+            # closest to the vertex between s and s + 1: it's left of the
+            # polyline if it's left of both, for a left turn, or either, for a right.
+            s1 = side_of_line(line[s, 0], line[s, 1], line[s + 1, 0], line[s + 1, 1], px, py)
+            s2 = side_of_line(line[s + 1, 0], line[s + 1, 1], line[s + 2, 0], line[s + 2, 1], px, py)
+            turn = c_cross_product(line[s + 1, 0] - line[s, 0], line[s + 2, 0] - line[s + 1, 0],
+                                   line[s + 1, 1] - line[s, 1], line[s + 2, 1] - line[s + 1, 1])
+            side = min(s1, s2) if turn >= 0.0 else max(s1, s2)
+        else:
+            side = side_of_line(line[s, 0], line[s, 1], line[s + 1, 0], line[s + 1, 1], px, py)
+        result[i] = -sqrt(best2) if side < 0.0 else sqrt(best2)
+
+    free(boxes)
+    return 0
+
+
+def side_of_polyline(points, polyline, bint distance=False):
+    """
+    Which side of a polyline each point is on: side_of_line, for the
+    closest segment of the polyline.
+
+    The segments are indexed by a tree of bounding boxes, so each point
+    only checks the ones nearby -- about O(log(M)) per point, for M segments.
+
+    :param points: the points
+    :type points: (..., 2) array of floats
+
+    :param polyline: the vertices of the polyline
+    :type polyline: Mx2 array of floats
+
+    :param distance=False: if True, return the signed distance to the
+                           polyline, instead of which side.
+
+    :returns: int8 array of 1 for left, -1 for right and 0 for on the polyline,
+              looking from the start to the end. Or, with distance=True, the
+              distance to the polyline, negative for points on the right.
+
+              Past the ends, it's the side of the line through the end segment
+              (exactly in line with it counts as left). NaN points are 0, or
+              a NaN distance.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim < 1 or points.shape[-1] != 2:
+        raise ValueError("points must be an (..., 2) array")
+    line = np.asarray(polyline, dtype=np.float64).reshape(-1, 2)
+    # repeated vertices make zero length segments
+    if len(line) > 1:
+        line = line[np.r_[True, np.any(line[1:] != line[:-1], axis=1)]]
+    if len(line) < 2 or not np.isfinite(line).all():
+        raise ValueError("polyline must have at least two different (finite) vertices")
+
+    shape = points.shape[:-1]
+    cdef const double[:, :] pts = points.reshape(-1, 2)
+    cdef const double[:, :] verts = line
+    dist = np.empty((pts.shape[0],), dtype=np.float64)
+    cdef double[::1] res = dist
+    cdef int err
+    with nogil:
+        err = _side_of_polyline(pts, verts, res)
+    if err < 0:
+        raise MemoryError()
+    dist = dist.reshape(shape)
+    if distance:
+        return dist
+    return (dist > 0).astype(np.int8) - (dist < 0)
@@ -1,4 +1,5 @@
 
+# cython: freethreading_compatible=True
 """
 Cython code to call C point in poly routine
 
@@ -11,12 +12,100 @@ And a polygon_area function
 # cython: language_level=3
 
 import cython
+from cython cimport floating
+from cython.parallel cimport prange
+from libc.float cimport DBL_EPSILON
+from libc.math cimport ceil, isfinite, isnan, sqrt, NAN
+from libc.stdlib cimport qsort, malloc, realloc, free
+from libc.string cimport memset, memcpy
 # import both numpy and the Cython declarations for numpy
 import numpy as np
 cimport numpy as cnp
 
 # declare the interface to the C code
-cdef extern char c_point_in_poly1(size_t nvert, double *vertices, double *point)
+cdef extern char c_point_in_poly1(size_t nvert, double *vertices, double *point) nogil
+cdef extern int c_point_winding(int nvert, double *vertices, double *point) nogil
+cdef extern void c_points_in_poly_edges(int nvert, double *vertices,
+                                        int npoints, double *x, double *y,
+                                        char *result) nogil
+
+# number of points handled at a time by the edge-major loop
+# -- small enough that the block stays in L1 cache
+cdef enum:
+    EDGE_BLOCK = 512
+
+# fast reject / accept rectangles that check nothing: the whole plane, and empty
+_NO_RECTS = np.array([-np.inf, -np.inf, np.inf, np.inf,
+                      np.inf, np.inf, -np.inf, -np.inf])
+
+
+cdef int _num_threads(n_threads) except -1:
+    """
+    check the n_threads argument -- None means single threaded
+    """
+    if n_threads is None:
+        return 1
+    if n_threads < 1:
+        raise ValueError("n_threads must be a positive integer (or None)")
+    return n_threads
+
+
+def _as_float_array(arr):
+    """
+    float32 and float64 arrays are passed through as is, anything else
+    is converted to float64
+    """
+    arr = np.asarray(arr)
+    if arr.dtype != np.float64 and arr.dtype != np.float32:
+        arr = arr.astype(np.float64)
+    return arr
+
+
+def _as_xy(points, x, y):
+    """
+    Get the x and y coordinates of the points as 1-D arrays
+
+    Either points (Nx2) or x and y (N) should be passed in.
+
+    float32 and float64 arrays are not copied, whatever their strides, so
+    points can be, e.g. a slice of a bigger array, or x and y can be fields of
+    a structured array, or columns of a memory-mapped file.
+
+    :returns: x, y, scalar -- scalar is True if a single point was passed in
+    """
+    if points is not None:
+        if x is not None or y is not None:
+            raise ValueError("pass in either points or x and y, not both")
+        points = _as_float_array(points)
+        scalar = (points.shape == (2,))
+        points = points.reshape(-1, 2)
+        x = points[:, 0]
+        y = points[:, 1]
+    else:
+        if x is None or y is None:
+            raise ValueError("points, or both x and y, must be passed in")
+        x = _as_float_array(x)
+        y = _as_float_array(y)
+        if x.shape != y.shape:
+            raise ValueError("x and y must be the same shape")
+        scalar = (x.ndim == 0)
+        x = x.reshape(-1)
+        y = y.reshape(-1)
+        if x.dtype != y.dtype:
+            x = x.astype(np.float64)
+            y = y.astype(np.float64)
+    return x, y, scalar
+
+
+cdef inline char _point_in_poly(size_t nvert, double *verts,
+                                double px, double py) noexcept nogil:
+    """
+    c_point_in_poly1, for a point passed in as x and y
+    """
+    cdef double[2] point
+    point[0] = px
+    point[1] = py
+    return c_point_in_poly1(nvert, verts, point)
 
 
 @cython.boundscheck(False)
@@ -54,7 +143,25 @@ def point_in_poly(cnp.ndarray[double, ndim=2, mode="c"] poly not None,
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def points_in_poly(cnp.ndarray[double, ndim=2, mode="c"] pgon, points):
+cdef void _points_in_poly_loop(size_t nvert, double *verts,
+                               const floating[:] x,
+                               const floating[:] y,
+                               char[::1] result,
+                               int num_threads) noexcept:
+    cdef Py_ssize_t i
+    with nogil:
+        if num_threads > 1:
+            for i in prange(x.shape[0], num_threads=num_threads, schedule="static"):
+                result[i] = _point_in_poly(nvert, verts, x[i], y[i])
+        else:
+            for i in range(x.shape[0]):
+                result[i] = _point_in_poly(nvert, verts, x[i], y[i])
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def points_in_poly(cnp.ndarray[double, ndim=2, mode="c"] pgon, points=None,
+                   n_threads=None, x=None, y=None):
     """
     compute whether the points given are in the polygon defined in pgon.
 
@@ -64,38 +171,308 @@ def points_in_poly(cnp.ndarray[double, ndim=2, mode="c"] pgon, points):
     :param points: the points to test
     :type points: NX3 numpy array of (x, y, z) floats
 
+    :param n_threads=None: number of threads to split the points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :param x, y: the points to test can be passed in as separate x and y
+                 arrays instead. (float32 or float64 arrays are not copied)
+
     :returns: a boolean array the same length as points
               if the input is a single point, the result is a
               scalar python boolean
     """
+    x, y, scalar = _as_xy(points, x, y)
+
+    ## fixme -- proper way to get np.bool?
+    cdef cnp.ndarray[char, ndim=1, mode="c"] result = np.zeros((x.shape[0],), dtype=np.uint8)
 
-    np_points = np.ascontiguousarray(points, dtype=np.float64)
-    scalar = (np_points.shape == (2,))
-    np_points.shape = (-1, 2)
+    cdef size_t nvert = pgon.shape[0]
+    cdef double *verts = &pgon[0, 0]
+    cdef int num_threads = _num_threads(n_threads)
 
-    cdef double [:, :] a_points
-    a_points = np_points
+    if x.dtype == np.float32:
+        _points_in_poly_loop[float](nvert, verts, x, y, result, num_threads)
+    else:
+        _points_in_poly_loop[double](nvert, verts, x, y, result, num_threads)
 
-    ## fixme -- proper way to get np.bool?
-    cdef cnp.ndarray[char, ndim=1, mode="c"] result = np.zeros((a_points.shape[0],), dtype=np.uint8)
+    if scalar:
+        return bool(result[0])  # to make it a regular python bool
+    else:
+        return result.view(dtype=np.bool_)  # make it a np.bool array
 
-    cdef unsigned int i, nvert, npoints
 
-    nvert = pgon.shape[0]
-    npoints = a_points.shape[0]
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _points_in_poly_edge_block(int nvert, double *verts,
+                                     const floating[:] px,
+                                     const floating[:] py,
+                                     Py_ssize_t start,
+                                     char *result) noexcept nogil:
+    """
+    run the edge-major kernel on the block of points starting at start,
+    putting the results for the block in result
+    """
+    cdef double[EDGE_BLOCK] x
+    cdef double[EDGE_BLOCK] y
+    cdef Py_ssize_t i, nblock
+
+    nblock = min(EDGE_BLOCK, px.shape[0] - start)
+    for i in range(nblock):
+        x[i] = px[start + i]
+        y[i] = py[start + i]
+    c_points_in_poly_edges(nvert, verts, nblock, x, y, result)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _points_in_poly_edges_loop(int nvert, double *verts,
+                                     const floating[:] x,
+                                     const floating[:] y,
+                                     char[::1] result,
+                                     int num_threads) noexcept:
+    cdef Py_ssize_t b, nblocks
+    nblocks = (x.shape[0] + EDGE_BLOCK - 1) // EDGE_BLOCK
+    with nogil:
+        if num_threads > 1:
+            for b in prange(nblocks, num_threads=num_threads, schedule="static"):
+                _points_in_poly_edge_block(nvert, verts, x, y, b * EDGE_BLOCK,
+                                           &result[0] + b * EDGE_BLOCK)
+        else:
+            for b in range(nblocks):
+                _points_in_poly_edge_block(nvert, verts, x, y, b * EDGE_BLOCK,
+                                           &result[0] + b * EDGE_BLOCK)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def points_in_poly_edges(cnp.ndarray[double, ndim=2, mode="c"] pgon, points=None,
+                         n_threads=None, x=None, y=None):
+    """
+    compute whether the points given are in the polygon defined in pgon.
+
+    Same as ``points_in_poly``, but with the loops the other way around:
+    each edge is tested against a block of points at a time, in a loop
+    the compiler can vectorize. This is faster for lots of points.
+
+    :param pgon: the vertices of the polygon
+    :type pgon: NX2 numpy array of floats
+
+    :param points: the points to test
+    :type points: NX2 numpy array of (x, y) floats
+
+    :param n_threads=None: number of threads to split the points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :param x, y: the points to test can be passed in as separate x and y
+                 arrays instead. (float32 or float64 arrays are not copied)
+
+    :returns: a boolean array the same length as points
+              if the input is a single point, the result is a
+              scalar python boolean
+    """
+    x, y, scalar = _as_xy(points, x, y)
+
+    cdef cnp.ndarray[char, ndim=1, mode="c"] result = np.zeros((x.shape[0],), dtype=np.uint8)
 
-    for i in range(npoints):
-        result[i] = c_point_in_poly1(nvert, &pgon[0, 0], &a_points[i, 0])
+    cdef int nvert = pgon.shape[0]
+    cdef double *verts = &pgon[0, 0]
+    cdef int num_threads = _num_threads(n_threads)
+
+    if x.dtype == np.float32:
+        _points_in_poly_edges_loop[float](nvert, verts, x, y, result, num_threads)
+    else:
+        _points_in_poly_edges_loop[double](nvert, verts, x, y, result, num_threads)
 
     if scalar:
         return bool(result[0])  # to make it a regular python bool
     else:
         return result.view(dtype=np.bool_)  # make it a np.bool array
 
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t _inside_indices_range(int nvert, double *verts,
+                                      const floating[:] x,
+                                      const floating[:] y,
+                                      Py_ssize_t start,
+                                      Py_ssize_t stop,
+                                      Py_ssize_t **indices) noexcept nogil:
+    """
+    find the points in [start, stop) that are in the polygon, a block at a time
+
+    If indices is not NULL, a malloc-ed array of their indexes is put in it
+    (to be freed by the caller).
+
+    :returns: the number of points inside, or -1 if out of memory
+    """
+    cdef char[EDGE_BLOCK] inside
+    cdef Py_ssize_t b, i, nblock, count = 0, size = 0
+    cdef Py_ssize_t *buf = NULL
+    cdef Py_ssize_t *new_buf
+
+    b = start
+    while b < stop:
+        nblock = min(EDGE_BLOCK, stop - b)
+        # (the block may run past stop: those results are ignored)
+        _points_in_poly_edge_block(nvert, verts, x, y, b, inside)
+        for i in range(nblock):
+            if inside[i]:
+                if indices != NULL:
+                    if count == size:
+                        size = 2 * size + EDGE_BLOCK
+                        new_buf = <Py_ssize_t *>realloc(buf, size * sizeof(Py_ssize_t))
+                        if new_buf == NULL:
+                            free(buf)
+                            return -1
+                        buf = new_buf
+                    buf[count] = b + i
+                count += 1
+        b += nblock
+    if indices != NULL:
+        indices[0] = buf
+    return count
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t _inside_indices_loop(int nvert, double *verts,
+                                     const floating[:] x,
+                                     const floating[:] y,
+                                     Py_ssize_t[::1] counts,
+                                     Py_ssize_t **indices,
+                                     int num_threads) noexcept:
+    """
+    split the points into len(counts) ranges, and find the ones inside each
+
+    :returns: the total number of points inside, or -1 if out of memory
+    """
+    cdef Py_ssize_t r, nranges, npoints, total = 0
+    nranges = counts.shape[0]
+    npoints = x.shape[0]
+    with nogil:
+        if num_threads > 1:
+            for r in prange(nranges, num_threads=num_threads, schedule="static"):
+                counts[r] = _inside_indices_range(nvert, verts, x, y,
+                                                  npoints * r // nranges,
+                                                  npoints * (r + 1) // nranges,
+                                                  (indices + r) if indices != NULL else NULL)
+        else:
+            for r in range(nranges):
+                counts[r] = _inside_indices_range(nvert, verts, x, y,
+                                                  npoints * r // nranges,
+                                                  npoints * (r + 1) // nranges,
+                                                  (indices + r) if indices != NULL else NULL)
+        for r in range(nranges):
+            if counts[r] < 0:
+                return -1
+            total += counts[r]
+    return total
+
+
+def _inside_indices(cnp.ndarray[double, ndim=2, mode="c"] pgon, points, n_threads,
+                    x, y, bint want_indices):
+    x, y, scalar = _as_xy(points, x, y)
+
+    cdef int nvert = pgon.shape[0]
+    cdef double *verts = &pgon[0, 0]
+    cdef int num_threads = _num_threads(n_threads)
+    cdef Py_ssize_t r, start, total
+    cdef Py_ssize_t[::1] counts = np.zeros((num_threads,), dtype=np.intp)
+    cdef Py_ssize_t **indices = NULL
+    cdef Py_ssize_t[::1] res
+
+    if want_indices:
+        indices = <Py_ssize_t **>malloc(num_threads * sizeof(Py_ssize_t *))
+        if indices == NULL:
+            raise MemoryError()
+        for r in range(num_threads):
+            indices[r] = NULL
+    try:
+        if x.dtype == np.float32:
+            total = _inside_indices_loop[float](nvert, verts, x, y, counts, indices, num_threads)
+        else:
+            total = _inside_indices_loop[double](nvert, verts, x, y, counts, indices, num_threads)
+        if total < 0:
+            raise MemoryError()
+        if not want_indices:
+            return total
+
+        # stitch the ranges together
+        result = np.empty((total,), dtype=np.intp)
+        res = result
+        start = 0
+        for r in range(num_threads):
+            if counts[r] > 0:
+                memcpy(&res[start], indices[r], counts[r] * sizeof(Py_ssize_t))
+                start += counts[r]
+        return result
+    finally:
+        if indices != NULL:
+            for r in range(num_threads):
+                free(indices[r])
+            free(indices)
+
+
+def points_in_poly_indices(cnp.ndarray[double, ndim=2, mode="c"] pgon, points=None,
+                           n_threads=None, x=None, y=None):
+    """
+    find the indexes of the points that are in the polygon defined in pgon.
+
+    Same as ``np.flatnonzero(points_in_poly(pgon, points))``, but done in one
+    pass, without making a boolean array the size of points.
+
+    :param pgon: the vertices of the polygon
+    :type pgon: NX2 numpy array of floats
+
+    :param points: the points to test
+    :type points: NX2 numpy array of (x, y) floats
+
+    :param n_threads=None: number of threads to split the points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :param x, y: the points to test can be passed in as separate x and y
+                 arrays instead. (float32 or float64 arrays are not copied)
+
+    :returns: an integer (intp) array of the indexes of the points inside,
+              in increasing order.
+    """
+    return _inside_indices(pgon, points, n_threads, x, y, True)
+
+
+def points_in_poly_count(cnp.ndarray[double, ndim=2, mode="c"] pgon, points=None,
+                         n_threads=None, x=None, y=None):
+    """
+    count the points that are in the polygon defined in pgon.
+
+    Same as ``points_in_poly(pgon, points).sum()``, but done in one
+    pass, without making a boolean array the size of points.
+
+    :param pgon: the vertices of the polygon
+    :type pgon: NX2 numpy array of floats
+
+    :param points: the points to test
+    :type points: NX2 numpy array of (x, y) floats
+
+    :param n_threads=None: number of threads to split the points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :param x, y: the points to test can be passed in as separate x and y
+                 arrays instead. (float32 or float64 arrays are not copied)
+
+    :returns: the number of points inside (a python int)
+    """
+    return _inside_indices(pgon, points, n_threads, x, y, False)
+
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def points_in_polys(cnp.ndarray[double, ndim=3, mode="c"] pgons,
-                    cnp.ndarray[double, ndim=2, mode="c"] points):
+                    cnp.ndarray[double, ndim=2, mode="c"] points,
+                    n_threads=None):
     """
     Determine if a list of points is inside a list of polygons, in a one-to-one fashion.
 
@@ -105,103 +482,2751 @@ def points_in_polys(cnp.ndarray[double, ndim=3, mode="c"] pgons,
     :param points: the points to test
     :type points: NX2 numpy array of (x, y) floats
 
+    :param n_threads=None: number of threads to split the points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
     :returns: a boolean array of length N
     """
-    cdef unsigned int i, N, M
+    cdef Py_ssize_t i, N
+    cdef size_t M
     cdef cnp.ndarray[char, ndim=1, mode="c"] result
+    cdef double [:, :, ::1] a_pgons = pgons
+    cdef double [:, ::1] a_points = points
+    cdef int num_threads = _num_threads(n_threads)
 
     result = np.zeros((points.shape[0],), dtype=np.uint8)
+    cdef char [::1] a_result = result
 
     M = pgons.shape[1]
     N = pgons.shape[0]
 
-    for i in range(N):
-        result[i] = c_point_in_poly1(M, &pgons[i, 0, 0], &points[i, 0])
+    with nogil:
+        if num_threads > 1:
+            for i in prange(N, num_threads=num_threads, schedule="static"):
+                a_result[i] = c_point_in_poly1(M, &a_pgons[i, 0, 0], &a_points[i, 0])
+        else:
+            for i in range(N):
+                a_result[i] = c_point_in_poly1(M, &a_pgons[i, 0, 0], &a_points[i, 0])
 
     return result.view(dtype=np.bool_)
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def signed_area(cnp.ndarray[double, ndim=2, mode="c"] polygon_verts):
+def points_in_ragged_polys(cnp.ndarray[double, ndim=2, mode="c"] coords,
+                           offsets,
+                           cnp.ndarray[double, ndim=2, mode="c"] points,
+                           n_threads=None):
     """
-    Compute the signed area of the polygon defined by the vertices in pgon
+    Determine if a list of points is inside a list of polygons, in a one-to-one fashion.
 
-    :param polygon_verts: the vertices of the polygon
-    :type polygon_verts: NX2 numpy array of floats
+    Same as ``points_in_polys``, but the polygons can have different numbers
+    of vertices, so they don't need to be padded out to the same size.
 
-    :returns: area of the polygon as a float64
+    :param coords: the vertices of all the polygons
+    :type coords: NX2 numpy array of floats
 
-    See: http://paulbourke.net/geometry/clockwise/
+    :param offsets: start of each polygon in coords, plus the end of the last one:
+                    polygon i is ``coords[offsets[i]:offsets[i + 1]]``
+    :type offsets: sequence of N + 1 integers
+
+    :param points: the points to test
+    :type points: NX2 numpy array of (x, y) floats
+
+    :param n_threads=None: number of threads to split the points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :returns: a boolean array of length N
     """
+    np_offsets = np.ascontiguousarray(offsets, dtype=np.intp)
+    if (np_offsets.ndim != 1 or len(np_offsets) < 1
+            or np_offsets[0] < 0 or np_offsets[-1] > coords.shape[0]
+            or np.any(np.diff(np_offsets) < 0)):
+        raise ValueError("offsets must be increasing indexes into coords")
+    if len(np_offsets) != points.shape[0] + 1:
+        raise ValueError("there must be one polygon for each point")
+
+    cdef Py_ssize_t i, N
+    cdef const Py_ssize_t[::1] a_offsets = np_offsets
+    cdef double [:, ::1] a_points = points
+    cdef double *c_coords = &coords[0, 0] if coords.shape[0] else NULL
+    cdef int num_threads = _num_threads(n_threads)
 
-    cdef unsigned int i, nvert
-    cdef double total
+    cdef cnp.ndarray[char, ndim=1, mode="c"] result
+    result = np.zeros((points.shape[0],), dtype=np.uint8)
+    cdef char [::1] a_result = result
 
-    nvert = polygon_verts.shape[0]
+    N = points.shape[0]
 
-    total = ((polygon_verts[nvert - 1, 0] * polygon_verts[0, 1]) -
-             (polygon_verts[0, 0] * polygon_verts[nvert - 1, 1])
-             )  # last point to first point
+    with nogil:
+        if num_threads > 1:
+            for i in prange(N, num_threads=num_threads, schedule="static"):
+                a_result[i] = c_point_in_poly1(a_offsets[i + 1] - a_offsets[i],
+                                               c_coords + 2 * a_offsets[i], &a_points[i, 0])
+        else:
+            for i in range(N):
+                a_result[i] = c_point_in_poly1(a_offsets[i + 1] - a_offsets[i],
+                                               c_coords + 2 * a_offsets[i], &a_points[i, 0])
 
-    for i in range(nvert - 1):
-        total += ((polygon_verts[i, 0] * polygon_verts[i + 1, 1]) -
-                  (polygon_verts[i + 1, 0] * polygon_verts[i, 1])
-                  )
+    return result.view(dtype=np.bool_)
 
-    return total / 2.0
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def polygon_centroid(cnp.ndarray[double, ndim=2, mode="c"] polygon_verts):
+cdef char _point_in_rings(double *coords,
+                          const Py_ssize_t[::1] ring_offsets,
+                          const Py_ssize_t[::1] part_offsets,
+                          const double[:, ::1] ring_bounds,
+                          bint nonzero,
+                          double px,
+                          double py) noexcept nogil:
     """
-    Return the (x, y) location of the polygon centroid
+    point in (multi)polygon check of a single point
+    """
+    cdef Py_ssize_t p, r
+    cdef int w
+    cdef double[2] point
+    point[0] = px
+    point[1] = py
+
+    for p in range(part_offsets.shape[0] - 1):
+        w = 0
+        for r in range(part_offsets[p], part_offsets[p + 1]):
+            # skip the rings that can't have an edge crossing to the right of the point
+            # (written so NaN gets skipped too)
+            if not (py >= ring_bounds[r, 0] and py < ring_bounds[r, 1]
+                    and px <= ring_bounds[r, 2]):
+                continue
+            if nonzero:
+                w += c_point_winding(ring_offsets[r + 1] - ring_offsets[r],
+                                     coords + 2 * ring_offsets[r], point)
+            else:
+                w ^= c_point_winding(ring_offsets[r + 1] - ring_offsets[r],
+                                     coords + 2 * ring_offsets[r], point) & 1
+        if w != 0:
+            return 1
+    return 0
 
-    This is the "center of gravity" centroid -- it will not necessarily
-    fall inside the polygon for concave polygons.
 
-    INPUT
-    -----
-    polygon_verts:  (N,2) array of float64
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _points_in_multipoly_loop(double *coords,
+                                    const Py_ssize_t[::1] ring_offsets,
+                                    const Py_ssize_t[::1] part_offsets,
+                                    const double[:, ::1] ring_bounds,
+                                    bint nonzero,
+                                    const floating[:] x,
+                                    const floating[:] y,
+                                    char[::1] result,
+                                    int num_threads) noexcept:
+    cdef Py_ssize_t i
+    with nogil:
+        if num_threads > 1:
+            for i in prange(x.shape[0], num_threads=num_threads, schedule="static"):
+                result[i] = _point_in_rings(coords, ring_offsets, part_offsets,
+                                            ring_bounds, nonzero, x[i], y[i])
+        else:
+            for i in range(x.shape[0]):
+                result[i] = _point_in_rings(coords, ring_offsets, part_offsets,
+                                            ring_bounds, nonzero, x[i], y[i])
 
-    OUTPUT
-    ------
-    xy_centroid:  (2,)
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def points_in_multipoly(cnp.ndarray[double, ndim=2, mode="c"] coords,
+                        ring_offsets,
+                        part_offsets,
+                        points=None,
+                        fill_rule="evenodd",
+                        n_threads=None,
+                        x=None,
+                        y=None):
     """
+    compute whether the points given are in a polygon with holes,
+    or a multi-polygon.
 
-    # this is computing the area and the centroids of each area segment at the
-    # same time so it is the same code as the area, with a bit of extra
+    The rings are stored GeoArrow style: ring r is
+    ``coords[ring_offsets[r]:ring_offsets[r + 1]]``, and part (polygon) p is
+    made up of rings ``part_offsets[p]:part_offsets[p + 1]``. The rings may
+    or may not repeat the first vertex at the end.
 
-    cdef unsigned int i, nvert
-    cdef double area, a, x, y
+    A point is inside if it is inside any of the parts. A part is checked with
+    all its rings together, using either the even-odd or the nonzero winding
+    rule, so holes can be given in either orientation with "evenodd", but
+    should be oriented opposite to the exterior ring with "nonzero".
 
-    nvert = polygon_verts.shape[0]
-    x = 0.0
-    y = 0.0
+    The edge test is the same one in ``c_point_in_poly1``, so for a single ring
+    the result is the same as ``points_in_poly``.
 
-    # last point to first point
-    # could probably do this by setting indexes smarter ...
-    # rather than duplicating code.
-    area = ((polygon_verts[nvert - 1, 0] * polygon_verts[0, 1])
-            - (polygon_verts[0, 0] * polygon_verts[nvert - 1, 1])
-            )
-    x += (polygon_verts[nvert - 1, 0] + polygon_verts[0, 0]) * area
-    y += (polygon_verts[nvert - 1, 1] + polygon_verts[0, 1]) * area
+    :param coords: the vertices of all the rings
+    :type coords: NX2 numpy array of floats
 
-    for i in range(nvert - 1):
-        a = ((polygon_verts[i, 0] * polygon_verts[i + 1, 1])
-             - (polygon_verts[i + 1, 0] * polygon_verts[i, 1])
-             )
-        area += a
-        x += (polygon_verts[i, 0] + polygon_verts[i + 1, 0]) * a
-        y += (polygon_verts[i, 1] + polygon_verts[i + 1, 1]) * a
+    :param ring_offsets: start of each ring in coords, plus the end of the last one
+    :type ring_offsets: sequence of nrings + 1 integers
 
-    area /= 2.0
-    x /= (6.0 * area)
-    y /= (6.0 * area)
+    :param part_offsets: start of each part in the rings, plus the end of the last one
+    :type part_offsets: sequence of nparts + 1 integers
+
+    :param points: the points to test
+    :type points: NX2 numpy array of (x, y) floats
+
+    :param x, y: the points to test can be passed in as separate x and y
+                 arrays instead. (float32 or float64 arrays are not copied)
+
+    :param fill_rule="evenodd": "evenodd" or "nonzero"
+
+    :param n_threads=None: number of threads to split the points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :returns: a boolean array the same length as points
+              if the input is a single point, the result is a
+              scalar python boolean
+    """
+    cdef bint nonzero
+    if fill_rule == "evenodd":
+        nonzero = False
+    elif fill_rule == "nonzero":
+        nonzero = True
+    else:
+        raise ValueError(f'fill_rule must be "evenodd" or "nonzero", not {fill_rule!r}')
+
+    np_ring_offsets = np.ascontiguousarray(ring_offsets, dtype=np.intp)
+    np_part_offsets = np.ascontiguousarray(part_offsets, dtype=np.intp)
+    if (np_ring_offsets.ndim != 1 or len(np_ring_offsets) < 1
+            or np_ring_offsets[0] < 0 or np_ring_offsets[-1] > coords.shape[0]
+            or np.any(np.diff(np_ring_offsets) < 0)):
+        raise ValueError("ring_offsets must be increasing indexes into coords")
+    if (np_part_offsets.ndim != 1 or len(np_part_offsets) < 1
+            or np_part_offsets[0] < 0 or np_part_offsets[-1] > len(np_ring_offsets) - 1
+            or np.any(np.diff(np_part_offsets) < 0)):
+        raise ValueError("part_offsets must be increasing indexes into the rings")
+
+    x, y, scalar = _as_xy(points, x, y)
+
+    cdef const Py_ssize_t[::1] a_rings = np_ring_offsets
+    cdef const Py_ssize_t[::1] a_parts = np_part_offsets
+
+    cdef cnp.ndarray[char, ndim=1, mode="c"] result = np.zeros((x.shape[0],), dtype=np.uint8)
+    cdef char [::1] a_result = result
+
+    cdef Py_ssize_t i, r, nrings
+    cdef double x_max, pad
+    cdef double *c_coords = &coords[0, 0] if coords.shape[0] else NULL
+    cdef int num_threads = _num_threads(n_threads)
+
+    # the bounds of each ring: (y_min, y_max, x_max)
+    # x_max is padded a bit, as the computed crossing can be a hair past the vertex.
+    nrings = a_rings.shape[0] - 1
+    cdef double[:, ::1] ring_bounds = np.empty((nrings, 3), dtype=np.float64)
+    for r in range(nrings):
+        if a_rings[r + 1] == a_rings[r]:
+            ring_bounds[r, 0] = 0.0
+            ring_bounds[r, 1] = 0.0  # empty y-range: always skipped
+            ring_bounds[r, 2] = 0.0
+            continue
+        ring_bounds[r, 0] = ring_bounds[r, 1] = coords[a_rings[r], 1]
+        x_max = coords[a_rings[r], 0]
+        pad = 0.0
+        for i in range(a_rings[r], a_rings[r + 1]):
+            ring_bounds[r, 0] = min(ring_bounds[r, 0], coords[i, 1])
+            ring_bounds[r, 1] = max(ring_bounds[r, 1], coords[i, 1])
+            x_max = max(x_max, coords[i, 0])
+            pad = max(pad, abs(coords[i, 0]))
+        ring_bounds[r, 2] = x_max + 8.0 * DBL_EPSILON * pad
+
+    if x.dtype == np.float32:
+        _points_in_multipoly_loop[float](c_coords, a_rings, a_parts, ring_bounds,
+                                         nonzero, x, y, a_result, num_threads)
+    else:
+        _points_in_multipoly_loop[double](c_coords, a_rings, a_parts, ring_bounds,
+                                          nonzero, x, y, a_result, num_threads)
+
+    if scalar:
+        return bool(result[0])  # to make it a regular python bool
+    else:
+        return result.view(dtype=np.bool_)  # make it a np.bool array
+
+
+# Number of children per node in the bounding box tree
+cdef enum:
+    TREE_NODE_SIZE = 16
+    # enough for 16 levels: far more boxes than could fit in memory
+    TREE_STACK_SIZE = 16 * TREE_NODE_SIZE
+
+
+def build_bbox_tree(boxes):
+    """
+    Build a packed bounding box tree (an STR packed R-tree)
+
+    The boxes are sorted into a tree in which each node holds the bounding
+    box of up to 16 children. The tree is stored as a flat array of boxes:
+    the leaves (the input boxes, in tree order) first, then each level of
+    nodes above, up to the root.
+
+    :param boxes: the boxes to index
+    :type boxes: Nx4 numpy array of (min_x, min_y, max_x, max_y)
+
+    :returns: (order, tree_boxes, level_starts)
+              order: the index of the input box for each leaf
+              tree_boxes: Kx4 array of all the boxes in the tree
+              level_starts: start of each level in tree_boxes,
+                            plus the end of the last (the root).
+              The children of node i on level l are nodes
+              i * 16 through i * 16 + 15 on level l - 1.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    n = len(boxes)
+
+    # sort into vertical slices by x, then by y within each slice
+    n_nodes = -(-n // TREE_NODE_SIZE)
+    n_slices = max(int(np.ceil(np.sqrt(n_nodes))), 1)
+    slice_size = n_slices * TREE_NODE_SIZE
+    order = np.argsort(boxes[:, 0] + boxes[:, 2], kind="stable")
+    for start in range(0, n, slice_size):
+        part = order[start:start + slice_size]
+        y = boxes[part, 1] + boxes[part, 3]
+        order[start:start + slice_size] = part[np.argsort(y, kind="stable")]
+
+    levels = [boxes[order]]
+    while len(levels[-1]) > 1:
+        below = levels[-1]
+        n_nodes = -(-len(below) // TREE_NODE_SIZE)
+        pad = n_nodes * TREE_NODE_SIZE - len(below)
+        padded = np.r_[below, np.repeat(below[-1:], pad, axis=0)].reshape(n_nodes, TREE_NODE_SIZE, 4)
+        levels.append(np.c_[padded[:, :, :2].min(axis=1), padded[:, :, 2:].max(axis=1)])
+
+    level_starts = np.cumsum([0] + [len(level) for level in levels]).astype(np.intp)
+    return (order.astype(np.intp),
+            np.ascontiguousarray(np.concatenate(levels) if n else np.empty((0, 4))),
+            level_starts)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t _locate_point(double *coords,
+                              const Py_ssize_t[::1] offsets,
+                              const Py_ssize_t[::1] order,
+                              const double[:, ::1] tree_boxes,
+                              const Py_ssize_t[::1] level_starts,
+                              double px,
+                              double py) noexcept nogil:
+    """
+    find the lowest index polygon that contains the point -- -1 if none do
+    """
+    cdef Py_ssize_t[TREE_STACK_SIZE] stack_level
+    cdef Py_ssize_t[TREE_STACK_SIZE] stack_node
+    cdef Py_ssize_t n_stack, level, node, child, first, last, poly
+    cdef Py_ssize_t found = -1
+
+    if level_starts[level_starts.shape[0] - 1] == 0:
+        return -1  # an empty tree
+    # start at the root
+    n_stack = 1
+    stack_level[0] = level_starts.shape[0] - 2
+    stack_node[0] = 0
+    while n_stack > 0:
+        n_stack -= 1
+        level = stack_level[n_stack]
+        node = stack_node[n_stack]
+        if level == 0:
+            poly = order[node]
+            if (found == -1 or poly < found) and _point_in_poly(
+                    offsets[poly + 1] - offsets[poly], coords + 2 * offsets[poly], px, py):
+                found = poly
+            continue
+        first = level_starts[level - 1] + node * TREE_NODE_SIZE
+        last = min(first + TREE_NODE_SIZE, level_starts[level])
+        for child in range(first, last):
+            # (written so NaN never matches)
+            if (px >= tree_boxes[child, 0] and py >= tree_boxes[child, 1]
+                    and px <= tree_boxes[child, 2] and py < tree_boxes[child, 3]):
+                stack_level[n_stack] = level - 1
+                stack_node[n_stack] = child - level_starts[level - 1]
+                n_stack += 1
+    return found
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _locate_points_loop(double *coords,
+                              const Py_ssize_t[::1] offsets,
+                              const Py_ssize_t[::1] order,
+                              const double[:, ::1] tree_boxes,
+                              const Py_ssize_t[::1] level_starts,
+                              const floating[:] x,
+                              const floating[:] y,
+                              Py_ssize_t[::1] result,
+                              int num_threads) noexcept:
+    cdef Py_ssize_t i
+    with nogil:
+        if num_threads > 1:
+            for i in prange(x.shape[0], num_threads=num_threads, schedule="static"):
+                result[i] = _locate_point(coords, offsets, order, tree_boxes,
+                                          level_starts, x[i], y[i])
+        else:
+            for i in range(x.shape[0]):
+                result[i] = _locate_point(coords, offsets, order, tree_boxes,
+                                          level_starts, x[i], y[i])
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def locate_points_in_polys(cnp.ndarray[double, ndim=2, mode="c"] coords,
+                           offsets,
+                           points=None,
+                           n_threads=None,
+                           x=None,
+                           y=None):
+    """
+    Find which polygon each point is in.
+
+    Candidate polygons are found with a bounding box tree, and then checked
+    with ``c_point_in_poly1``.
+
+    :param coords: the vertices of all the polygons
+    :type coords: NX2 numpy array of floats
+
+    :param offsets: start of each polygon in coords, plus the end of the last one:
+                    polygon i is ``coords[offsets[i]:offsets[i + 1]]``
+    :type offsets: sequence of npolys + 1 integers
+
+    :param points: the points to locate
+    :type points: NX2 numpy array of (x, y) floats
+
+    :param x, y: the points can be passed in as separate x and y
+                 arrays instead. (float32 or float64 arrays are not copied)
+
+    :param n_threads=None: number of threads to split the points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :returns: an integer array the same length as points: the index of the
+              polygon each point is in, or -1 if it's not in any of them.
+              If it's in more than one, the lowest index is returned.
+              If the input is a single point, the result is a python int.
+    """
+    np_offsets = np.ascontiguousarray(offsets, dtype=np.intp)
+    if (np_offsets.ndim != 1 or len(np_offsets) < 1
+            or np_offsets[0] < 0 or np_offsets[-1] > coords.shape[0]
+            or np.any(np.diff(np_offsets) < 0)):
+        raise ValueError("offsets must be increasing indexes into coords")
+
+    x, y, scalar = _as_xy(points, x, y)
+
+    cdef Py_ssize_t i, p, npolys
+    cdef double pad
+    npolys = len(np_offsets) - 1
+
+    # the polygon bounding boxes, padded a bit in x,
+    # as a computed crossing can be a hair past the vertex.
+    np_boxes = np.empty((npolys, 4), dtype=np.float64)
+    cdef double[:, ::1] boxes = np_boxes
+    cdef const Py_ssize_t[::1] a_offsets = np_offsets
+    for p in range(npolys):
+        if a_offsets[p + 1] == a_offsets[p]:
+            # an empty polygon: a box nothing can be in
+            boxes[p, 0] = boxes[p, 1] = boxes[p, 2] = boxes[p, 3] = 0.0
+            continue
+        boxes[p, 0] = boxes[p, 2] = coords[a_offsets[p], 0]
+        boxes[p, 1] = boxes[p, 3] = coords[a_offsets[p], 1]
+        pad = 0.0
+        for i in range(a_offsets[p], a_offsets[p + 1]):
+            boxes[p, 0] = min(boxes[p, 0], coords[i, 0])
+            boxes[p, 1] = min(boxes[p, 1], coords[i, 1])
+            boxes[p, 2] = max(boxes[p, 2], coords[i, 0])
+            boxes[p, 3] = max(boxes[p, 3], coords[i, 1])
+            pad = max(pad, abs(coords[i, 0]))
+        pad *= 8.0 * DBL_EPSILON
+        boxes[p, 0] -= pad
+        boxes[p, 2] += pad
+
+    np_order, np_tree_boxes, np_level_starts = build_bbox_tree(np_boxes)
+
+    cdef const Py_ssize_t[::1] order = np_order
+    cdef const double[:, ::1] tree_boxes = np_tree_boxes
+    cdef const Py_ssize_t[::1] level_starts = np_level_starts
+    cdef double *c_coords = &coords[0, 0] if coords.shape[0] else NULL
+    cdef int num_threads = _num_threads(n_threads)
+
+    result = np.empty((x.shape[0],), dtype=np.intp)
+    cdef Py_ssize_t [::1] a_result = result
+
+    if x.dtype == np.float32:
+        _locate_points_loop[float](c_coords, a_offsets, order, tree_boxes, level_starts,
+                                   x, y, a_result, num_threads)
+    else:
+        _locate_points_loop[double](c_coords, a_offsets, order, tree_boxes, level_starts,
+                                    x, y, a_result, num_threads)
+
+    if scalar:
+        return int(result[0])
+    else:
+        return result
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def build_slab_index(cnp.ndarray[double, ndim=2, mode="c"] pgon,
+                     Py_ssize_t n_slabs,
+                     Py_ssize_t max_entries):
+    """
+    Bucket the edges of a polygon into horizontal slabs.
+
+    The y-range of the polygon is split into ``n_slabs`` equal-height slabs,
+    and each non-horizontal edge is listed in every slab its y-range touches.
+    A point then only needs to be tested against the edges in its own slab.
+
+    If the edges span so many slabs that the index would hold more than
+    ``max_entries`` edge references, the number of slabs is halved until
+    it fits.
+
+    :param pgon: the vertices of the polygon
+    :type pgon: NX2 numpy array of floats
+
+    :param n_slabs: the (maximum) number of slabs to use
+
+    :param max_entries: the maximum number of edge references to store
+
+    :returns: (y_min, y_max, scale, slab_starts, slab_edges)
+              the edges in slab k are slab_edges[slab_starts[k]:slab_starts[k+1]],
+              and a y value is in slab ``int((y - y_min) * scale)``.
+              Edge i is the edge from vertex i-1 to vertex i.
+    """
+    cdef Py_ssize_t i, j, k, k_lo, k_hi, nvert, total
+    cdef double y_min, y_max, scale, y_lo, y_hi
+
+    nvert = pgon.shape[0]
+    if nvert == 0:
+        raise ValueError("polygon must have at least one vertex")
+
+    y_min = y_max = pgon[0, 1]
+    for i in range(nvert):
+        if pgon[i, 1] < y_min:
+            y_min = pgon[i, 1]
+        if pgon[i, 1] > y_max:
+            y_max = pgon[i, 1]
+
+    if n_slabs < 1 or y_max == y_min:
+        n_slabs = 1
+
+    # find a slab count that keeps the index a reasonable size
+    while True:
+        scale = n_slabs / (y_max - y_min) if y_max > y_min else 0.0
+        total = 0
+        j = nvert - 1
+        for i in range(nvert):
+            if pgon[i, 1] != pgon[j, 1]:
+                y_lo = min(pgon[i, 1], pgon[j, 1])
+                y_hi = max(pgon[i, 1], pgon[j, 1])
+                k_lo = min(<Py_ssize_t>((y_lo - y_min) * scale), n_slabs - 1)
+                k_hi = min(<Py_ssize_t>((y_hi - y_min) * scale), n_slabs - 1)
+                total += k_hi - k_lo + 1
+            j = i
+        if total <= max_entries or n_slabs == 1:
+            break
+        n_slabs //= 2
+
+    cdef cnp.ndarray[Py_ssize_t, ndim=1, mode="c"] slab_starts
+    cdef cnp.ndarray[Py_ssize_t, ndim=1, mode="c"] slab_edges
+    slab_starts = np.zeros((n_slabs + 1,), dtype=np.intp)
+    slab_edges = np.empty((total,), dtype=np.intp)
+
+    # count the edges in each slab, then fill them in (CSR style)
+    j = nvert - 1
+    for i in range(nvert):
+        if pgon[i, 1] != pgon[j, 1]:
+            y_lo = min(pgon[i, 1], pgon[j, 1])
+            y_hi = max(pgon[i, 1], pgon[j, 1])
+            k_lo = min(<Py_ssize_t>((y_lo - y_min) * scale), n_slabs - 1)
+            k_hi = min(<Py_ssize_t>((y_hi - y_min) * scale), n_slabs - 1)
+            for k in range(k_lo, k_hi + 1):
+                slab_starts[k + 1] += 1
+        j = i
+    for k in range(n_slabs):
+        slab_starts[k + 1] += slab_starts[k]
+
+    cdef cnp.ndarray[Py_ssize_t, ndim=1, mode="c"] fill = slab_starts[:-1].copy()
+    j = nvert - 1
+    for i in range(nvert):
+        if pgon[i, 1] != pgon[j, 1]:
+            y_lo = min(pgon[i, 1], pgon[j, 1])
+            y_hi = max(pgon[i, 1], pgon[j, 1])
+            k_lo = min(<Py_ssize_t>((y_lo - y_min) * scale), n_slabs - 1)
+            k_hi = min(<Py_ssize_t>((y_hi - y_min) * scale), n_slabs - 1)
+            for k in range(k_lo, k_hi + 1):
+                slab_edges[fill[k]] = i
+                fill[k] += 1
+        j = i
+
+    return y_min, y_max, scale, slab_starts, slab_edges
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def build_edge_coeffs(cnp.ndarray[double, ndim=2, mode="c"] pgon):
+    """
+    Precompute the coefficients of the edges of a polygon, so the point in
+    polygon test doesn't need to divide (or load both vertices) for each edge.
+
+    A horizontal line at y crosses edge i if ``y_lo[i] <= y < y_hi[i]``,
+    at ``x = x_lo[i] + slope[i] * (y - y_lo[i])``.
+
+    The x is computed from the lower end of the edge, rather than from
+    an x-intercept at y=0, so there is no loss of precision for polygons
+    far from the origin -- and an edge shared by two polygons gives the
+    same answer for both, whichever way it's wound.
+
+    :param pgon: the vertices of the polygon
+    :type pgon: NX2 numpy array of floats
+
+    :returns: (y_lo, y_hi, x_lo, slope) -- arrays of length N (structure of arrays).
+              Edge i is the edge from vertex i-1 to vertex i.
+              Horizontal edges have y_lo == y_hi, so never match.
+    """
+    cdef Py_ssize_t i, j, nvert
+    nvert = pgon.shape[0]
+
+    cdef cnp.ndarray[double, ndim=1, mode="c"] y_lo = np.empty((nvert,), dtype=np.float64)
+    cdef cnp.ndarray[double, ndim=1, mode="c"] y_hi = np.empty((nvert,), dtype=np.float64)
+    cdef cnp.ndarray[double, ndim=1, mode="c"] x_lo = np.empty((nvert,), dtype=np.float64)
+    cdef cnp.ndarray[double, ndim=1, mode="c"] slope = np.zeros((nvert,), dtype=np.float64)
+
+    j = nvert - 1
+    for i in range(nvert):
+        if pgon[i, 1] < pgon[j, 1]:
+            y_lo[i], x_lo[i], y_hi[i] = pgon[i, 1], pgon[i, 0], pgon[j, 1]
+        else:
+            y_lo[i], x_lo[i], y_hi[i] = pgon[j, 1], pgon[j, 0], pgon[i, 1]
+        if pgon[i, 1] != pgon[j, 1]:
+            slope[i] = (pgon[i, 0] - pgon[j, 0]) / (pgon[i, 1] - pgon[j, 1])
+        j = i
+    return y_lo, y_hi, x_lo, slope
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef char _point_in_slab_index(const double[:, ::1] pgon,
+                               double y_min,
+                               double y_max,
+                               double scale,
+                               const Py_ssize_t[::1] slab_starts,
+                               const Py_ssize_t[::1] slab_edges,
+                               double px,
+                               double py) noexcept nogil:
+    """
+    point in polygon check of a single point, using the slab index
+    """
+    cdef Py_ssize_t i, j, k, e, nvert, n_slabs
+    cdef char c = 0
+
+    # no edge can straddle a point outside the y-range (this catches NaN too)
+    if not (py >= y_min and py < y_max):
+        return 0
+
+    nvert = pgon.shape[0]
+    n_slabs = slab_starts.shape[0] - 1
+    k = min(<Py_ssize_t>((py - y_min) * scale), n_slabs - 1)
+    for e in range(slab_starts[k], slab_starts[k + 1]):
+        i = slab_edges[e]
+        j = i - 1 if i > 0 else nvert - 1
+        if (((pgon[i, 1] > py) != (pgon[j, 1] > py)) and
+            (px < (pgon[j, 0] - pgon[i, 0]) * (py - pgon[i, 1]) / (pgon[j, 1] - pgon[i, 1]) + pgon[i, 0])):
+            c = not c
+    return c
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef char _point_in_slab_coeffs(double y_min,
+                                double y_max,
+                                double scale,
+                                const Py_ssize_t[::1] slab_starts,
+                                const Py_ssize_t[::1] slab_edges,
+                                const double[::1] y_lo,
+                                const double[::1] y_hi,
+                                const double[::1] x_lo,
+                                const double[::1] slope,
+                                double px,
+                                double py) noexcept nogil:
+    """
+    point in polygon check of a single point, using the slab index and
+    the precomputed edge coefficients -- no division
+    """
+    cdef Py_ssize_t i, k, e, n_slabs
+    cdef char c = 0
+
+    if not (py >= y_min and py < y_max):
+        return 0
+
+    n_slabs = slab_starts.shape[0] - 1
+    k = min(<Py_ssize_t>((py - y_min) * scale), n_slabs - 1)
+    for e in range(slab_starts[k], slab_starts[k + 1]):
+        i = slab_edges[e]
+        if (py >= y_lo[i] and py < y_hi[i]
+                and px < x_lo[i] + slope[i] * (py - y_lo[i])):
+            c = not c
+    return c
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline char _rect_check(const double[::1] rects, double px, double py) noexcept nogil:
+    """
+    check a point against the fast reject / fast accept rectangles:
+    (xmin, ymin, xmax, ymax) of the bounding box, then of the inner rectangle
+
+    :returns: 0 if it's outside the bounding box, 1 if it's in the inner
+              rectangle, 2 if it needs to be checked against the edges
+    """
+    # written so that NaN is outside
+    if not (px >= rects[0] and py >= rects[1] and px < rects[2] and py < rects[3]):
+        return 0
+    if px >= rects[4] and py >= rects[5] and px <= rects[6] and py <= rects[7]:
+        return 1
+    return 2
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _points_in_slab_index_loop(const double[:, ::1] pgon,
+                                     double y_min,
+                                     double y_max,
+                                     double scale,
+                                     const Py_ssize_t[::1] slab_starts,
+                                     const Py_ssize_t[::1] slab_edges,
+                                     const floating[:] x,
+                                     const floating[:] y,
+                                     const double[::1] rects,
+                                     char[::1] result,
+                                     int num_threads) noexcept:
+    cdef Py_ssize_t n
+    cdef char c
+    with nogil:
+        if num_threads > 1:
+            for n in prange(x.shape[0], num_threads=num_threads, schedule="static"):
+                c = _rect_check(rects, x[n], y[n])
+                if c == 2:
+                    c = _point_in_slab_index(pgon, y_min, y_max, scale,
+                                             slab_starts, slab_edges, x[n], y[n])
+                result[n] = c
+        else:
+            for n in range(x.shape[0]):
+                c = _rect_check(rects, x[n], y[n])
+                if c == 2:
+                    c = _point_in_slab_index(pgon, y_min, y_max, scale,
+                                             slab_starts, slab_edges, x[n], y[n])
+                result[n] = c
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _points_in_slab_coeffs_loop(double y_min,
+                                      double y_max,
+                                      double scale,
+                                      const Py_ssize_t[::1] slab_starts,
+                                      const Py_ssize_t[::1] slab_edges,
+                                      const double[::1] y_lo,
+                                      const double[::1] y_hi,
+                                      const double[::1] x_lo,
+                                      const double[::1] slope,
+                                      const floating[:] x,
+                                      const floating[:] y,
+                                      const double[::1] rects,
+                                      char[::1] result,
+                                      int num_threads) noexcept:
+    cdef Py_ssize_t n
+    cdef char c
+    with nogil:
+        if num_threads > 1:
+            for n in prange(x.shape[0], num_threads=num_threads, schedule="static"):
+                c = _rect_check(rects, x[n], y[n])
+                if c == 2:
+                    c = _point_in_slab_coeffs(y_min, y_max, scale, slab_starts, slab_edges,
+                                              y_lo, y_hi, x_lo, slope, x[n], y[n])
+                result[n] = c
+        else:
+            for n in range(x.shape[0]):
+                c = _rect_check(rects, x[n], y[n])
+                if c == 2:
+                    c = _point_in_slab_coeffs(y_min, y_max, scale, slab_starts, slab_edges,
+                                              y_lo, y_hi, x_lo, slope, x[n], y[n])
+                result[n] = c
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def points_in_slab_index(cnp.ndarray[double, ndim=2, mode="c"] pgon,
+                         double y_min,
+                         double y_max,
+                         double scale,
+                         cnp.ndarray[Py_ssize_t, ndim=1, mode="c"] slab_starts,
+                         cnp.ndarray[Py_ssize_t, ndim=1, mode="c"] slab_edges,
+                         points=None,
+                         n_threads=None,
+                         x=None,
+                         y=None,
+                         edge_coeffs=None,
+                         rects=None):
+    """
+    compute whether the points given are in the polygon, using a slab index
+    built by ``build_slab_index``
+
+    Each point is only tested against the edges in its slab. The edge test is
+    exactly the one in ``c_point_in_poly1``, so the result is the same as
+    ``points_in_poly``.
+
+    If the edge coefficients from ``build_edge_coeffs`` are passed in, they
+    are used instead, which saves a division per edge. The crossing point is
+    rounded differently, so a point within rounding error of an edge may
+    then get a different answer than ``points_in_poly``.
+
+    :param pgon: the vertices of the polygon the index was built from
+    :type pgon: NX2 numpy array of floats
+
+    :param points: the points to test
+    :type points: NX2 numpy array of (x, y) floats
+
+    :param n_threads=None: number of threads to split the points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :param x, y: the points to test can be passed in as separate x and y
+                 arrays instead. (float32 or float64 arrays are not copied)
+
+    :param edge_coeffs=None: (y_lo, y_hi, x_lo, slope) from ``build_edge_coeffs``
+
+    :param rects=None: fast reject / fast accept rectangles:
+                       (xmin, ymin, xmax, ymax) of a box that the points
+                       must be in to be inside the polygon, then of a box
+                       that is entirely inside the polygon (an empty box,
+                       e.g. (inf, inf, -inf, -inf) for none).
+                       Only points between the two are checked against
+                       the edges. The caller has to make sure they are
+                       right, including any rounding at the edges
+                       (The y range of the polygon, and x padded a bit, is safe).
+
+    :returns: a boolean array the same length as points
+              if the input is a single point, the result is a
+              scalar python boolean
+    """
+    x, y, scalar = _as_xy(points, x, y)
+
+    cdef cnp.ndarray[char, ndim=1, mode="c"] result = np.zeros((x.shape[0],), dtype=np.uint8)
+    cdef int num_threads = _num_threads(n_threads)
+
+    if rects is None:
+        rects = _NO_RECTS
+    rects = np.ascontiguousarray(rects, dtype=np.float64)
+    if rects.shape != (8,):
+        raise ValueError("rects must be 8 numbers: two (xmin, ymin, xmax, ymax) boxes")
+
+    if edge_coeffs is not None:
+        y_lo, y_hi, x_lo, slope = edge_coeffs
+        if x.dtype == np.float32:
+            _points_in_slab_coeffs_loop[float](y_min, y_max, scale, slab_starts, slab_edges,
+                                               y_lo, y_hi, x_lo, slope, x, y, rects,
+                                               result, num_threads)
+        else:
+            _points_in_slab_coeffs_loop[double](y_min, y_max, scale, slab_starts, slab_edges,
+                                                y_lo, y_hi, x_lo, slope, x, y, rects,
+                                                result, num_threads)
+    elif x.dtype == np.float32:
+        _points_in_slab_index_loop[float](pgon, y_min, y_max, scale, slab_starts, slab_edges,
+                                          x, y, rects, result, num_threads)
+    else:
+        _points_in_slab_index_loop[double](pgon, y_min, y_max, scale, slab_starts, slab_edges,
+                                           x, y, rects, result, num_threads)
+
+    if scalar:
+        return bool(result[0])  # to make it a regular python bool
+    else:
+        return result.view(dtype=np.bool_)  # make it a np.bool array
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _sweep_range(const double[:, ::1] pgon,
+                      const Py_ssize_t[::1] edges,
+                      const double[::1] edge_y_lo,
+                      const double[::1] edge_y_hi,
+                      const Py_ssize_t[::1] order,
+                      const floating[:] x,
+                      const floating[:] y,
+                      Py_ssize_t start,
+                      Py_ssize_t stop,
+                      char[::1] result) noexcept nogil:
+    """
+    sweep up through the points order[start:stop] (sorted by y), keeping a
+    list of the edges that straddle the current y, and testing each point
+    against only those.
+
+    :returns: 0, or -1 if out of memory
+    """
+    cdef Py_ssize_t n, p, e, a, i, j, nactive = 0, next_edge = 0
+    cdef Py_ssize_t nvert = pgon.shape[0]
+    cdef Py_ssize_t nedges = edges.shape[0]
+    cdef double px, py
+    cdef char c
+    cdef Py_ssize_t *active = <Py_ssize_t *>malloc(max(nedges, 1) * sizeof(Py_ssize_t))
+    if active == NULL:
+        return -1
+
+    for n in range(start, stop):
+        p = order[n]
+        px = x[p]
+        py = y[p]
+        # add the edges that start at or below this point
+        while next_edge < nedges and edge_y_lo[edges[next_edge]] <= py:
+            active[nactive] = edges[next_edge]
+            nactive += 1
+            next_edge += 1
+        # test against the active edges, dropping the ones that end at or below it
+        c = 0
+        a = 0
+        for e in range(nactive):
+            i = active[e]
+            if edge_y_hi[i] > py:
+                active[a] = i
+                a += 1
+                # edge i is from vertex i-1 to vertex i, as in c_point_in_poly1
+                j = i - 1 if i > 0 else nvert - 1
+                if px < ((pgon[j, 0] - pgon[i, 0]) * (py - pgon[i, 1])
+                         / (pgon[j, 1] - pgon[i, 1]) + pgon[i, 0]):
+                    c = not c
+        nactive = a
+        result[p] = c
+    free(active)
+    return 0
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _points_in_poly_sweep_loop(const double[:, ::1] pgon,
+                                    const Py_ssize_t[::1] edges,
+                                    const double[::1] edge_y_lo,
+                                    const double[::1] edge_y_hi,
+                                    const Py_ssize_t[::1] order,
+                                    const floating[:] x,
+                                    const floating[:] y,
+                                    char[::1] result,
+                                    int num_threads) noexcept:
+    """
+    each thread sweeps through its own range of the sorted points
+
+    :returns: 0, or negative if out of memory
+    """
+    cdef Py_ssize_t r, npoints
+    cdef int err = 0
+    npoints = order.shape[0]
+    with nogil:
+        if num_threads > 1:
+            for r in prange(num_threads, num_threads=num_threads, schedule="static"):
+                err += _sweep_range(pgon, edges, edge_y_lo, edge_y_hi, order, x, y,
+                                    npoints * r // num_threads,
+                                    npoints * (r + 1) // num_threads,
+                                    result)
+        else:
+            err = _sweep_range(pgon, edges, edge_y_lo, edge_y_hi, order, x, y,
+                               0, npoints, result)
+    return err
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def points_in_poly_sweep(cnp.ndarray[double, ndim=2, mode="c"] pgon, points=None,
+                         n_threads=None, x=None, y=None):
+    """
+    compute whether the points given are in the polygon defined in pgon,
+    with a sweep line.
+
+    The points are sorted by y, and the edges by the bottom of their y-range.
+    Then the sweep goes up through the points, adding the edges as it
+    reaches them and dropping them as it passes them, so each point is only
+    tested against the edges that straddle its y. That's
+    O((N + M) log(N + M) + crossings), rather than O(N * M),
+    so it's good for lots of points in a big polygon.
+
+    The edge test is exactly the one in ``c_point_in_poly1``, so the result
+    is the same as ``points_in_poly``.
+
+    :param pgon: the vertices of the polygon
+    :type pgon: NX2 numpy array of floats
+
+    :param points: the points to test
+    :type points: NX2 numpy array of (x, y) floats
+
+    :param n_threads=None: number of threads to split the (sorted) points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :param x, y: the points to test can be passed in as separate x and y
+                 arrays instead. (float32 or float64 arrays are not copied)
+
+    :returns: a boolean array the same length as points
+              if the input is a single point, the result is a
+              scalar python boolean
+    """
+    cdef Py_ssize_t i, j, nvert
+    x, y, scalar = _as_xy(points, x, y)
+
+    cdef cnp.ndarray[char, ndim=1, mode="c"] result = np.zeros((x.shape[0],), dtype=np.uint8)
+    cdef int num_threads = _num_threads(n_threads)
+
+    # the edges that can be crossed: edge i is from vertex i-1 to vertex i.
+    # A point with a NaN is never inside, and an edge with a NaN never
+    # changes the answer, so they are left out.
+    nvert = pgon.shape[0]
+    prev = np.roll(pgon, 1, axis=0)
+    edge_y_lo = np.minimum(pgon[:, 1], prev[:, 1])
+    edge_y_hi = np.maximum(pgon[:, 1], prev[:, 1])
+    edges = np.flatnonzero((edge_y_lo < edge_y_hi)
+                           & ~np.isnan(pgon[:, 0]) & ~np.isnan(prev[:, 0]))
+    edges = edges[np.argsort(edge_y_lo[edges], kind="stable")]
+
+    # (NaNs sort to the end)
+    order = np.argsort(y, kind="stable")[:np.count_nonzero(~np.isnan(y))]
+
+    if x.dtype == np.float32:
+        err = _points_in_poly_sweep_loop[float](pgon, edges, edge_y_lo, edge_y_hi, order,
+                                                x, y, result, num_threads)
+    else:
+        err = _points_in_poly_sweep_loop[double](pgon, edges, edge_y_lo, edge_y_hi, order,
+                                                 x, y, result, num_threads)
+    if err < 0:
+        raise MemoryError()
+
+    if scalar:
+        return bool(result[0])  # to make it a regular python bool
+    else:
+        return result.view(dtype=np.bool_)  # make it a np.bool array
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def build_monotone_chains(cnp.ndarray[double, ndim=2, mode="c"] pgon):
+    """
+    Split the edges of a y-monotone polygon (e.g. any convex polygon) into
+    the two chains going up and down, each sorted by y.
+
+    A horizontal line then crosses at most one edge of each chain, which can
+    be found with a binary search. Horizontal edges are left out.
+
+    Only comparisons are used, so there is no rounding: a polygon is y-monotone
+    if, going around it, the edges go up, then down (ignoring flat edges).
+
+    :param pgon: the vertices of the polygon
+    :type pgon: NX2 numpy array of floats
+
+    :returns: (up_edges, down_edges), indexes of the edges, in increasing y,
+              or None if the polygon isn't y-monotone.
+              Edge i is the edge from vertex i-1 to vertex i.
+    """
+    cdef Py_ssize_t i, j, n, nvert, first_up, first_down, changes = 0
+    cdef int direction, prev_direction = 0, first_direction = 0
+
+    nvert = pgon.shape[0]
+    if nvert == 0 or np.isnan(pgon[:, 1]).any():
+        return None
+
+    # count the changes of direction, going around from vertex 0
+    first_up = first_down = -1
+    j = nvert - 1
+    for i in range(nvert):
+        direction = (pgon[i, 1] > pgon[j, 1]) - (pgon[i, 1] < pgon[j, 1])
+        if direction != 0:
+            if first_direction == 0:
+                first_direction = direction
+            elif direction != prev_direction:
+                changes += 1
+            if direction > 0 and (first_up < 0 or direction != prev_direction):
+                first_up = i
+            if direction < 0 and (first_down < 0 or direction != prev_direction):
+                first_down = i
+            prev_direction = direction
+        j = i
+    if prev_direction != first_direction:
+        changes += 1  # changes back to where it started
+    if changes > 2:
+        return None
+
+    up = []
+    down = []
+    if changes == 2:
+        # walk each run from where it starts (wrapping around)
+        for n in range(nvert):
+            i = (first_up + n) % nvert
+            j = i - 1 if i > 0 else nvert - 1
+            if pgon[i, 1] < pgon[j, 1]:
+                break
+            if pgon[i, 1] > pgon[j, 1]:
+                up.append(i)
+        for n in range(nvert):
+            i = (first_down + n) % nvert
+            j = i - 1 if i > 0 else nvert - 1
+            if pgon[i, 1] > pgon[j, 1]:
+                break
+            if pgon[i, 1] < pgon[j, 1]:
+                down.append(i)
+        down.reverse()
+    return np.array(up, dtype=np.intp), np.array(down, dtype=np.intp)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline char _chain_crossing(const double[:, ::1] pgon,
+                                 const Py_ssize_t[::1] chain,
+                                 double px,
+                                 double py) noexcept nogil:
+    """
+    1 if the horizontal ray from the point crosses the chain, found with
+    a binary search -- with exactly the test in c_point_in_poly1
+    """
+    cdef Py_ssize_t i, j, lo, hi, mid, nvert
+    nvert = pgon.shape[0]
+    # find the last edge that starts at or below py
+    lo = 0
+    hi = chain.shape[0]
+    while lo < hi:
+        mid = (lo + hi) // 2
+        i = chain[mid]
+        j = i - 1 if i > 0 else nvert - 1
+        if min(pgon[i, 1], pgon[j, 1]) <= py:
+            lo = mid + 1
+        else:
+            hi = mid
+    if lo == 0:
+        return 0
+    i = chain[lo - 1]
+    j = i - 1 if i > 0 else nvert - 1
+    return (((pgon[i, 1] > py) != (pgon[j, 1] > py)) and
+            (px < (pgon[j, 0] - pgon[i, 0]) * (py - pgon[i, 1]) / (pgon[j, 1] - pgon[i, 1]) + pgon[i, 0]))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _points_in_monotone_loop(const double[:, ::1] pgon,
+                                   const Py_ssize_t[::1] up_edges,
+                                   const Py_ssize_t[::1] down_edges,
+                                   const floating[:] x,
+                                   const floating[:] y,
+                                   char[::1] result,
+                                   int num_threads) noexcept:
+    cdef Py_ssize_t n
+    with nogil:
+        if num_threads > 1:
+            for n in prange(x.shape[0], num_threads=num_threads, schedule="static"):
+                result[n] = (_chain_crossing(pgon, up_edges, x[n], y[n])
+                             ^ _chain_crossing(pgon, down_edges, x[n], y[n]))
+        else:
+            for n in range(x.shape[0]):
+                result[n] = (_chain_crossing(pgon, up_edges, x[n], y[n])
+                             ^ _chain_crossing(pgon, down_edges, x[n], y[n]))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def points_in_monotone_poly(cnp.ndarray[double, ndim=2, mode="c"] pgon,
+                            cnp.ndarray[Py_ssize_t, ndim=1, mode="c"] up_edges,
+                            cnp.ndarray[Py_ssize_t, ndim=1, mode="c"] down_edges,
+                            points=None,
+                            n_threads=None,
+                            x=None,
+                            y=None):
+    """
+    compute whether the points given are in a y-monotone (e.g. convex)
+    polygon, using the chains from ``build_monotone_chains``
+
+    Only the (at most) two edges that straddle the point's y can be crossed,
+    and they are found with binary searches, so each point is O(log M).
+    The edge test is exactly the one in ``c_point_in_poly1``, so the result
+    is the same as ``points_in_poly``.
+
+    :param pgon: the vertices of the polygon the chains were built from
+    :type pgon: NX2 numpy array of floats
+
+    :param up_edges, down_edges: the chains from ``build_monotone_chains``
+
+    :param points: the points to test
+    :type points: NX2 numpy array of (x, y) floats
+
+    :param n_threads=None: number of threads to split the points across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :param x, y: the points to test can be passed in as separate x and y
+                 arrays instead. (float32 or float64 arrays are not copied)
+
+    :returns: a boolean array the same length as points
+              if the input is a single point, the result is a
+              scalar python boolean
+    """
+    x, y, scalar = _as_xy(points, x, y)
+
+    cdef cnp.ndarray[char, ndim=1, mode="c"] result = np.zeros((x.shape[0],), dtype=np.uint8)
+    cdef int num_threads = _num_threads(n_threads)
+
+    if x.dtype == np.float32:
+        _points_in_monotone_loop[float](pgon, up_edges, down_edges, x, y, result, num_threads)
+    else:
+        _points_in_monotone_loop[double](pgon, up_edges, down_edges, x, y, result, num_threads)
+
+    if scalar:
+        return bool(result[0])  # to make it a regular python bool
+    else:
+        return result.view(dtype=np.bool_)  # make it a np.bool array
+
+
+cdef inline double _cell_center(double origin, double size, Py_ssize_t i) noexcept nogil:
+    """
+    the center of cell i of a regular grid
+    """
+    return origin + (i + 0.5) * size
+
+
+@cython.cdivision(True)
+cdef Py_ssize_t _first_center_at_or_above(double v, double origin, double size,
+                                          Py_ssize_t n) noexcept nogil:
+    """
+    the index of the first of the n cell centers that is >= v (n if none are)
+
+    The division gives a first guess, which is then checked against the
+    centers themselves, so rounding can't put a cell on the wrong side.
+    """
+    cdef double guess = ceil((v - origin) / size - 0.5)
+    cdef Py_ssize_t i
+    if not (guess > 0):
+        i = 0
+    elif guess > n:
+        i = n
+    else:
+        i = <Py_ssize_t>guess
+    while i > 0 and _cell_center(origin, size, i - 1) >= v:
+        i -= 1
+    while i < n and _cell_center(origin, size, i) < v:
+        i += 1
+    return i
+
+
+cdef int _compare_doubles(const void *a, const void *b) noexcept nogil:
+    cdef double da = (<const double *>a)[0]
+    cdef double db = (<const double *>b)[0]
+    return (da > db) - (da < db)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def rasterize_poly(cnp.ndarray[double, ndim=2, mode="c"] pgon,
+                   double x0,
+                   double y0,
+                   double dx,
+                   double dy,
+                   Py_ssize_t nrows,
+                   Py_ssize_t ncols):
+    """
+    Find the cells of a regular grid whose centers are inside a polygon.
+
+    This is a scanline fill: the edges are bucketed by the first row they
+    cross (an edge table), and each row only computes the crossings of the
+    edges that span it, then fills the cells between pairs of crossings.
+    So the cost is O(rows * crossings + cells), rather than O(cells * vertices).
+
+    The crossings are computed with exactly the same expression as
+    ``c_point_in_poly1``, and the cells are filled by comparing their centers
+    to them, so the result is exactly the same as ``points_in_poly`` on
+    the cell centers.
+
+    :param pgon: the vertices of the polygon
+    :type pgon: NX2 numpy array of floats
+
+    :param x0, y0: the lower left corner of the grid
+
+    :param dx, dy: the size of the cells (must be positive)
+
+    :param nrows, ncols: the number of rows (in y) and columns (in x)
+
+    :returns: a (nrows, ncols) boolean array.
+              The center of cell [i, j] is (x0 + (j + 0.5) * dx, y0 + (i + 0.5) * dy)
+    """
+    cdef Py_ssize_t i, j, e, r, a, nactive, nvert, c, c_next
+    cdef double py
+    cdef bint inside
+
+    if not (dx > 0 and dy > 0):
+        raise ValueError("the cell size must be positive")
+    if nrows < 0 or ncols < 0:
+        raise ValueError("the grid shape can not be negative")
+
+    nvert = pgon.shape[0]
+    cdef cnp.ndarray[char, ndim=2, mode="c"] result = np.zeros((nrows, ncols), dtype=np.uint8)
+    cdef char[:, ::1] res = result
+    cdef const double[:, ::1] verts = pgon
+
+    # the rows each edge spans: [edge_start, edge_end)
+    cdef Py_ssize_t[::1] edge_start = np.zeros((nvert,), dtype=np.intp)
+    cdef Py_ssize_t[::1] edge_end = np.zeros((nvert,), dtype=np.intp)
+    # the edge table: the edges starting in row r are
+    # row_edges[row_starts[r]:row_starts[r+1]]
+    cdef Py_ssize_t[::1] row_starts = np.zeros((nrows + 1,), dtype=np.intp)
+    cdef Py_ssize_t[::1] row_edges = np.empty((nvert,), dtype=np.intp)
+    cdef Py_ssize_t[::1] row_fill = np.empty((nrows,), dtype=np.intp)
+    cdef Py_ssize_t[::1] active = np.empty((nvert,), dtype=np.intp)
+    cdef double[::1] crossings = np.empty((nvert,), dtype=np.float64)
+
+    with nogil:
+        # Edge i is from vertex i-1 to vertex i. Horizontal edges never
+        # cross a row, and an edge with a NaN never changes the answer
+        # in c_point_in_poly1, so they are left out.
+        j = nvert - 1
+        for i in range(nvert):
+            if (verts[i, 1] != verts[j, 1]
+                    and not (isnan(verts[i, 0]) or isnan(verts[i, 1])
+                             or isnan(verts[j, 0]) or isnan(verts[j, 1]))):
+                # a row at py crosses the edge if y_lo <= py < y_hi
+                edge_start[i] = _first_center_at_or_above(min(verts[i, 1], verts[j, 1]),
+                                                          y0, dy, nrows)
+                edge_end[i] = _first_center_at_or_above(max(verts[i, 1], verts[j, 1]),
+                                                        y0, dy, nrows)
+                if edge_start[i] < edge_end[i]:
+                    row_starts[edge_start[i] + 1] += 1
+            j = i
+        for r in range(nrows):
+            row_starts[r + 1] += row_starts[r]
+            row_fill[r] = row_starts[r]
+        for i in range(nvert):
+            if edge_start[i] < edge_end[i]:
+                r = edge_start[i]
+                row_edges[row_fill[r]] = i
+                row_fill[r] += 1
+
+        nactive = 0
+        for r in range(nrows):
+            # update the active edges: drop the finished ones, add the new ones
+            a = 0
+            for e in range(nactive):
+                if edge_end[active[e]] > r:
+                    active[a] = active[e]
+                    a += 1
+            nactive = a
+            for e in range(row_starts[r], row_starts[r + 1]):
+                active[nactive] = row_edges[e]
+                nactive += 1
+
+            py = _cell_center(y0, dy, r)
+            for a in range(nactive):
+                i = active[a]
+                j = i - 1 if i > 0 else nvert - 1
+                crossings[a] = ((verts[j, 0] - verts[i, 0]) * (py - verts[i, 1])
+                                / (verts[j, 1] - verts[i, 1]) + verts[i, 0])
+            qsort(&crossings[0], nactive, sizeof(double), _compare_doubles)
+
+            # a cell is inside if an odd number of crossings are to the right
+            # of its center -- that flips at each crossing, and is zero at the end.
+            inside = nactive % 2
+            c = 0
+            for a in range(nactive):
+                c_next = _first_center_at_or_above(crossings[a], x0, dx, ncols)
+                if inside and c_next > c:
+                    memset(&res[r, c], 1, c_next - c)
+                c = c_next
+                inside = not inside
+
+    return result.view(dtype=np.bool_)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def signed_area(cnp.ndarray[double, ndim=2, mode="c"] polygon_verts):
+    """
+    Compute the signed area of the polygon defined by the vertices in pgon
+
+    :param polygon_verts: the vertices of the polygon
+    :type polygon_verts: NX2 numpy array of floats
+
+    :returns: area of the polygon as a float64
+
+    See: http://paulbourke.net/geometry/clockwise/
+    """
+
+    cdef unsigned int i, nvert
+    cdef double total
+
+    nvert = polygon_verts.shape[0]
+
+    total = ((polygon_verts[nvert - 1, 0] * polygon_verts[0, 1]) -
+             (polygon_verts[0, 0] * polygon_verts[nvert - 1, 1])
+             )  # last point to first point
+
+    for i in range(nvert - 1):
+        total += ((polygon_verts[i, 0] * polygon_verts[i + 1, 1]) -
+                  (polygon_verts[i + 1, 0] * polygon_verts[i, 1])
+                  )
+
+    return total / 2.0
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def polygon_centroid(cnp.ndarray[double, ndim=2, mode="c"] polygon_verts):
+    """
+    Return the (x, y) location of the polygon centroid
+
+    This is the "center of gravity" centroid -- it will not necessarily
+    fall inside the polygon for concave polygons.
+
+    INPUT
+    -----
+    polygon_verts:  (N,2) array of float64
+
+    OUTPUT
+    ------
+    xy_centroid:  (2,)
+
+    """
+
+    # this is computing the area and the centroids of each area segment at the
+    # same time so it is the same code as the area, with a bit of extra
+
+    cdef unsigned int i, nvert
+    cdef double area, a, x, y
+
+    nvert = polygon_verts.shape[0]
+    x = 0.0
+    y = 0.0
+
+    # last point to first point
+    # could probably do this by setting indexes smarter ...
+    # rather than duplicating code.
+    area = ((polygon_verts[nvert - 1, 0] * polygon_verts[0, 1])
+            - (polygon_verts[0, 0] * polygon_verts[nvert - 1, 1])
+            )
+    x += (polygon_verts[nvert - 1, 0] + polygon_verts[0, 0]) * area
+    y += (polygon_verts[nvert - 1, 1] + polygon_verts[0, 1]) * area
+
+    for i in range(nvert - 1):
+        a = ((polygon_verts[i, 0] * polygon_verts[i + 1, 1])
+             - (polygon_verts[i + 1, 0] * polygon_verts[i, 1])
+             )
+        area += a
+        x += (polygon_verts[i, 0] + polygon_verts[i + 1, 0]) * a
+        y += (polygon_verts[i, 1] + polygon_verts[i + 1, 1]) * a
+
+    area /= 2.0
+    x /= (6.0 * area)
+    y /= (6.0 * area)
+
+    return (x, y)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef double _area_and_centroid(const double[:, ::1] coords,
+                               Py_ssize_t start,
+                               Py_ssize_t stop,
+                               double *cx,
+                               double *cy) noexcept nogil:
+    """
+    the signed area of the polygon coords[start:stop] -- and its centroid,
+    if cx and cy are not NULL.
+
+    The sums are done in the same order as ``signed_area`` and
+    ``polygon_centroid``, so the results are exactly the same.
+    """
+    cdef Py_ssize_t i, last
+    cdef double area, a, x, y
+
+    if stop <= start:
+        if cx != NULL:
+            cx[0] = cy[0] = NAN
+        return 0.0
+
+    last = stop - 1
+    # last point to first point
+    area = (coords[last, 0] * coords[start, 1]) - (coords[start, 0] * coords[last, 1])
+    x = (coords[last, 0] + coords[start, 0]) * area
+    y = (coords[last, 1] + coords[start, 1]) * area
+    for i in range(start, last):
+        a = (coords[i, 0] * coords[i + 1, 1]) - (coords[i + 1, 0] * coords[i, 1])
+        area += a
+        x += (coords[i, 0] + coords[i + 1, 0]) * a
+        y += (coords[i, 1] + coords[i + 1, 1]) * a
+
+    area /= 2.0
+    if cx != NULL:
+        cx[0] = x / (6.0 * area)
+        cy[0] = y / (6.0 * area)
+    return area
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def polygons_area_centroid(cnp.ndarray[double, ndim=2, mode="c"] coords,
+                           offsets,
+                           bint centroids=True,
+                           n_threads=None):
+    """
+    Compute the signed areas (and centroids) of a collection of polygons
+
+    Same as ``signed_area`` and ``polygon_centroid`` for each polygon,
+    in one compiled loop.
+
+    :param coords: the vertices of all the polygons
+    :type coords: NX2 numpy array of floats
+
+    :param offsets: start of each polygon in coords, plus the end of the last one:
+                    polygon i is ``coords[offsets[i]:offsets[i + 1]]``
+    :type offsets: sequence of N + 1 integers
+
+    :param centroids=True: whether to compute the centroids too.
+
+    :param n_threads=None: number of threads to split the polygons across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :returns: (areas, centroids) -- a length N array of signed areas, and
+              a Nx2 array of centroids (None if centroids is False).
+              A polygon with no vertices has zero area and a NaN centroid.
+    """
+    np_offsets = np.ascontiguousarray(offsets, dtype=np.intp)
+    if (np_offsets.ndim != 1 or len(np_offsets) < 1
+            or np_offsets[0] < 0 or np_offsets[-1] > coords.shape[0]
+            or np.any(np.diff(np_offsets) < 0)):
+        raise ValueError("offsets must be increasing indexes into coords")
+
+    cdef Py_ssize_t i, N
+    cdef const Py_ssize_t[::1] a_offsets = np_offsets
+    cdef const double[:, ::1] a_coords = coords
+    cdef int num_threads = _num_threads(n_threads)
+
+    N = np_offsets.shape[0] - 1
+    areas = np.empty((N,), dtype=np.float64)
+    cdef double[::1] a_areas = areas
+    result_centroids = np.empty((N, 2), dtype=np.float64) if centroids else None
+    cdef double[:, ::1] a_centroids
+    if centroids:
+        a_centroids = result_centroids
+
+    with nogil:
+        if centroids:
+            if num_threads > 1:
+                for i in prange(N, num_threads=num_threads, schedule="static"):
+                    a_areas[i] = _area_and_centroid(a_coords, a_offsets[i], a_offsets[i + 1],
+                                                    &a_centroids[i, 0], &a_centroids[i, 1])
+            else:
+                for i in range(N):
+                    a_areas[i] = _area_and_centroid(a_coords, a_offsets[i], a_offsets[i + 1],
+                                                    &a_centroids[i, 0], &a_centroids[i, 1])
+        else:
+            if num_threads > 1:
+                for i in prange(N, num_threads=num_threads, schedule="static"):
+                    a_areas[i] = _area_and_centroid(a_coords, a_offsets[i], a_offsets[i + 1],
+                                                    NULL, NULL)
+            else:
+                for i in range(N):
+                    a_areas[i] = _area_and_centroid(a_coords, a_offsets[i], a_offsets[i + 1],
+                                                    NULL, NULL)
+
+    return areas, result_centroids
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void _polygon_properties(const double[:, ::1] coords,
+                              Py_ssize_t start,
+                              Py_ssize_t stop,
+                              double *props) noexcept nogil:
+    """
+    compute the properties of the polygon coords[start:stop] in one pass:
+
+    props = (signed area, centroid x, centroid y,
+             x min, y min, x max, y max, perimeter)
+
+    The area and centroid are the same sums as ``_area_and_centroid``,
+    with the bounding box and perimeter added on.
+    """
+    cdef Py_ssize_t i, last
+    cdef double area, a, x, y, xmin, ymin, xmax, ymax, perimeter, dx, dy
+
+    if stop <= start:
+        props[0] = 0.0
+        props[1] = props[2] = NAN
+        props[3] = props[4] = props[5] = props[6] = NAN
+        props[7] = 0.0
+        return
+
+    last = stop - 1
+    # last point to first point
+    area = (coords[last, 0] * coords[start, 1]) - (coords[start, 0] * coords[last, 1])
+    x = (coords[last, 0] + coords[start, 0]) * area
+    y = (coords[last, 1] + coords[start, 1]) * area
+    dx = coords[start, 0] - coords[last, 0]
+    dy = coords[start, 1] - coords[last, 1]
+    perimeter = sqrt(dx * dx + dy * dy)
+    xmin = xmax = coords[last, 0]
+    ymin = ymax = coords[last, 1]
+    for i in range(start, last):
+        a = (coords[i, 0] * coords[i + 1, 1]) - (coords[i + 1, 0] * coords[i, 1])
+        area += a
+        x += (coords[i, 0] + coords[i + 1, 0]) * a
+        y += (coords[i, 1] + coords[i + 1, 1]) * a
+        dx = coords[i + 1, 0] - coords[i, 0]
+        dy = coords[i + 1, 1] - coords[i, 1]
+        perimeter += sqrt(dx * dx + dy * dy)
+        if coords[i, 0] < xmin:
+            xmin = coords[i, 0]
+        if coords[i, 0] > xmax:
+            xmax = coords[i, 0]
+        if coords[i, 1] < ymin:
+            ymin = coords[i, 1]
+        if coords[i, 1] > ymax:
+            ymax = coords[i, 1]
+
+    area /= 2.0
+    props[0] = area
+    props[1] = x / (6.0 * area)
+    props[2] = y / (6.0 * area)
+    props[3] = xmin
+    props[4] = ymin
+    props[5] = xmax
+    props[6] = ymax
+    props[7] = perimeter
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def polygons_properties(cnp.ndarray[double, ndim=2, mode="c"] coords,
+                        offsets,
+                        n_threads=None):
+    """
+    Compute the area, centroid, bounding box and perimeter of a collection
+    of polygons, in one pass over the vertices of each.
+
+    :param coords: the vertices of all the polygons
+    :type coords: NX2 numpy array of floats
+
+    :param offsets: start of each polygon in coords, plus the end of the last one:
+                    polygon i is ``coords[offsets[i]:offsets[i + 1]]``
+    :type offsets: sequence of N + 1 integers
+
+    :param n_threads=None: number of threads to split the polygons across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :returns: a Nx8 array, each row:
+              (signed area, centroid x, centroid y,
+               x min, y min, x max, y max, perimeter)
+              The area and centroid are exactly the same as from ``signed_area``
+              and ``polygon_centroid``.
+    """
+    np_offsets = np.ascontiguousarray(offsets, dtype=np.intp)
+    if (np_offsets.ndim != 1 or len(np_offsets) < 1
+            or np_offsets[0] < 0 or np_offsets[-1] > coords.shape[0]
+            or np.any(np.diff(np_offsets) < 0)):
+        raise ValueError("offsets must be increasing indexes into coords")
+
+    cdef Py_ssize_t i, N
+    cdef const Py_ssize_t[::1] a_offsets = np_offsets
+    cdef const double[:, ::1] a_coords = coords
+    cdef int num_threads = _num_threads(n_threads)
+
+    N = np_offsets.shape[0] - 1
+    props = np.empty((N, 8), dtype=np.float64)
+    cdef double[:, ::1] a_props = props
+
+    with nogil:
+        if num_threads > 1:
+            for i in prange(N, num_threads=num_threads, schedule="static"):
+                _polygon_properties(a_coords, a_offsets[i], a_offsets[i + 1], &a_props[i, 0])
+        else:
+            for i in range(N):
+                _polygon_properties(a_coords, a_offsets[i], a_offsets[i + 1], &a_props[i, 0])
+
+    return props
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t _orient_ring(double[:, ::1] coords,
+                             Py_ssize_t start,
+                             Py_ssize_t stop,
+                             int direction) noexcept nogil:
+    """
+    reverse the ring coords[start:stop] in place, if it isn't going
+    the direction given: 1 for CCW (positive area), -1 for CW
+
+    :returns: 1 if it was reversed, 0 if not (or it has no area)
+    """
+    cdef double area, tmp
+    cdef Py_ssize_t i, j
+    area = _area_and_centroid(coords, start, stop, NULL, NULL)
+    if not ((area > 0.0 and direction < 0) or (area < 0.0 and direction > 0)):
+        return 0
+    i = start
+    j = stop - 1
+    while i < j:
+        tmp = coords[i, 0]
+        coords[i, 0] = coords[j, 0]
+        coords[j, 0] = tmp
+        tmp = coords[i, 1]
+        coords[i, 1] = coords[j, 1]
+        coords[j, 1] = tmp
+        i += 1
+        j -= 1
+    return 1
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def orient_rings(double[:, ::1] coords,
+                 ring_offsets,
+                 part_offsets=None,
+                 bint exterior_ccw=True,
+                 n_threads=None):
+    """
+    Make all the exterior rings of a collection of polygons go one way,
+    and all the holes the other, by reversing the wrong ones in place.
+
+    :param coords: the vertices of all the rings -- modified in place
+    :type coords: NX2 numpy array of floats (C-contiguous, writable)
+
+    :param ring_offsets: start of each ring in coords, plus the end of the last one:
+                         ring i is ``coords[ring_offsets[i]:ring_offsets[i + 1]]``
+
+    :param part_offsets=None: start of each polygon in the rings, plus the end:
+                              polygon j is rings ``part_offsets[j]:part_offsets[j + 1]``,
+                              the first is the exterior, the rest are holes.
+                              None means every ring is an exterior.
+
+    :param exterior_ccw=True: exterior rings are made counter-clockwise
+                              (positive area), and holes clockwise.
+                              If False, the other way around.
+
+    :param n_threads=None: number of threads to split the rings across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :returns: the number of rings that were reversed.
+              Rings with zero area are left alone.
+    """
+    np_ring_offsets = np.ascontiguousarray(ring_offsets, dtype=np.intp)
+    if (np_ring_offsets.ndim != 1 or len(np_ring_offsets) < 1
+            or np_ring_offsets[0] < 0 or np_ring_offsets[-1] > coords.shape[0]
+            or np.any(np.diff(np_ring_offsets) < 0)):
+        raise ValueError("ring_offsets must be increasing indexes into coords")
+    nrings = len(np_ring_offsets) - 1
+
+    # the direction each ring should go
+    if part_offsets is None:
+        np_directions = np.ones((nrings,), dtype=np.intc)
+    else:
+        np_part_offsets = np.ascontiguousarray(part_offsets, dtype=np.intp)
+        if (np_part_offsets.ndim != 1 or len(np_part_offsets) < 1
+                or np_part_offsets[0] < 0 or np_part_offsets[-1] > nrings
+                or np.any(np.diff(np_part_offsets) < 0)):
+            raise ValueError("part_offsets must be increasing indexes into the rings")
+        np_directions = np.full((nrings,), -1, dtype=np.intc)
+        np_directions[np_part_offsets[:-1][np.diff(np_part_offsets) > 0]] = 1
+    if not exterior_ccw:
+        np_directions = -np_directions
+
+    cdef Py_ssize_t i, count = 0
+    cdef const Py_ssize_t[::1] a_offsets = np_ring_offsets
+    cdef const int[::1] directions = np_directions
+    cdef int num_threads = _num_threads(n_threads)
+
+    with nogil:
+        if num_threads > 1:
+            for i in prange(nrings, num_threads=num_threads, schedule="static"):
+                count += _orient_ring(coords, a_offsets[i], a_offsets[i + 1], directions[i])
+        else:
+            for i in range(nrings):
+                count += _orient_ring(coords, a_offsets[i], a_offsets[i + 1], directions[i])
+
+    return count
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def is_convex(cnp.ndarray[double, ndim=2, mode="c"] polygon_verts):
+    """
+    Check whether a polygon is convex
+
+    All the turns must be the same way (collinear vertices and repeated
+    vertices are OK), and the edges must go around only once.
+
+    :param polygon_verts: the vertices of the polygon
+    :type polygon_verts: NX2 numpy array of floats
+
+    :returns: True if it's convex. A polygon with no area (or a NaN) isn't.
+    """
+    cdef Py_ssize_t i, nvert
+    cdef double dx, dy, prev_dx, prev_dy, cross
+    cdef int sign = 0, x_changes = 0, y_changes = 0
+    cdef int x_dir, y_dir, prev_x_dir = 0, prev_y_dir = 0, first_x_dir = 0, first_y_dir = 0
+
+    nvert = polygon_verts.shape[0]
+    if nvert < 3:
+        return False
+
+    # the last real edge, to start from
+    prev_dx = prev_dy = 0.0
+    for i in range(nvert - 1, 0, -1):
+        prev_dx = polygon_verts[0, 0] - polygon_verts[i, 0]
+        prev_dy = polygon_verts[0, 1] - polygon_verts[i, 1]
+        if prev_dx != 0.0 or prev_dy != 0.0:
+            break
+
+    for i in range(nvert):
+        dx = polygon_verts[(i + 1) % nvert, 0] - polygon_verts[i, 0]
+        dy = polygon_verts[(i + 1) % nvert, 1] - polygon_verts[i, 1]
+        if dx != dx or dy != dy:
+            return False  # NaN
+        if dx == 0.0 and dy == 0.0:
+            continue  # repeated vertex
+        cross = prev_dx * dy - prev_dy * dx
+        if cross > 0.0:
+            if sign < 0:
+                return False
+            sign = 1
+        elif cross < 0.0:
+            if sign > 0:
+                return False
+            sign = -1
+        # a convex polygon changes direction in x and y only twice each
+        x_dir = (dx > 0.0) - (dx < 0.0)
+        if x_dir != 0:
+            if first_x_dir == 0:
+                first_x_dir = x_dir
+            elif x_dir != prev_x_dir:
+                x_changes += 1
+            prev_x_dir = x_dir
+        y_dir = (dy > 0.0) - (dy < 0.0)
+        if y_dir != 0:
+            if first_y_dir == 0:
+                first_y_dir = y_dir
+            elif y_dir != prev_y_dir:
+                y_changes += 1
+            prev_y_dir = y_dir
+        prev_dx = dx
+        prev_dy = dy
+    if prev_x_dir != first_x_dir:
+        x_changes += 1
+    if prev_y_dir != first_y_dir:
+        y_changes += 1
+    return sign != 0 and x_changes <= 2 and y_changes <= 2
+
+
+# Sweep lines for simple polygons and self intersections
+#
+# The segments crossing the sweep line are kept in a treap, ordered by
+# their y at the sweep line. The links are in flat arrays, indexed by node,
+# so nothing is allocated while sweeping. Each segment has a node, but they
+# can be swapped when segments cross.
+
+cdef struct _SweepEvent:
+    double x
+    double y
+    int kind  # 0 is the left end of the segment, 1 the right, 2 a crossing
+    Py_ssize_t seg
+    Py_ssize_t other  # the segment above seg, for a crossing
+
+
+cdef struct _SweepStatus:
+    Py_ssize_t root
+    Py_ssize_t *left
+    Py_ssize_t *right
+    Py_ssize_t *parent
+    unsigned int *prio
+    Py_ssize_t *seg  # the segment at each node
+    Py_ssize_t *node  # the node of each segment
+    # the ends of each segment, left (lexicographically smaller) first
+    double *lx
+    double *ly
+    double *rx
+    double *ry
+
+
+cdef int _compare_events(const void *a, const void *b) noexcept nogil:
+    """
+    events go left to right, then bottom to top, with the segments
+    starting at a point before the ones ending there, and crossings last
+    """
+    cdef const _SweepEvent *ea = <const _SweepEvent *>a
+    cdef const _SweepEvent *eb = <const _SweepEvent *>b
+    if ea.x != eb.x:
+        return (ea.x > eb.x) - (ea.x < eb.x)
+    if ea.y != eb.y:
+        return (ea.y > eb.y) - (ea.y < eb.y)
+    if ea.kind != eb.kind:
+        return ea.kind - eb.kind
+    return (ea.seg > eb.seg) - (ea.seg < eb.seg)
+
+
+cdef Py_ssize_t _sweep_alloc(_SweepStatus *st, Py_ssize_t nseg,
+                             Py_ssize_t nevents, _SweepEvent **events) noexcept nogil:
+    """
+    allocate the sweep status for nseg segments, and room for nevents events,
+    all in one block -- free it with free(events[0])
+
+    :returns: 0, or -1 if out of memory
+    """
+    cdef Py_ssize_t i
+    cdef unsigned int rand = 2463534242u
+    cdef char *mem = <char *>malloc(nevents * sizeof(_SweepEvent)
+                                    + nseg * (5 * sizeof(Py_ssize_t) + sizeof(unsigned int)
+                                              + 4 * sizeof(double)))
+    if mem == NULL:
+        return -1
+    events[0] = <_SweepEvent *>mem
+    st.lx = <double *>(events[0] + nevents)
+    st.ly = st.lx + nseg
+    st.rx = st.ly + nseg
+    st.ry = st.rx + nseg
+    st.left = <Py_ssize_t *>(st.ry + nseg)
+    st.right = st.left + nseg
+    st.parent = st.right + nseg
+    st.seg = st.parent + nseg
+    st.node = st.seg + nseg
+    st.prio = <unsigned int *>(st.node + nseg)
+    st.root = -1
+    for i in range(nseg):
+        st.seg[i] = st.node[i] = i
+        # xorshift -- the treap just needs them scattered
+        rand ^= rand << 13
+        rand ^= rand >> 17
+        rand ^= rand << 5
+        st.prio[i] = rand
+    return 0
+
+
+cdef void _sweep_segment(_SweepStatus *st, _SweepEvent *events, Py_ssize_t s,
+                         double x0, double y0, double x1, double y1) noexcept nogil:
+    """
+    set segment s, and the events for its ends
+    """
+    if x1 < x0 or (x1 == x0 and y1 < y0):
+        x0, y0, x1, y1 = x1, y1, x0, y0
+    st.lx[s] = x0
+    st.ly[s] = y0
+    st.rx[s] = x1
+    st.ry[s] = y1
+    events[0].x = x0
+    events[0].y = y0
+    events[0].kind = 0
+    events[0].seg = s
+    events[0].other = -1
+    events[1].x = x1
+    events[1].y = y1
+    events[1].kind = 1
+    events[1].seg = s
+    events[1].other = -1
+
+
+@cython.cdivision(True)
+cdef inline double _y_at(_SweepStatus *st, Py_ssize_t s, double px, double py) noexcept nogil:
+    """
+    y of segment s where it crosses the sweep line at (px, py)
+
+    A vertical segment is at py, or the end of it closest to py.
+    """
+    if st.lx[s] == st.rx[s]:
+        return max(st.ly[s], min(py, st.ry[s]))
+    if px == st.lx[s]:
+        return st.ly[s]
+    if px == st.rx[s]:
+        return st.ry[s]
+    return st.ly[s] + (px - st.lx[s]) * (st.ry[s] - st.ly[s]) / (st.rx[s] - st.lx[s])
+
+
+cdef bint _below(_SweepStatus *st, Py_ssize_t s, Py_ssize_t t,
+                 double px, double py) noexcept nogil:
+    """
+    is segment s below segment t on the sweep line at (px, py)?
+
+    Segments through the same point are ordered by their slope to the right
+    of it, then by index, so the order is always the same.
+    """
+    cdef double ys = _y_at(st, s, px, py)
+    cdef double yt = _y_at(st, t, px, py)
+    cdef double cross
+    if ys != yt:
+        return ys < yt
+    cross = ((st.rx[s] - st.lx[s]) * (st.ry[t] - st.ly[t])
+             - (st.ry[s] - st.ly[s]) * (st.rx[t] - st.lx[t]))
+    if cross != 0.0:
+        return cross > 0.0
+    return s < t
+
+
+cdef void _rotate_up(_SweepStatus *st, Py_ssize_t n) noexcept nogil:
+    """
+    rotate node n above its parent
+    """
+    cdef Py_ssize_t p = st.parent[n]
+    cdef Py_ssize_t g = st.parent[p]
+    if st.left[p] == n:
+        st.left[p] = st.right[n]
+        if st.right[n] != -1:
+            st.parent[st.right[n]] = p
+        st.right[n] = p
+    else:
+        st.right[p] = st.left[n]
+        if st.left[n] != -1:
+            st.parent[st.left[n]] = p
+        st.left[n] = p
+    st.parent[p] = n
+    st.parent[n] = g
+    if g == -1:
+        st.root = n
+    elif st.left[g] == p:
+        st.left[g] = n
+    else:
+        st.right[g] = n
+
+
+cdef void _status_insert(_SweepStatus *st, Py_ssize_t s,
+                         double px, double py) noexcept nogil:
+    """
+    add segment s, which starts at (px, py) (or goes through it)
+    """
+    cdef Py_ssize_t n = st.node[s], cur = st.root, prev = -1
+    cdef bint go_left = False
+    st.left[n] = st.right[n] = -1
+    while cur != -1:
+        prev = cur
+        go_left = _below(st, s, st.seg[cur], px, py)
+        cur = st.left[cur] if go_left else st.right[cur]
+    st.parent[n] = prev
+    if prev == -1:
+        st.root = n
+    elif go_left:
+        st.left[prev] = n
+    else:
+        st.right[prev] = n
+    while st.parent[n] != -1 and st.prio[st.parent[n]] < st.prio[n]:
+        _rotate_up(st, n)
+
+
+cdef void _status_remove(_SweepStatus *st, Py_ssize_t s) noexcept nogil:
+    cdef Py_ssize_t c, p, n = st.node[s]
+    # rotate it down to a leaf, then cut it off
+    while st.left[n] != -1 or st.right[n] != -1:
+        if st.left[n] == -1:
+            c = st.right[n]
+        elif st.right[n] == -1:
+            c = st.left[n]
+        elif st.prio[st.left[n]] > st.prio[st.right[n]]:
+            c = st.left[n]
+        else:
+            c = st.right[n]
+        _rotate_up(st, c)
+    p = st.parent[n]
+    if p == -1:
+        st.root = -1
+    elif st.left[p] == n:
+        st.left[p] = -1
+    else:
+        st.right[p] = -1
+
+
+cdef void _status_swap(_SweepStatus *st, Py_ssize_t s, Py_ssize_t t) noexcept nogil:
+    """
+    swap the places of segments s and t -- where they cross
+    """
+    cdef Py_ssize_t ns = st.node[s], nt = st.node[t]
+    st.seg[ns] = t
+    st.seg[nt] = s
+    st.node[s] = nt
+    st.node[t] = ns
+
+
+cdef Py_ssize_t _status_prev(_SweepStatus *st, Py_ssize_t s) noexcept nogil:
+    """
+    the segment just below s, or -1
+    """
+    cdef Py_ssize_t n = st.node[s]
+    if st.left[n] != -1:
+        n = st.left[n]
+        while st.right[n] != -1:
+            n = st.right[n]
+        return st.seg[n]
+    while st.parent[n] != -1 and st.left[st.parent[n]] == n:
+        n = st.parent[n]
+    n = st.parent[n]
+    return -1 if n == -1 else st.seg[n]
+
+
+cdef Py_ssize_t _status_next(_SweepStatus *st, Py_ssize_t s) noexcept nogil:
+    """
+    the segment just above s, or -1
+    """
+    cdef Py_ssize_t n = st.node[s]
+    if st.right[n] != -1:
+        n = st.right[n]
+        while st.left[n] != -1:
+            n = st.left[n]
+        return st.seg[n]
+    while st.parent[n] != -1 and st.right[st.parent[n]] == n:
+        n = st.parent[n]
+    n = st.parent[n]
+    return -1 if n == -1 else st.seg[n]
+
+
+cdef inline double _orient(double x1, double y1, double x2, double y2,
+                           double px, double py) noexcept nogil:
+    """
+    the same as cy_line_crossings.side_of_line: > 0 if P is left of 1 -> 2
+    """
+    return (x2 - x1) * (py - y1) - (y2 - y1) * (px - x1)
+
+
+cdef bint _segments_touch(double ax, double ay, double bx, double by,
+                          double cx, double cy, double dx, double dy) noexcept nogil:
+    """
+    do segments a-b and c-d have any point in common?
+
+    The same test as c_segment_cross, except that collinear segments
+    only touch if they overlap.
+    """
+    cdef double d1 = _orient(ax, ay, bx, by, cx, cy)
+    cdef double d2 = _orient(ax, ay, bx, by, dx, dy)
+    cdef double d3, d4
+    if d1 * d2 > 0.0:
+        return False
+    d3 = _orient(cx, cy, dx, dy, ax, ay)
+    d4 = _orient(cx, cy, dx, dy, bx, by)
+    if d3 * d4 > 0.0:
+        return False
+    if d1 == 0.0 and d2 == 0.0:
+        # collinear: check that they overlap
+        return (max(min(ax, bx), min(cx, dx)) <= min(max(ax, bx), max(cx, dx))
+                and max(min(ay, by), min(cy, dy)) <= min(max(ay, by), max(cy, dy)))
+    return True
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef bint _ring_edges_touch(const double[:, ::1] coords, Py_ssize_t start,
+                            Py_ssize_t nseg, Py_ssize_t i, Py_ssize_t j) noexcept nogil:
+    """
+    do edges i and j of the ring at coords[start:start + nseg] touch anywhere
+    they shouldn't?
+
+    Edge i goes from vertex i to vertex i + 1. Edges next to each other
+    share a vertex, so only touch if they fold back over each other.
+    """
+    cdef Py_ssize_t a, b, c, d, tmp
+    if i > j:
+        tmp = i
+        i = j
+        j = tmp
+    a = start + i
+    b = start + (i + 1) % nseg
+    c = start + j
+    d = start + (j + 1) % nseg
+    if j == i + 1 or (i == 0 and j == nseg - 1):
+        if j != i + 1:
+            # the last edge ends where the first starts
+            a, b, c, d = c, d, a, b
+        # b == c is the shared vertex: a fold back is a and d the same way from it
+        return (_orient(coords[b, 0], coords[b, 1], coords[a, 0], coords[a, 1],
+                        coords[d, 0], coords[d, 1]) == 0.0
+                and ((coords[a, 0] - coords[b, 0]) * (coords[d, 0] - coords[b, 0])
+                     + (coords[a, 1] - coords[b, 1]) * (coords[d, 1] - coords[b, 1])) > 0.0)
+    return _segments_touch(coords[a, 0], coords[a, 1], coords[b, 0], coords[b, 1],
+                           coords[c, 0], coords[c, 1], coords[d, 0], coords[d, 1])
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _ring_is_simple(const double[:, ::1] coords,
+                         Py_ssize_t start,
+                         Py_ssize_t stop) noexcept nogil:
+    """
+    Shamos-Hoey check of whether the ring at coords[start:stop] is simple:
+    whether any of its edges touch, other than at the shared vertices.
+
+    The ring may or may not repeat the first vertex at the end.
+
+    :returns: 1 if it's simple, 0 if not, -1 if out of memory.
+    """
+    cdef Py_ssize_t nseg, i, k, s, a, b, v
+    cdef _SweepStatus st
+    cdef _SweepEvent *events
+    cdef int result = 1
+
+    if stop - start > 1 and (coords[start, 0] == coords[stop - 1, 0]
+                             and coords[start, 1] == coords[stop - 1, 1]):
+        stop -= 1
+    nseg = stop - start
+    if nseg < 3:
+        return 0
+    # repeated vertices and NaNs aren't simple
+    for i in range(start, stop):
+        v = start + (i - start + 1) % nseg
+        if (coords[i, 0] != coords[i, 0] or coords[i, 1] != coords[i, 1]
+                or (coords[i, 0] == coords[v, 0] and coords[i, 1] == coords[v, 1])):
+            return 0
+
+    if _sweep_alloc(&st, nseg, 2 * nseg, &events) < 0:
+        return -1
+    for s in range(nseg):
+        v = start + (s + 1) % nseg
+        _sweep_segment(&st, &events[2 * s], s, coords[start + s, 0], coords[start + s, 1],
+                       coords[v, 0], coords[v, 1])
+    qsort(events, 2 * nseg, sizeof(_SweepEvent), _compare_events)
+
+    for k in range(2 * nseg):
+        s = events[k].seg
+        if events[k].kind == 0:
+            _status_insert(&st, s, events[k].x, events[k].y)
+            a = _status_prev(&st, s)
+            b = _status_next(&st, s)
+            if ((a != -1 and _ring_edges_touch(coords, start, nseg, s, a))
+                    or (b != -1 and _ring_edges_touch(coords, start, nseg, s, b))):
+                result = 0
+                break
+        else:
+            a = _status_prev(&st, s)
+            b = _status_next(&st, s)
+            _status_remove(&st, s)
+            if a != -1 and b != -1 and _ring_edges_touch(coords, start, nseg, a, b):
+                result = 0
+                break
+    free(events)
+    return result
+
+
+def is_simple(const double[:, ::1] polygon_verts):
+    """
+    Check whether a polygon is simple: none of its edges cross or touch,
+    other than neighboring edges at their shared vertex.
+
+    Uses the Shamos-Hoey sweep line algorithm, so is O(N log N).
+
+    :param polygon_verts: the vertices of the polygon -- the first may be
+                          repeated at the end, or not.
+    :type polygon_verts: NX2 numpy array of floats
+
+    :returns: True if it's simple. Fewer than 3 distinct edges, repeated
+              vertices and NaNs aren't.
+    """
+    cdef int result
+    with nogil:
+        result = _ring_is_simple(polygon_verts, 0, polygon_verts.shape[0])
+    if result < 0:
+        raise MemoryError()
+    return bool(result)
+
+
+# Bentley-Ottmann sweep for all the self intersections
+#
+# The same sweep as Shamos-Hoey, but it carries on past the crossings:
+# each is an event where the two segments swap places. All the segments
+# through an end point are dealt with at once, so any number of them can
+# touch there.
+
+cdef struct _Crossings:
+    Py_ssize_t n
+    Py_ssize_t size
+    Py_ssize_t *pairs
+    double *points
+
+
+cdef int _crossings_add(_Crossings *found, Py_ssize_t s, Py_ssize_t t,
+                        double x, double y) noexcept nogil:
+    """
+    add segments s and t crossing at (x, y)
+
+    :returns: 0, or -1 if out of memory
+    """
+    cdef Py_ssize_t *pairs
+    cdef double *points
+    if found.n == found.size:
+        found.size = 2 * found.size + 64
+        pairs = <Py_ssize_t *>realloc(found.pairs, 2 * found.size * sizeof(Py_ssize_t))
+        if pairs == NULL:
+            return -1
+        found.pairs = pairs
+        points = <double *>realloc(found.points, 2 * found.size * sizeof(double))
+        if points == NULL:
+            return -1
+        found.points = points
+    found.pairs[2 * found.n] = min(s, t)
+    found.pairs[2 * found.n + 1] = max(s, t)
+    found.points[2 * found.n] = x
+    found.points[2 * found.n + 1] = y
+    found.n += 1
+    return 0
+
+
+cdef int _heap_push(_SweepEvent **heap, Py_ssize_t *n, Py_ssize_t *size,
+                    _SweepEvent *event) noexcept nogil:
+    """
+    add an event to the heap of crossings, in _compare_events order
+
+    :returns: 0, or -1 if out of memory
+    """
+    cdef _SweepEvent *new_heap
+    cdef Py_ssize_t i, parent
+    if n[0] == size[0]:
+        size[0] = 2 * size[0] + 64
+        new_heap = <_SweepEvent *>realloc(heap[0], size[0] * sizeof(_SweepEvent))
+        if new_heap == NULL:
+            return -1
+        heap[0] = new_heap
+    i = n[0]
+    n[0] += 1
+    while i > 0:
+        parent = (i - 1) // 2
+        if _compare_events(&heap[0][parent], event) <= 0:
+            break
+        heap[0][i] = heap[0][parent]
+        i = parent
+    heap[0][i] = event[0]
+    return 0
+
+
+cdef void _heap_pop(_SweepEvent *heap, Py_ssize_t *n, _SweepEvent *event) noexcept nogil:
+    """
+    take the first event off the heap
+    """
+    cdef Py_ssize_t i = 0, child
+    cdef _SweepEvent last
+    event[0] = heap[0]
+    n[0] -= 1
+    last = heap[n[0]]
+    while True:
+        child = 2 * i + 1
+        if child >= n[0]:
+            break
+        if child + 1 < n[0] and _compare_events(&heap[child + 1], &heap[child]) < 0:
+            child += 1
+        if _compare_events(&last, &heap[child]) <= 0:
+            break
+        heap[i] = heap[child]
+        i = child
+    heap[i] = last
+
+
+@cython.cdivision(True)
+cdef bint _proper_crossing(_SweepStatus *st, Py_ssize_t s, Py_ssize_t t,
+                           double *x, double *y) noexcept nogil:
+    """
+    does segment s, just below segment t, cross it further on?
+
+    Only crossings through the middle of both -- touching is found at
+    the end points.
+
+    :returns: True if it does, with the crossing point in x, y
+    """
+    cdef double d1, d2, d3, d4, frac
+    d1 = _orient(st.lx[s], st.ly[s], st.rx[s], st.ry[s], st.lx[t], st.ly[t])
+    d2 = _orient(st.lx[s], st.ly[s], st.rx[s], st.ry[s], st.rx[t], st.ry[t])
+    if not d1 * d2 < 0.0:
+        return False
+    d3 = _orient(st.lx[t], st.ly[t], st.rx[t], st.ry[t], st.lx[s], st.ly[s])
+    d4 = _orient(st.lx[t], st.ly[t], st.rx[t], st.ry[t], st.rx[s], st.ry[s])
+    # s has to end up above t -- otherwise they've already crossed
+    if not (d3 < 0.0 and d4 > 0.0):
+        return False
+    frac = d3 / (d3 - d4)
+    x[0] = st.lx[s] + frac * (st.rx[s] - st.lx[s])
+    y[0] = st.ly[s] + frac * (st.ry[s] - st.ly[s])
+    return True
+
+
+cdef int _check_crossing(_SweepStatus *st, Py_ssize_t s, Py_ssize_t t,
+                         double px, double py,
+                         _SweepEvent **heap, Py_ssize_t *nheap, Py_ssize_t *size) noexcept nogil:
+    """
+    add a crossing event if s, just below t, crosses it -- not before (px, py)
+
+    :returns: 0, or -1 if out of memory
+    """
+    cdef _SweepEvent event
+    if s == -1 or t == -1:
+        return 0
+    if not _proper_crossing(st, s, t, &event.x, &event.y):
+        return 0
+    if event.x < px or (event.x == px and event.y < py):
+        # round off put it behind the sweep line
+        event.x = px
+        event.y = py
+    event.kind = 2
+    event.seg = s
+    event.other = t
+    return _heap_push(heap, nheap, size, &event)
+
+
+cdef inline bint _contains(_SweepStatus *st, Py_ssize_t s, double px, double py) noexcept nogil:
+    """
+    is (px, py) on segment s? -- which is on the sweep line, so has px in range
+    """
+    return _orient(st.lx[s], st.ly[s], st.rx[s], st.ry[s], px, py) == 0.0
+
+
+cdef Py_ssize_t _status_lowest_at(_SweepStatus *st, double px, double py) noexcept nogil:
+    """
+    the lowest segment on the sweep line that goes through (px, py) or
+    above it, or -1 if they're all below
+    """
+    cdef Py_ssize_t n = st.root, found = -1, s
+    while n != -1:
+        s = st.seg[n]
+        if not _contains(st, s, px, py) and _y_at(st, s, px, py) < py:
+            n = st.right[n]
+        else:
+            found = s
+            n = st.left[n]
+    return found
+
+
+cdef Py_ssize_t _status_last(_SweepStatus *st) noexcept nogil:
+    """
+    the highest segment on the sweep line, or -1
+    """
+    cdef Py_ssize_t n = st.root
+    if n == -1:
+        return -1
+    while st.right[n] != -1:
+        n = st.right[n]
+    return st.seg[n]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _touch_at(const double[:, ::1] verts, Py_ssize_t nseg, bint closed,
+                   Py_ssize_t i, Py_ssize_t j, double px, double py,
+                   _Crossings *found) noexcept nogil:
+    """
+    add segments i and j, which both go through (px, py), to found --
+    unless they are neighbors that just share a vertex
+
+    :returns: 0, or -1 if out of memory
+    """
+    cdef Py_ssize_t nvert = verts.shape[0], a, b, d, tmp
+    if i > j:
+        tmp = i
+        i = j
+        j = tmp
+    if j == i + 1 or (closed and i == 0 and j == nseg - 1):
+        # b is the shared vertex: they only touch if they fold back over each other
+        if j == i + 1:
+            a = i
+            b = j
+            d = (j + 1) % nvert
+        else:
+            a = j
+            b = 0
+            d = 1
+        if not (_orient(verts[b, 0], verts[b, 1], verts[a, 0], verts[a, 1],
+                        verts[d, 0], verts[d, 1]) == 0.0
+                and ((verts[a, 0] - verts[b, 0]) * (verts[d, 0] - verts[b, 0])
+                     + (verts[a, 1] - verts[b, 1]) * (verts[d, 1] - verts[b, 1])) > 0.0):
+            return 0
+        px = verts[b, 0]
+        py = verts[b, 1]
+    return _crossings_add(found, i, j, px, py)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _self_intersections(const double[:, ::1] verts, bint closed,
+                             _Crossings *found) noexcept nogil:
+    """
+    Bentley-Ottmann sweep for where the segments of a polyline (or ring,
+    if closed) cross or touch each other. Segment i goes from vertex i to i + 1.
+
+    Collinear segments that overlap are found at each end point in the
+    overlap, so may be in found more than once.
+
+    :returns: 0, or -1 if out of memory
+    """
+    cdef Py_ssize_t nvert = verts.shape[0], nseg, nevents, s, t, v, k = 0
+    cdef Py_ssize_t nheap = 0, heap_size = 0, ngroup, nstart, ninserted, a, b, below, above
+    cdef _SweepStatus st
+    cdef _SweepEvent *events
+    cdef _SweepEvent *heap = NULL
+    cdef _SweepEvent crossing
+    cdef Py_ssize_t *group
+    cdef char *active
+    cdef double px, py, qx, qy
+    cdef int err = 0
+
+    nseg = nvert if closed else nvert - 1
+    if nseg < 1:
+        return 0
+    nevents = 2 * nseg
+    if _sweep_alloc(&st, nseg, nevents, &events) < 0:
+        return -1
+    group = <Py_ssize_t *>malloc(nseg * sizeof(Py_ssize_t))
+    active = <char *>malloc(nseg)
+    if group == NULL or active == NULL:
+        free(events)
+        free(group)
+        free(active)
+        return -1
+    memset(active, 0, nseg)
+    for s in range(nseg):
+        v = (s + 1) % nvert
+        _sweep_segment(&st, &events[2 * s], s, verts[s, 0], verts[s, 1], verts[v, 0], verts[v, 1])
+    qsort(events, nevents, sizeof(_SweepEvent), _compare_events)
+
+    while (k < nevents or nheap > 0) and err == 0:
+        if nheap > 0 and (k == nevents or _compare_events(&heap[0], &events[k]) < 0):
+            # two segments crossing: they swap places
+            _heap_pop(heap, &nheap, &crossing)
+            s = crossing.seg
+            t = crossing.other
+            if not (active[s] and active[t]) or _status_next(&st, s) != t:
+                continue  # something got between them, or they've already swapped
+            _status_swap(&st, s, t)
+            _proper_crossing(&st, s, t, &qx, &qy)
+            err = _crossings_add(found, s, t, qx, qy)
+            if err == 0:
+                err = _check_crossing(&st, _status_prev(&st, t), t, crossing.x, crossing.y,
+                                      &heap, &nheap, &heap_size)
+            if err == 0:
+                err = _check_crossing(&st, s, _status_next(&st, s), crossing.x, crossing.y,
+                                      &heap, &nheap, &heap_size)
+            continue
+
+        # all the segments starting, ending or passing through an end point
+        px = events[k].x
+        py = events[k].y
+        nstart = 0
+        while k < nevents and events[k].x == px and events[k].y == py:
+            if events[k].kind == 0:
+                group[nstart] = events[k].seg
+                nstart += 1
+            k += 1
+        ngroup = nstart
+        s = _status_lowest_at(&st, px, py)
+        below = _status_last(&st) if s == -1 else _status_prev(&st, s)
+        while s != -1 and _contains(&st, s, px, py):
+            group[ngroup] = s
+            ngroup += 1
+            s = _status_next(&st, s)
+        above = s
+
+        for a in range(ngroup):
+            for b in range(a + 1, ngroup):
+                if err == 0:
+                    err = _touch_at(verts, nseg, closed, group[a], group[b], px, py, found)
+
+        # take out the ones on the sweep line, and put back the ones carrying on,
+        # in their order to the right of the point
+        for a in range(nstart, ngroup):
+            _status_remove(&st, group[a])
+            active[group[a]] = 0
+        ninserted = 0
+        for a in range(ngroup):
+            s = group[a]
+            if st.rx[s] == px and st.ry[s] == py:
+                continue
+            _status_insert(&st, s, px, py)
+            active[s] = 1
+            ninserted += 1
+        if ninserted == 0:
+            if err == 0:
+                err = _check_crossing(&st, below, above, px, py, &heap, &nheap, &heap_size)
+        else:
+            for a in range(ngroup):
+                s = group[a]
+                if active[s] and err == 0:
+                    err = _check_crossing(&st, _status_prev(&st, s), s, px, py,
+                                          &heap, &nheap, &heap_size)
+                if active[s] and err == 0:
+                    err = _check_crossing(&st, s, _status_next(&st, s), px, py,
+                                          &heap, &nheap, &heap_size)
+
+    free(events)
+    free(heap)
+    free(group)
+    free(active)
+    return err
+
+
+def self_intersections(const double[:, ::1] verts, bint closed=True):
+    """
+    Find where the segments of a polyline, or polygon, cross or touch each other.
+
+    Uses the Bentley-Ottmann sweep line algorithm, so is O((N + K) log N)
+    for K crossings.
+
+    :param verts: the vertices
+    :type verts: NX2 numpy array of floats
+
+    :param closed=True: If True, it's a polygon: the last vertex joins
+                        back to the first (which may be repeated at the end, or not).
+                        If False, it's an open polyline.
+
+    :returns: pairs, points: the segments that cross, and where.
+              Segment i goes from vertex i to vertex i + 1.
+
+              pairs is a Kx2 array of segment indexes, each pair in order,
+              and sorted. points is a Kx2 array of floats. Neighboring segments
+              only count if they fold back over each other, at their shared vertex.
+              Overlapping segments are at the first point they share.
+    """
+    cdef _Crossings found
+    cdef Py_ssize_t nvert = verts.shape[0]
+    cdef Py_ssize_t[:, ::1] a_pairs
+    cdef double[:, ::1] a_points
+    cdef int err
+    if np.isnan(verts).any():
+        raise ValueError("vertices can't be NaN")
+    if closed and nvert > 1 and verts[0, 0] == verts[nvert - 1, 0] and verts[0, 1] == verts[nvert - 1, 1]:
+        verts = verts[:nvert - 1]
+    found.n = found.size = 0
+    found.pairs = NULL
+    found.points = NULL
+    with nogil:
+        err = _self_intersections(verts, closed, &found)
+    try:
+        if err < 0:
+            raise MemoryError()
+        pairs = np.empty((found.n, 2), dtype=np.intp)
+        points = np.empty((found.n, 2), dtype=np.float64)
+        a_pairs = pairs
+        a_points = points
+        if found.n > 0:
+            memcpy(&a_pairs[0, 0], found.pairs, 2 * found.n * sizeof(Py_ssize_t))
+            memcpy(&a_points[0, 0], found.points, 2 * found.n * sizeof(double))
+    finally:
+        free(found.pairs)
+        free(found.points)
+    # overlapping segments are found more than once -- keep the first
+    pairs, first = np.unique(pairs, axis=0, return_index=True)
+    return pairs.reshape(-1, 2), points[first]
+
+
+# the problems validate_polygons finds, as bits in its flags
+cpdef enum:
+    TOO_FEW_VERTICES = 1
+    ZERO_AREA = 2
+    REPEATED_VERTICES = 4
+    NOT_SIMPLE = 8
+    NOT_FINITE = 16
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _validate_polygon(const double[:, ::1] coords,
+                           Py_ssize_t start,
+                           Py_ssize_t stop) noexcept nogil:
+    """
+    the validate_polygons flags for the polygon at coords[start:stop]
+
+    :returns: the flags, or -1 if out of memory
+    """
+    cdef Py_ssize_t i, v, nvert
+    cdef int flags = 0, simple
+    cdef double area
+
+    for i in range(start, stop):
+        if not (isfinite(coords[i, 0]) and isfinite(coords[i, 1])):
+            return NOT_FINITE | NOT_SIMPLE
+    area = _area_and_centroid(coords, start, stop, NULL, NULL)
+    if area == 0.0:
+        flags |= ZERO_AREA
+
+    nvert = stop - start
+    if nvert > 1 and (coords[start, 0] == coords[stop - 1, 0]
+                      and coords[start, 1] == coords[stop - 1, 1]):
+        nvert -= 1
+    if nvert < 3:
+        return flags | TOO_FEW_VERTICES | NOT_SIMPLE
+    for i in range(start, start + nvert):
+        v = start + (i - start + 1) % nvert
+        if coords[i, 0] == coords[v, 0] and coords[i, 1] == coords[v, 1]:
+            return flags | REPEATED_VERTICES | NOT_SIMPLE
+
+    simple = _ring_is_simple(coords, start, stop)
+    if simple < 0:
+        return -1
+    if not simple:
+        flags |= NOT_SIMPLE
+    return flags
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def validate_polygons(const double[:, ::1] coords,
+                      offsets,
+                      n_threads=None):
+    """
+    Check a collection of polygons for the usual problems
+
+    :param coords: the vertices of all the polygons
+    :type coords: NX2 numpy array of floats
+
+    :param offsets: start of each polygon in coords, plus the end of the last one:
+                    polygon i is ``coords[offsets[i]:offsets[i + 1]]``
+    :type offsets: sequence of N + 1 integers
+
+    :param n_threads=None: number of threads to split the polygons across.
+                           None (or 1) does it all in the calling thread.
+                           The GIL is released either way.
+
+    :returns: uint8 array of flags for each polygon, 0 if it's OK, otherwise
+              the bits for each problem found:
+
+              ``TOO_FEW_VERTICES``: fewer than 3, not counting the first
+              repeated at the end.
+
+              ``ZERO_AREA``
+
+              ``REPEATED_VERTICES``: the same vertex twice in a row.
+
+              ``NOT_SIMPLE``: the same as ``not is_simple()`` -- so it's set
+              along with any of the others.
+
+              ``NOT_FINITE``: a NaN or inf -- the others aren't checked then.
+    """
+    np_offsets = np.ascontiguousarray(offsets, dtype=np.intp)
+    if (np_offsets.ndim != 1 or len(np_offsets) < 1
+            or np_offsets[0] < 0 or np_offsets[-1] > coords.shape[0]
+            or np.any(np.diff(np_offsets) < 0)):
+        raise ValueError("offsets must be increasing indexes into coords")
+
+    cdef Py_ssize_t i, N
+    cdef const Py_ssize_t[::1] a_offsets = np_offsets
+    cdef int num_threads = _num_threads(n_threads)
+    cdef int flags, err = 0
+
+    N = np_offsets.shape[0] - 1
+    result = np.zeros((N,), dtype=np.uint8)
+    cdef unsigned char[::1] res = result
+
+    with nogil:
+        if num_threads > 1:
+            for i in prange(N, num_threads=num_threads, schedule="static"):
+                flags = _validate_polygon(coords, a_offsets[i], a_offsets[i + 1])
+                if flags < 0:
+                    err += 1
+                else:
+                    res[i] = flags
+        else:
+            for i in range(N):
+                flags = _validate_polygon(coords, a_offsets[i], a_offsets[i + 1])
+                if flags < 0:
+                    err += 1
+                    break
+                res[i] = flags
+    if err:
+        raise MemoryError()
+    return result
 
-    return (x, y)
 
 # Polygon clipping:
 #
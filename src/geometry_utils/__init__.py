@@ -22,5 +22,20 @@ from .polygons import (polygon_inside,
                        polygon_area,
                        polygon_rotation,
                        polygon_centroid,
+                       polygons_area,
+                       polygons_centroid,
+                       polygons_rotation,
+                       polygon_properties,
+                       polygons_properties,
+                       orient_polygons,
                        polygon_is_simple,
+                       find_self_intersections,
+                       polygon_is_convex,
+                       validate_polygons,
+                       PreparedPolygon,
+                       locate_points,
+                       rasterize_polygon,
+                       polygon_inside_chunked,
+                       polygon_inside_indices,
+                       polygon_inside_count,
                        )
@@ -4,21 +4,82 @@
 Single module to hold the high-level API for working with polygons
 """
 
+from collections import namedtuple
+
 import numpy as np
 
 from . import cy_polygons as cyp
 
-from .import cy_line_crossings as clc
+from . import cy_rect
+
+# Use the (vectorized) edge-major point in polygon loop for at least this many points.
+# Polygons with more than PREPARE_MIN_VERTS vertices are worth putting in a
+# PreparedPolygon, if checking lots of points.
+# (see notes/point_in_polygon_performance.py)
+EDGE_MAJOR_MIN_POINTS = 100
+PREPARE_MIN_VERTS = 32
+# For that many points, and at least this many vertices, sweeping a line
+# up through the (sorted) points is faster still.
+SWEEP_MIN_VERTS = 512
+# For that many points, and at least this many vertices, a convex polygon is
+# checked with binary searches of its edges.
+CONVEX_MIN_VERTS = 32
+
+# number of points checked at a time by polygon_inside_chunked
+# (and polygon_inside_indices / polygon_inside_count, for big polygons)
+DEFAULT_CHUNK_SIZE = 1_000_000
 
+# the bits in the flags from validate_polygons
+TOO_FEW_VERTICES = cyp.TOO_FEW_VERTICES
+ZERO_AREA = cyp.ZERO_AREA
+REPEATED_VERTICES = cyp.REPEATED_VERTICES
+NOT_SIMPLE = cyp.NOT_SIMPLE
+NOT_FINITE = cyp.NOT_FINITE
 
-def polygon_inside(polygon_verts, trial_points):
+
+def polygon_inside(polygon_verts, trial_points=None, n_threads=None,
+                   ring_offsets=None, part_offsets=None, fill_rule="evenodd",
+                   x=None, y=None, convex=None):
     '''
     Return a Boolean array the size of the trial point array True if point is inside
 
     INPUTS
     ------
-    polygon_verts:  Nx2 array
+    polygon_verts:  Nx2 array (or a PreparedPolygon, which can't be used
+                    with ring_offsets, part_offsets or fill_rule)
     trial_points:   Single point: len-2 seq (x, y) or multiple_points: Nx2 array
+                    float32 or float64 arrays are used as is (not copied),
+                    so they can be slices of a larger array.
+
+    n_threads=None: number of threads to split the points across.
+                    (None or 1 is single threaded)
+                    The GIL is released in any case.
+
+    x=None, y=None: The trial points can be passed in as separate x and y
+                    arrays instead, e.g. the fields of a structured array.
+
+    convex=None:    If True, the polygon is convex: each point is checked
+                    with a binary search of the edges -- O(log M) rather than O(M).
+                    If None, that is done if the polygon is found to be
+                    convex (when there are enough points to make it worth it).
+                    (It actually works for any polygon that goes up, then down
+                    in y, so that's what's checked for)
+
+    Polygons with holes, and multi-polygons, can be passed in as the coordinates
+    of all the rings in polygon_verts, and offsets (GeoArrow style):
+
+    ring_offsets=None: sequence of (nrings + 1) indexes into polygon_verts:
+                       ring i is polygon_verts[ring_offsets[i]:ring_offsets[i + 1]]
+
+    part_offsets=None: sequence of (nparts + 1) indexes into the rings:
+                       part (polygon) j is rings part_offsets[j]:part_offsets[j + 1]
+                       defaults to a single polygon: all the rings after the first
+                       are holes.
+
+    fill_rule="evenodd": how the rings of a part are combined:
+                         "evenodd": inside if inside an odd number of rings
+                         "nonzero": inside if the winding number is nonzero
+                         (holes must be wound opposite to the exterior ring)
 
     RETURNS
     -------
@@ -27,9 +88,785 @@ def polygon_inside(polygon_verts, trial_points):
                     If input it single point, a single bool is returned
     '''
 
+    if isinstance(polygon_verts, PreparedPolygon):
+        # a PreparedPolygon is a single ring
+        if ring_offsets is not None or part_offsets is not None or fill_rule != "evenodd":
+            raise ValueError("ring_offsets, part_offsets and fill_rule "
+                             "can't be used with a PreparedPolygon")
+        return polygon_verts.inside(trial_points, n_threads, x=x, y=y)
+
     polygon_verts = np.asarray(polygon_verts, dtype=np.float64)
-    trial_points = np.asarray(trial_points, dtype=np.float64)
-    return cyp.points_in_poly(polygon_verts, trial_points)
+
+    if ring_offsets is not None:
+        if part_offsets is None:
+            part_offsets = (0, len(ring_offsets) - 1)
+        return cyp.points_in_multipoly(np.ascontiguousarray(polygon_verts),
+                                       ring_offsets,
+                                       part_offsets,
+                                       trial_points,
+                                       fill_rule,
+                                       n_threads,
+                                       x=x,
+                                       y=y)
+    elif part_offsets is not None:
+        raise ValueError("part_offsets requires ring_offsets")
+
+    # pick the loop order: for lots of points, looping over the edges on the
+    # outside is faster (the inner loop over the points is vectorized),
+    # unless the polygon is big enough to make a sweep line worth it.
+    npoints = np.size(trial_points) // 2 if x is None else np.size(x)
+    if convex or (convex is None and npoints >= EDGE_MAJOR_MIN_POINTS
+                  and len(polygon_verts) >= CONVEX_MIN_VERTS):
+        polygon_verts = np.ascontiguousarray(polygon_verts)
+        chains = cyp.build_monotone_chains(polygon_verts)
+        if chains is not None:
+            return cyp.points_in_monotone_poly(polygon_verts, *chains, trial_points,
+                                               n_threads, x=x, y=y)
+        elif convex:
+            raise ValueError("polygon is not convex")
+    if npoints >= EDGE_MAJOR_MIN_POINTS and len(polygon_verts) >= SWEEP_MIN_VERTS:
+        return cyp.points_in_poly_sweep(np.ascontiguousarray(polygon_verts),
+                                        trial_points, n_threads, x=x, y=y)
+    if npoints >= EDGE_MAJOR_MIN_POINTS:
+        return cyp.points_in_poly_edges(polygon_verts, trial_points, n_threads,
+                                        x=x, y=y)
+    return cyp.points_in_poly(polygon_verts, trial_points, n_threads, x=x, y=y)
+
+
+def _inside_blocks(polygon_verts, trial_points, n_threads, ring_offsets, part_offsets,
+                   fill_rule, x, y, convex):
+    """
+    polygon_inside, a block of DEFAULT_CHUNK_SIZE points at a time:
+    yields (index of the first point, Boolean array) for each block
+
+    So the whole Boolean array is never made, but the same loop is used as
+    polygon_inside would use.
+    """
+    if x is None:
+        trial_points = np.asarray(trial_points)
+        if trial_points.ndim == 1:
+            trial_points = trial_points.reshape(1, 2)
+        npoints = len(trial_points)
+    else:
+        npoints = len(x)
+    for start in range(0, npoints, DEFAULT_CHUNK_SIZE):
+        block = slice(start, start + DEFAULT_CHUNK_SIZE)
+        if x is None:
+            inside = polygon_inside(polygon_verts, trial_points[block], n_threads,
+                                    ring_offsets, part_offsets, fill_rule, convex=convex)
+        else:
+            inside = polygon_inside(polygon_verts, None, n_threads,
+                                    ring_offsets, part_offsets, fill_rule,
+                                    x=x[block], y=y[block], convex=convex)
+        yield start, inside
+
+
+def _one_pass_inside(polygon_verts, ring_offsets, part_offsets, convex):
+    """
+    True if polygon_inside would use the edge-major loop (for lots of points),
+    which can find the indexes or count in the same pass.
+    """
+    if (isinstance(polygon_verts, PreparedPolygon) or ring_offsets is not None
+            or part_offsets is not None or convex):
+        return False
+    return len(polygon_verts) < (SWEEP_MIN_VERTS if convex is False else CONVEX_MIN_VERTS)
+
+
+def polygon_inside_indices(polygon_verts, trial_points=None, n_threads=None,
+                           ring_offsets=None, part_offsets=None, fill_rule="evenodd",
+                           x=None, y=None, convex=None, dtype=np.intp):
+    """
+    Return the indexes of the trial points that are inside the polygon
+
+    The same as ``np.flatnonzero(polygon_inside(polygon_verts, trial_points))``,
+    but without making a Boolean array the size of the points: for small
+    polygons it's done in one pass, otherwise a block of points at a time,
+    with whichever loop polygon_inside would use.
+
+    INPUTS
+    ------
+    polygon_verts:  Nx2 array (or a PreparedPolygon)
+    trial_points:   Nx2 array
+
+    n_threads=None: number of threads to split the points across.
+                    (None or 1 is single threaded)
+
+    ring_offsets=None, part_offsets=None, fill_rule="evenodd", convex=None:
+                    as for polygon_inside
+
+    x=None, y=None: The trial points can be passed in as separate x and y
+                    arrays instead.
+
+    dtype=np.intp:  integer type of the indexes, e.g. np.int32 to halve the
+                    memory, if there are fewer than 2**31 points.
+
+    RETURNS
+    -------
+    indexes:  integer array of the indexes of the points inside,
+              in increasing order
+    """
+    dtype = np.dtype(dtype)
+    if not np.issubdtype(dtype, np.integer):
+        raise ValueError("dtype must be an integer type")
+    npoints = np.size(trial_points) // 2 if x is None else np.size(x)
+    if npoints - 1 > np.iinfo(dtype).max:
+        raise ValueError(f"too many points for {dtype} indexes")
+
+    if _one_pass_inside(polygon_verts, ring_offsets, part_offsets, convex):
+        polygon_verts = np.ascontiguousarray(polygon_verts, dtype=np.float64)
+        indices = cyp.points_in_poly_indices(polygon_verts, trial_points, n_threads, x=x, y=y)
+        return indices.astype(dtype, copy=False)
+
+    blocks = [np.flatnonzero(inside).astype(dtype) + dtype.type(start)
+              for start, inside in _inside_blocks(polygon_verts, trial_points, n_threads,
+                                                  ring_offsets, part_offsets, fill_rule,
+                                                  x, y, convex)]
+    return np.concatenate(blocks) if blocks else np.zeros((0,), dtype=dtype)
+
+
+def polygon_inside_count(polygon_verts, trial_points=None, n_threads=None,
+                         ring_offsets=None, part_offsets=None, fill_rule="evenodd",
+                         x=None, y=None, convex=None):
+    """
+    Return the number of trial points that are inside the polygon
+
+    The same as ``polygon_inside(polygon_verts, trial_points).sum()``,
+    but without making a Boolean array the size of the points: for small
+    polygons it's done in one pass, otherwise a block of points at a time,
+    with whichever loop polygon_inside would use.
+
+    INPUTS
+    ------
+    polygon_verts:  Nx2 array (or a PreparedPolygon)
+    trial_points:   Nx2 array
+
+    n_threads=None: number of threads to split the points across.
+                    (None or 1 is single threaded)
+
+    ring_offsets=None, part_offsets=None, fill_rule="evenodd", convex=None:
+                    as for polygon_inside
+
+    x=None, y=None: The trial points can be passed in as separate x and y
+                    arrays instead.
+
+    RETURNS
+    -------
+    count:  the number of points inside (an int)
+    """
+    if _one_pass_inside(polygon_verts, ring_offsets, part_offsets, convex):
+        polygon_verts = np.ascontiguousarray(polygon_verts, dtype=np.float64)
+        return cyp.points_in_poly_count(polygon_verts, trial_points, n_threads, x=x, y=y)
+
+    return sum(int(np.count_nonzero(inside))
+               for _, inside in _inside_blocks(polygon_verts, trial_points, n_threads,
+                                               ring_offsets, part_offsets, fill_rule,
+                                               x, y, convex))
+
+
+class PreparedPolygon:
+    """
+    A polygon with an index of its edges, for fast repeated
+    point in polygon checks.
+
+    The edges are bucketed into horizontal slabs, so each trial point is only
+    tested against the edges that cross its y-range, rather than all of them.
+    This is a big win for polygons with many vertices (coastlines, etc).
+    It costs O(M) to build, so is worth it if you are checking a lot of
+    points, or checking the same polygon many times.
+
+    The results are exactly the same as ``polygon_inside``
+    (unless exact=False).
+
+    A PreparedPolygon can be passed to ``polygon_inside`` in place of
+    the vertices.
+    """
+
+    def __init__(self, polygon_verts, n_slabs=None, exact=True, fast_rects=False):
+        """
+        INPUTS
+        ------
+        polygon_verts:  Nx2 array
+
+        n_slabs=None:   number of horizontal slabs to use -- defaults to one
+                        per vertex. The number may be reduced if long edges
+                        would make the index too large.
+
+        exact=True:     If False, the slope and end points of each edge are
+                        precomputed, which takes a division out of the inner
+                        loop. That's faster, but the crossing points are
+                        rounded differently, so points within rounding error
+                        of an edge may not give the same answer as
+                        polygon_inside.
+
+        fast_rects=False: If True, find the bounding box of the polygon, and
+                          a large rectangle inside it: points outside the
+                          bounding box, or inside the inner rectangle, are
+                          decided without checking any edges. That's a big
+                          win for compact polygons, with most points either
+                          well outside or well inside.
+        """
+        self.verts = np.ascontiguousarray(polygon_verts, dtype=np.float64)
+        if self.verts.ndim != 2 or self.verts.shape[1] != 2:
+            raise ValueError("polygon_verts must be a Nx2 array")
+        nvert = len(self.verts)
+        if n_slabs is None:
+            n_slabs = nvert
+        self._slab_index = cyp.build_slab_index(self.verts, n_slabs, 16 * nvert)
+        self._edge_coeffs = None if exact else cyp.build_edge_coeffs(self.verts)
+        self._rects = _fast_rects(self.verts) if fast_rects else None
+
+    @property
+    def inner_rect(self):
+        """
+        the fast accept rectangle (a cy_rect rect), or None if there isn't one
+        """
+        if self._rects is None or self._rects[4] > self._rects[6]:
+            return None
+        return self._rects[4:].reshape(2, 2)
+
+    @property
+    def n_slabs(self):
+        """
+        number of slabs the edges are bucketed into
+        """
+        return len(self._slab_index[3]) - 1
+
+    def inside(self, trial_points=None, n_threads=None, x=None, y=None):
+        '''
+        Return a Boolean array the size of the trial point array True if point is inside
+
+        INPUTS
+        ------
+        trial_points:   Single point: len-2 seq (x, y) or multiple_points: Nx2 array
+
+        n_threads=None: number of threads to split the points across.
+                        (None or 1 is single threaded)
+
+        x=None, y=None: The trial points as separate x and y arrays instead.
+
+        RETURNS
+        -------
+        inside_points:  Boolean array (len(N))
+                        True if the trial point is inside the polygon
+                        If input it single point, a single bool is returned
+        '''
+        return cyp.points_in_slab_index(self.verts, *self._slab_index, trial_points,
+                                        n_threads, x=x, y=y,
+                                        edge_coeffs=self._edge_coeffs,
+                                        rects=self._rects)
+
+
+def _fast_rects(polygon_verts, grid_size=64):
+    """
+    Find the fast reject / fast accept rectangles for a polygon:
+    (xmin, ymin, xmax, ymax) of the bounding box, then of a large rectangle
+    inside the polygon (empty if none is found).
+
+    The inner rectangle is the biggest block of cells of a grid_size x grid_size
+    raster of the polygon, checked to make sure no edge comes near it.
+    """
+    nothing = cyp._NO_RECTS.copy()
+    if len(polygon_verts) < 3 or np.isnan(polygon_verts).any():
+        return nothing
+
+    bbox = cy_rect.from_points(polygon_verts)
+    # A computed crossing can be a hair past the vertices, so pad the box in x.
+    # No edge straddles a y outside the vertices, so y is exact (and half open).
+    pad = 8 * np.finfo(np.float64).eps * np.abs(polygon_verts).max()
+    rects = nothing.copy()
+    rects[:4] = (bbox[0, 0] - pad, bbox[0, 1], bbox[1, 0] + pad, bbox[1, 1])
+
+    size = (bbox[1] - bbox[0]) / grid_size
+    if not np.all(size > 0):
+        return rects
+    mask = rasterize_polygon(polygon_verts, bbox[0], size, (grid_size, grid_size))
+    (i0, j0), (i1, j1) = _largest_block(mask)
+    # shrink it a cell at a time until no edges are too close
+    while i0 <= i1 and j0 <= j1:
+        # the rectangle through the centers of the outer cells
+        inner = np.array((bbox[0] + (np.array((j0, i0)) + 0.5) * size,
+                          bbox[0] + (np.array((j1, i1)) + 0.5) * size))
+        if (not _edges_hit_rect(polygon_verts, inner[0] - 4 * pad, inner[1] + 4 * pad)
+                and polygon_inside(polygon_verts, inner.mean(axis=0))):
+            rects[4:] = inner.ravel()
+            break
+        i0, j0, i1, j1 = i0 + 1, j0 + 1, i1 - 1, j1 - 1
+    return rects
+
+
+def _largest_block(mask):
+    """
+    The largest rectangular block of True in a 2D Boolean array
+
+    Returns ((row0, col0), (row1, col1)), inclusive -- empty if none
+    """
+    nrows, ncols = mask.shape
+    heights = np.zeros(ncols + 1, dtype=np.intp)  # (a zero on the end to flush the stack)
+    best_area = 0
+    best = ((0, 0), (-1, -1))
+    for row in range(nrows):
+        heights[:ncols] = np.where(mask[row], heights[:ncols] + 1, 0)
+        # largest rectangle in the histogram of heights
+        stack = []
+        for col in range(ncols + 1):
+            start = col
+            while stack and stack[-1][1] >= heights[col]:
+                start, height = stack.pop()
+                area = height * (col - start)
+                if area > best_area:
+                    best_area = area
+                    best = ((row - height + 1, start), (row, col - 1))
+            stack.append((start, heights[col]))
+    return best
+
+
+def _edges_hit_rect(polygon_verts, lower_left, upper_right):
+    """
+    True if any edge of the polygon touches the rectangle
+    """
+    p0 = polygon_verts
+    p1 = np.roll(polygon_verts, 1, axis=0)
+    # the bounding boxes overlap
+    hit = ((np.minimum(p0[:, 0], p1[:, 0]) <= upper_right[0])
+           & (np.maximum(p0[:, 0], p1[:, 0]) >= lower_left[0])
+           & (np.minimum(p0[:, 1], p1[:, 1]) <= upper_right[1])
+           & (np.maximum(p0[:, 1], p1[:, 1]) >= lower_left[1]))
+    # and the corners are not all on one side of the edge
+    d = p1 - p0
+    sides = np.array([np.sign(d[:, 0] * (cy - p0[:, 1]) - d[:, 1] * (cx - p0[:, 0]))
+                      for cx, cy in ((lower_left[0], lower_left[1]),
+                                     (upper_right[0], lower_left[1]),
+                                     (upper_right[0], upper_right[1]),
+                                     (lower_left[0], upper_right[1]))])
+    hit &= ~(np.all(sides > 0, axis=0) | np.all(sides < 0, axis=0))
+    return bool(hit.any())
+
+
+def _is_points_array(points):
+    """
+    True if points is an Nx2 (or a single (2,)) array-like, rather than an
+    iterable of chunks of points
+
+    Only the first item is looked at, so a list of big chunks (or of slices
+    of a memory-mapped file) isn't read or copied.
+    """
+    if isinstance(points, np.ndarray):
+        return True
+    try:
+        first = points[0]
+    except (TypeError, IndexError, KeyError):  # an iterator, or empty
+        return False
+    # a number (a single point) or a point (a list of them) -- not a chunk
+    return np.ndim(first) < 2
+
+
+def polygon_inside_chunked(polygon_verts, trial_points=None, out=None,
+                           chunk_size=DEFAULT_CHUNK_SIZE, n_threads=None,
+                           x=None, y=None):
+    """
+    Check whether points are inside a polygon, a chunk at a time
+
+    For point sets too big to fit in memory, e.g. in a memory-mapped file:
+    only chunk_size points are read (and converted, if needed) at a time.
+
+    The polygon is prepared once, not once per chunk: big polygons are put in
+    a PreparedPolygon, and a small polygon uses the edge-major loop.
+
+    INPUTS
+    ------
+    polygon_verts:  Nx2 array (or a PreparedPolygon)
+
+    trial_points:   Nx2 array (e.g. a np.memmap), or an iterable of
+                    Nx2 arrays (chunks of points).
+
+    out=None:       Boolean (or uint8) array of length N to put the results in
+                    (can also be a np.memmap). If None, a generator is returned.
+
+    chunk_size=DEFAULT_CHUNK_SIZE: number of points to check at a time
+                                   (if trial_points is an array)
+
+    n_threads=None: number of threads to split each chunk across.
+                    (None or 1 is single threaded)
+
+    x=None, y=None: The trial points can be passed in as separate x and y
+                    arrays instead, e.g. the fields of a memory-mapped
+                    structured array.
+
+    RETURNS
+    -------
+    out:  if out is given, it is returned, filled in.
+          Otherwise, a generator that yields a Boolean array for each chunk.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+
+    if not isinstance(polygon_verts, PreparedPolygon):
+        polygon_verts = np.ascontiguousarray(polygon_verts, dtype=np.float64)
+        if len(polygon_verts) > PREPARE_MIN_VERTS:
+            polygon_verts = PreparedPolygon(polygon_verts)
+
+    if x is not None or y is not None:
+        if trial_points is not None:
+            raise ValueError("pass in either trial_points or x and y, not both")
+        chunks = ((None, x[i:i + chunk_size], y[i:i + chunk_size])
+                  for i in range(0, len(x), chunk_size))
+    elif _is_points_array(trial_points):
+        # an array (or list) of points, not an iterable of chunks
+        trial_points = np.asarray(trial_points).reshape(-1, 2)
+        chunks = ((trial_points[i:i + chunk_size], None, None)
+                  for i in range(0, len(trial_points), chunk_size))
+    else:
+        chunks = ((np.asarray(chunk).reshape(-1, 2), None, None) for chunk in trial_points)
+
+    results = (polygon_inside(polygon_verts, points, n_threads, x=x, y=y)
+               for points, x, y in chunks)
+    if out is None:
+        return results
+
+    start = 0
+    for result in results:
+        if start + len(result) > len(out):
+            raise ValueError("more points than the length of out")
+        out[start:start + len(result)] = result
+        start += len(result)
+    if start != len(out):
+        raise ValueError("fewer points than the length of out")
+    return out
+
+
+def locate_points(points, polygons, offsets=None, n_threads=None, x=None, y=None):
+    """
+    Find which polygon each point is in.
+
+    This uses a bounding box tree of the polygons, so each point is only
+    checked against the polygons it might be in.
+
+    INPUTS
+    ------
+    points:     Single point: len-2 seq (x, y) or multiple_points: Nx2 array
+
+    polygons:   A sequence of polygons (each an Nx2 array),
+                or, if offsets is given, the vertices of all the polygons
+                as a single Nx2 array.
+
+    offsets=None: sequence of (npolys + 1) indexes into polygons:
+                  polygon i is polygons[offsets[i]:offsets[i + 1]]
+
+    n_threads=None: number of threads to split the points across.
+                    (None or 1 is single threaded)
+
+    x=None, y=None: The points can be passed in as separate x and y arrays
+                    instead (pass None for points).
+
+    RETURNS
+    -------
+    indexes:  integer array (len(N))
+              the index of the polygon the point is inside, -1 if it isn't
+              in any. If it is in more than one, the lowest index is returned.
+              If input is a single point, a single int is returned.
+    """
+    coords, offsets = _as_ragged(polygons, offsets)
+    return cyp.locate_points_in_polys(coords, offsets, points, n_threads, x=x, y=y)
+
+
+def rasterize_polygon(polygon_verts, grid_origin, cell_size, shape):
+    """
+    Find which cells of a regular grid have their center inside a polygon
+
+    This is a scanline fill, so it is much faster than checking every cell
+    center with polygon_inside -- O(rows * crossings + cells) rather than
+    O(cells * vertices) -- but gives exactly the same answer.
+
+    INPUTS
+    ------
+    polygon_verts:  Nx2 array
+
+    grid_origin:    (x, y) of the lower left corner of the grid
+
+    cell_size:      size of the cells: a single value, or (dx, dy)
+
+    shape:          (nrows, ncols) of the grid -- rows are in y, columns in x
+
+    RETURNS
+    -------
+    mask:  Boolean array of the grid shape, True if the cell center is inside.
+           The center of cell [i, j] is:
+           (x0 + (j + 0.5) * dx, y0 + (i + 0.5) * dy)
+    """
+    polygon_verts = np.ascontiguousarray(polygon_verts, dtype=np.float64)
+    x0, y0 = grid_origin
+    dx, dy = np.broadcast_to(np.asarray(cell_size, dtype=np.float64), (2,))
+    nrows, ncols = shape
+    return cyp.rasterize_poly(polygon_verts, x0, y0, dx, dy, nrows, ncols)
+
+
+def polygons_area(polygons, offsets=None, n_threads=None):
+    """
+    Calculate the areas of a collection of polygons
+
+    The same as polygon_area for each, but all in one compiled loop.
+
+    INPUTS
+    ------
+    polygons:   A sequence of polygons (each an Nx2 array),
+                or, if offsets is given, the vertices of all the polygons
+                as a single Nx2 array.
+
+    offsets=None: sequence of (npolys + 1) indexes into polygons:
+                  polygon i is polygons[offsets[i]:offsets[i + 1]]
+
+    n_threads=None: number of threads to split the polygons across.
+                    (None or 1 is single threaded)
+
+    RETURNS
+    -------
+    areas:  float array (len(npolys))
+    """
+    coords, offsets = _as_ragged(polygons, offsets)
+    areas, _ = cyp.polygons_area_centroid(coords, offsets, False, n_threads)
+    return np.abs(areas)
+
+
+def polygons_centroid(polygons, offsets=None, n_threads=None):
+    """
+    Calculate the centroids of a collection of polygons
+
+    The same as polygon_centroid for each, but all in one compiled loop.
+
+    INPUTS
+    ------
+    polygons:   A sequence of polygons (each an Nx2 array),
+                or, if offsets is given, the vertices of all the polygons
+                as a single Nx2 array.
+
+    offsets=None: sequence of (npolys + 1) indexes into polygons:
+                  polygon i is polygons[offsets[i]:offsets[i + 1]]
+
+    n_threads=None: number of threads to split the polygons across.
+                    (None or 1 is single threaded)
+
+    RETURNS
+    -------
+    centroids:  (npolys, 2) float array
+                NaN (or inf) for polygons with no area.
+    """
+    coords, offsets = _as_ragged(polygons, offsets)
+    _, centroids = cyp.polygons_area_centroid(coords, offsets, True, n_threads)
+    return centroids
+
+
+def polygons_rotation(polygons, offsets=None, n_threads=None):
+    """
+    Find the "winding order" of a collection of polygons
+
+    The same as polygon_rotation for each, but all in one compiled loop.
+
+    INPUTS
+    ------
+    polygons:   A sequence of polygons (each an Nx2 array),
+                or, if offsets is given, the vertices of all the polygons
+                as a single Nx2 array.
+
+    offsets=None: sequence of (npolys + 1) indexes into polygons:
+                  polygon i is polygons[offsets[i]:offsets[i + 1]]
+
+    n_threads=None: number of threads to split the polygons across.
+                    (None or 1 is single threaded)
+
+    RETURNS
+    -------
+    rotation:  Boolean array (len(npolys))
+               True (cw) for a positive rotation according to the right-hand rule
+               False (ccw) for a negative rotation according to the right hand rule
+
+    Raises a ValueError if any of the polygons has zero area.
+    """
+    coords, offsets = _as_ragged(polygons, offsets)
+    areas, _ = cyp.polygons_area_centroid(coords, offsets, False, n_threads)
+    zero = np.flatnonzero(areas == 0.0)
+    if len(zero):
+        raise ValueError(f"can't compute rotation of a zero-area polygon "
+                         f"({len(zero)} of them, starting with polygon {zero[0]})")
+    return areas < 0
+
+
+PolygonProperties = namedtuple("PolygonProperties",
+                               ["area", "centroid", "rotation", "bbox", "perimeter"])
+PolygonProperties.__doc__ = """\
+The properties of a polygon, as returned by polygon_properties
+
+area:       area of the polygon (as polygon_area)
+centroid:   (x, y) of the centroid (as polygon_centroid)
+rotation:   True if clockwise (as polygon_rotation -- but False if the area is zero)
+bbox:       2x2 array: ((xmin, ymin), (xmax, ymax)) (as cy_rect.from_points)
+perimeter:  length of all the edges, including from the last vertex to the first
+"""
+
+# dtype of the array returned by polygons_properties
+POLYGON_PROPERTIES_DTYPE = np.dtype([("area", np.float64),
+                                     ("centroid", np.float64, (2,)),
+                                     ("rotation", np.bool_),
+                                     ("bbox", np.float64, (2, 2)),
+                                     ("perimeter", np.float64),
+                                     ])
+
+
+def polygon_properties(polygon_verts):
+    """
+    Compute the area, centroid, rotation, bounding box and perimeter of a polygon
+
+    All in one pass over the vertices, rather than one for each.
+
+    INPUT
+    -----
+    polygon_verts:  Nx2 array
+
+    OUTPUT
+    ------
+    properties:  a PolygonProperties named tuple:
+                 (area, centroid, rotation, bbox, perimeter)
+    """
+    polygon_verts = np.ascontiguousarray(polygon_verts, dtype=np.float64)
+    props = cyp.polygons_properties(polygon_verts, (0, len(polygon_verts)))[0]
+    return PolygonProperties(area=abs(props[0]),
+                             centroid=(props[1], props[2]),
+                             rotation=bool(props[0] < 0),
+                             bbox=props[3:7].reshape(2, 2),
+                             perimeter=props[7])
+
+
+def polygons_properties(polygons, offsets=None, n_threads=None):
+    """
+    Compute the area, centroid, rotation, bounding box and perimeter
+    of each of a collection of polygons
+
+    The same as polygon_properties for each, but all in one compiled loop.
+
+    INPUTS
+    ------
+    polygons:   A sequence of polygons (each an Nx2 array),
+                or, if offsets is given, the vertices of all the polygons
+                as a single Nx2 array.
+
+    offsets=None: sequence of (npolys + 1) indexes into polygons:
+                  polygon i is polygons[offsets[i]:offsets[i + 1]]
+
+    n_threads=None: number of threads to split the polygons across.
+                    (None or 1 is single threaded)
+
+    RETURNS
+    -------
+    properties:  structured array (len(npolys)) of POLYGON_PROPERTIES_DTYPE:
+                 fields: area, centroid, rotation, bbox, perimeter
+                 (as in PolygonProperties)
+    """
+    coords, offsets = _as_ragged(polygons, offsets)
+    props = cyp.polygons_properties(coords, offsets, n_threads)
+    result = np.empty(len(props), dtype=POLYGON_PROPERTIES_DTYPE)
+    result["area"] = np.abs(props[:, 0])
+    result["centroid"] = props[:, 1:3]
+    result["rotation"] = props[:, 0] < 0
+    result["bbox"] = props[:, 3:7].reshape(-1, 2, 2)
+    result["perimeter"] = props[:, 7]
+    return result
+
+
+def validate_polygons(polygons, offsets=None, n_threads=None):
+    """
+    Check each of a collection of polygons for the usual problems
+
+    All in one compiled loop, so much faster than polygon_is_simple and
+    polygon_area one at a time.
+
+    INPUTS
+    ------
+    polygons:   A sequence of polygons (each an Nx2 array),
+                or, if offsets is given, the vertices of all the polygons
+                as a single Nx2 array.
+
+    offsets=None: sequence of (npolys + 1) indexes into polygons:
+                  polygon i is polygons[offsets[i]:offsets[i + 1]]
+
+    n_threads=None: number of threads to split the polygons across.
+                    (None or 1 is single threaded)
+
+    RETURNS
+    -------
+    flags:  uint8 array (len(npolys)): 0 for a good polygon, otherwise
+            the bits for each problem found:
+
+            TOO_FEW_VERTICES: fewer than 3 (not counting the first repeated at the end)
+            ZERO_AREA
+            REPEATED_VERTICES: the same vertex twice in a row
+            NOT_SIMPLE: polygon_is_simple would be False -- so this is set
+                        along with any of the others
+            NOT_FINITE: a NaN or inf vertex (the others aren't checked then)
+
+    e.g. ``bad = validate_polygons(polys) & NOT_SIMPLE != 0``
+    """
+    coords, offsets = _as_ragged(polygons, offsets)
+    return cyp.validate_polygons(coords, offsets, n_threads)
+
+
+def orient_polygons(coords, ring_offsets, part_offsets=None,
+                    exterior_ccw=True, n_threads=None):
+    """
+    Normalize the orientation of a collection of polygons, in place
+
+    Every exterior ring is made counter-clockwise, and every hole
+    clockwise (or the other way around, if exterior_ccw is False),
+    by reversing the rings that go the wrong way.
+
+    INPUTS
+    ------
+    coords:     The vertices of all the rings as a single Nx2 array.
+                It is changed in place, so must be a writable,
+                C-contiguous float64 array.
+
+    ring_offsets: sequence of (nrings + 1) indexes into coords:
+                  ring i is coords[ring_offsets[i]:ring_offsets[i + 1]]
+
+    part_offsets=None: sequence of (npolys + 1) indexes into the rings:
+                       polygon j is rings part_offsets[j]:part_offsets[j + 1],
+                       the first is the exterior, the rest are holes.
+                       None means every ring is an exterior.
+
+    exterior_ccw=True: exterior rings counter-clockwise, holes clockwise.
+                       If False, the other way around.
+
+    n_threads=None: number of threads to split the rings across.
+                    (None or 1 is single threaded)
+
+    RETURNS
+    -------
+    The number of rings that were reversed.
+
+    Rings with zero area are left alone.
+    """
+    if not isinstance(coords, np.ndarray):
+        raise TypeError("coords must be a numpy array -- it is modified in place")
+    if (coords.dtype != np.float64 or coords.ndim != 2 or coords.shape[1] != 2
+            or not coords.flags.c_contiguous or not coords.flags.writeable):
+        raise ValueError("coords must be a writable, C-contiguous Nx2 float64 array")
+    return cyp.orient_rings(coords, ring_offsets, part_offsets,
+                            exterior_ccw, n_threads)
+
+
+def _as_ragged(polygons, offsets):
+    """
+    Returns a collection of polygons as (coords, offsets)
+
+    If offsets is None, polygons is a sequence of Nx2 arrays,
+    otherwise it's already the coords.
+    """
+    if offsets is None:
+        polygons = [np.asarray(poly, dtype=np.float64).reshape(-1, 2) for poly in polygons]
+        offsets = np.cumsum([0] + [len(poly) for poly in polygons])
+        coords = np.concatenate(polygons) if polygons else np.empty((0, 2))
+    else:
+        coords = np.asarray(polygons, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    return np.ascontiguousarray(coords), offsets
 
 
 def polygon_area(polygon_verts):
@@ -60,41 +897,60 @@ def polygon_is_simple(polygon_verts):
 
     i.e. has no crossing segments, etc.
 
-    NOTE: This version is naive, and O(N^2).
-          It simply checks each segment against all the other segments.
+    Segments that touch (other than neighbors at their shared vertex),
+    neighbors that fold back over each other, and repeated vertices
+    all make it not simple.
 
-    Possible better option:
-    Shamos-Hoey algorithm:
+    Uses the Shamos-Hoey sweep line algorithm, so is O(N log N):
     https://web.archive.org/web/20060613060645/http://softsurfer.com/Archive/algorithm_0108/algorithm_0108.htm#Test%20if%20Simple
     '''
+    polygon_verts = np.ascontiguousarray(polygon_verts, dtype=np.float64).reshape(-1, 2)
+    return cyp.is_simple(polygon_verts)
 
-    polygon_verts = np.asarray(polygon_verts)
-
-    # make sure first and final point are duplicated
-    # note: this does require an unfortunate reallocation
-    # maybe deal with last segment separately?
-    if not np.array_equal(polygon_verts[0], polygon_verts[-1]):
-        polygon_verts = np.r_[polygon_verts, polygon_verts[:1]]
-    # loop through every line segment, and compare to every other one:
-    for i1 in range(len(polygon_verts) - 1):
-        seg1 = (polygon_verts[i1, :], polygon_verts[i1 + 1, :])
-        for i2 in range(i1 + 1, len(polygon_verts) - 1):
-            if (i2 == i1 + 1):
-                # check for degenerate segment
-                if np.array_equal(polygon_verts[i1, :], polygon_verts[i1 + 2, :],):
-                    return False
-                continue
-            elif (i1 == 0) and (i2 == (len(polygon_verts) - 2)):  # the start and end segments
-                # never occurs
-                # the start and end segments
-                # or ((i1 == (len(polygon_verts) - 2)) and (i2 == 0))
-                # or (i2 == i1 - 1)
-                # ):
-                continue
-            seg2 = (polygon_verts[i2, :], polygon_verts[i2 + 1, :])
-            if clc.segment_cross(seg1, seg2):
-                return False
-    return True
+
+def find_self_intersections(verts, closed=True):
+    """
+    Find where a polygon, or polyline, crosses or touches itself
+
+    Uses the Bentley-Ottmann sweep line algorithm, so is O((N + K) log N),
+    for K crossings.
+
+    INPUTS
+    ------
+    verts:  Nx2 array of the vertices
+
+    closed=True: If True, it's a polygon: the last vertex joins back to the
+                 first (which may be repeated at the end, or not).
+                 If False, it's an open polyline.
+
+    RETURNS
+    -------
+    pairs:  Kx2 int array of the segments that cross, sorted.
+            Segment i goes from vertex i to vertex i + 1.
+
+    points: Kx2 float array of where they cross.
+
+    Neighboring segments only count if they fold back over each other
+    (at their shared vertex). Segments that overlap are at the first point
+    they share. Repeated vertices show up as the segments on either side
+    touching.
+    """
+    verts = np.ascontiguousarray(verts, dtype=np.float64).reshape(-1, 2)
+    return cyp.self_intersections(verts, closed)
+
+
+def polygon_is_convex(polygon_verts):
+    """
+    Return True if the polygon is convex
+
+    INPUT
+    -----
+    polygon_verts:  Nx2 array
+
+    Collinear and repeated vertices are allowed. A polygon with no area isn't convex.
+    """
+    polygon_verts = np.ascontiguousarray(polygon_verts, np.float64)
+    return cyp.is_convex(polygon_verts)
 
 
 def polygon_rotation(polygon_verts, convex=False):
@@ -108,7 +964,10 @@ def polygon_rotation(polygon_verts, convex=False):
     polygon_verts:  Nx2 array
 
     convex=False: flag to indicate if the polygon is convex
-                  -- if it is convex, a faster algorithm will be used.
+                  -- if it is convex, a faster algorithm will be used:
+                  the direction of the first turn, rather than the area.
+                  (checking for convex is as much work as the area,
+                  so it's not done for you: see polygon_is_convex)
 
     OUTPUT
     ------
@@ -121,6 +980,16 @@ def polygon_rotation(polygon_verts, convex=False):
 
     '''
     polygon_verts = np.asarray(polygon_verts, np.float64)
+    if convex:
+        # a convex polygon turns the same way at every vertex
+        nvert = len(polygon_verts)
+        for i in range(nvert):
+            d0 = polygon_verts[i] - polygon_verts[i - 1]
+            d1 = polygon_verts[(i + 1) % nvert] - polygon_verts[i]
+            cross = d0[0] * d1[1] - d0[1] * d1[0]
+            if cross != 0.0:
+                return bool(cross < 0)
+        raise ValueError("can't compute rotation of a zero-area polygon")
     s_a = cyp.signed_area(polygon_verts)
     if s_a < 0:
         return True
@@ -12,7 +12,13 @@ import pytest
 import numpy as np
 
 
-from geometry_utils.cy_polygons import point_in_poly, points_in_poly
+from geometry_utils.cy_polygons import (point_in_poly,
+                                        points_in_poly,
+                                        points_in_poly_edges,
+                                        points_in_poly_sweep,
+                                        points_in_polys,
+                                        points_in_ragged_polys,
+                                        )
 
 # from .poly_clockwise import is_clockwise_convex, is_clockwise
 
@@ -290,3 +296,167 @@ def test_points_in_poly_array():
     assert np.array_equal(points_in_poly(poly1, points), result)
 
 
+
+
+def test_points_in_poly_edges_scalar():
+    assert points_in_poly_edges(poly1, (0.5, 0.5)) is True
+    assert points_in_poly_edges(poly1, (1.5, 0.5)) is False
+
+
+@pytest.mark.parametrize('num_points', [1, 511, 512, 513, 5000])
+def test_points_in_poly_edges_same(num_points):
+    """
+    the edge-major loop should give exactly the same answer
+    """
+    rng = np.random.default_rng(num_points)
+    points = rng.uniform(-6.0, 6.0, (num_points, 2))
+    # include the vertices and the boundary points
+    points = np.r_[points,
+                   poly1_ccw,
+                   [p[0] for p in points_on_boundaries],
+                   ]
+    for poly in (poly1_ccw, poly1_cw, poly2_ccw, poly2_cw):
+        assert np.array_equal(points_in_poly_edges(poly, points),
+                              points_in_poly(poly, points))
+
+
+@pytest.mark.parametrize('nvert', [3, 100, 2000])
+def test_points_in_poly_edges_same_big_poly(nvert):
+    """
+    the vectorized loop adds up signed crossings -- the parity should
+    be exactly the same, even for NaNs and points on the vertices
+    """
+    rng = np.random.default_rng(nvert)
+    theta = np.linspace(0, 2 * np.pi, nvert, endpoint=False)
+    r = rng.uniform(2.0, 6.0, nvert)
+    poly = np.c_[r * np.cos(theta), r * np.sin(theta)]
+    # horizontal edges too
+    poly[1::7, 1] = poly[0:-1:7, 1]
+    points = np.r_[rng.uniform(-6.0, 6.0, (3000, 2)),
+                   poly,
+                   [(np.nan, 0.0), (0.0, np.nan)],
+                   ]
+
+    assert np.array_equal(points_in_poly_edges(poly, points), points_in_poly(poly, points))
+
+    poly[nvert // 2] = np.nan
+    assert np.array_equal(points_in_poly_edges(poly, points), points_in_poly(poly, points))
+
+
+@pytest.mark.parametrize('nvert', [3, 100, 2000])
+def test_points_in_poly_sweep_same(nvert):
+    rng = np.random.default_rng(nvert)
+    theta = np.linspace(0, 2 * np.pi, nvert, endpoint=False)
+    r = rng.uniform(2.0, 6.0, nvert)
+    poly = np.c_[r * np.cos(theta), r * np.sin(theta)]
+    poly[1::7, 1] = poly[0:-1:7, 1]
+    points = np.r_[rng.uniform(-6.0, 6.0, (3000, 2)),
+                   poly,
+                   [(np.nan, 0.0), (0.0, np.nan), (0.0, 0.0)],
+                   ]
+    expected = points_in_poly(poly, points)
+
+    assert np.array_equal(points_in_poly_sweep(poly, points), expected)
+    assert np.array_equal(points_in_poly_sweep(poly, points, n_threads=3), expected)
+    assert np.array_equal(points_in_poly_sweep(poly, x=points[:, 0].astype(np.float32),
+                                               y=points[:, 1].astype(np.float32)),
+                          points_in_poly(poly, points.astype(np.float32)))
+
+    poly[nvert // 2] = np.nan
+    assert np.array_equal(points_in_poly_sweep(poly, points), points_in_poly(poly, points))
+
+
+def test_points_in_poly_sweep_scalar():
+    assert points_in_poly_sweep(poly1, (0.5, 0.5)) is True
+    assert points_in_poly_sweep(poly1, (1.5, 0.5)) is False
+
+
+@pytest.mark.parametrize('func', [points_in_poly, points_in_poly_edges])
+@pytest.mark.parametrize('n_threads', [1, 2, 3, 8])
+def test_points_in_poly_threads(func, n_threads):
+    """
+    multi-threaded should give exactly the same answer
+    """
+    points = np.random.default_rng(5).uniform(-6.0, 6.0, (10_001, 2))
+
+    assert np.array_equal(func(poly1_ccw, points, n_threads=n_threads),
+                          points_in_poly(poly1_ccw, points))
+
+
+@pytest.mark.parametrize('func', [points_in_poly, points_in_poly_edges])
+def test_points_in_poly_strided_float32(func):
+    """
+    strided and float32 points are used without copying -- same answer
+    """
+    points = np.random.default_rng(6).uniform(-6.0, 6.0, (2001, 3))
+    expected = points_in_poly(poly1_ccw, np.ascontiguousarray(points[::2, :2]))
+
+    assert np.array_equal(func(poly1_ccw, points[::2, :2]), expected)
+
+    points32 = points.astype(np.float32)
+    expected = points_in_poly(poly1_ccw, points32[::2, :2].astype(np.float64))
+    assert np.array_equal(func(poly1_ccw, points32[::2, :2]), expected)
+
+
+@pytest.mark.parametrize('func', [points_in_poly, points_in_poly_edges])
+def test_points_in_poly_x_y(func):
+    points = np.random.default_rng(7).uniform(-6.0, 6.0, (1000, 2))
+    expected = points_in_poly(poly1_ccw, points)
+
+    assert np.array_equal(func(poly1_ccw, x=points[:, 0], y=points[:, 1]), expected)
+    # read-only arrays are fine too
+    points.flags.writeable = False
+    assert np.array_equal(func(poly1_ccw, x=points[:, 0], y=points[:, 1]), expected)
+    assert func(poly1_ccw, x=-3.0, y=0.0) is True
+
+
+def test_points_in_poly_x_y_bad():
+    with pytest.raises(ValueError):
+        points_in_poly(poly1, ((0.5, 0.5), ), x=[0.5], y=[0.5])
+    with pytest.raises(ValueError):
+        points_in_poly(poly1, x=[0.5])
+    with pytest.raises(ValueError):
+        points_in_poly(poly1, x=[0.5, 1.0], y=[0.5])
+
+
+def test_points_in_polys_threads():
+    pgons = np.array([poly1_ccw, poly2_ccw] * 500)
+    points = np.array([((-3.0, 0.0)), ((2.0, 3.0))] * 250
+                      + [((2.0, 3.0)), ((-3.0, 0.0))] * 250)
+
+    result = points_in_polys(pgons, points)
+    assert np.all(result[:500])
+    assert not np.any(result[500:])
+    assert np.array_equal(points_in_polys(pgons, points, n_threads=4), result)
+
+
+def test_points_in_poly_bad_threads():
+    with pytest.raises(ValueError):
+        points_in_poly(poly1, ((0.5, 0.5), ), n_threads=0)
+
+
+def test_points_in_ragged_polys():
+    """
+    should be the same as the padded version
+    """
+    tri = np.array(((0.0, 0.0), (2.0, 0.0), (0.0, 2.0)))
+    polys = [poly1_ccw, poly2_ccw, tri, poly1] * 100
+    points = np.random.default_rng(7).uniform(-6.0, 6.0, (len(polys), 2))
+
+    coords = np.concatenate(polys)
+    offsets = np.cumsum([0] + [len(p) for p in polys])
+
+    # pad by repeating the last vertex -- a zero-length edge has no effect
+    padded = np.array([np.r_[p, np.repeat(p[-1:], 8 - len(p), axis=0)] for p in polys])
+    expected = points_in_polys(padded, points)
+
+    assert np.array_equal(points_in_ragged_polys(coords, offsets, points), expected)
+    assert np.array_equal(points_in_ragged_polys(coords, offsets, points, n_threads=4),
+                          expected)
+
+
+def test_points_in_ragged_polys_wrong_number():
+    coords = np.concatenate([poly1, poly1])
+    points = np.array(((0.5, 0.5), (1.5, 1.5), (0.5, 0.5)))
+    with pytest.raises(ValueError):
+        points_in_ragged_polys(coords, [0, 4, 8], points)
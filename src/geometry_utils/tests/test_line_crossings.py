@@ -13,7 +13,10 @@ import numpy as np
 from geometry_utils.cy_line_crossings import (cross_product,
                                               side_of_line,
                                               segment_cross,
-                                              multi_segment_cross)
+                                              segments_cross,
+                                              segment_intersections,
+                                              multi_segment_cross,
+                                              side_of_polyline)
 
 
 def test_cross_product1():
@@ -104,6 +107,123 @@ def test_segment_cross_no():
         assert not segment_cross(S1, S2)
 
 
+def random_segments(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0.0, 10.0, (n, 2, 2))
+
+
+def test_segments_cross():
+    a = random_segments(1000, seed=1)
+    b = random_segments(1000, seed=2)
+
+    result = segments_cross(a, b)
+
+    assert result.dtype == np.bool_
+    assert result.shape == (1000,)
+    assert result.tolist() == [segment_cross(s1, s2) for s1, s2 in zip(a, b)]
+    assert 0 < result.sum() < 1000
+
+
+def test_segments_cross_same_as_segment_cross():
+    S1 = ((0.0, 0.0), (10.0, 10.0))
+    others = [((10.0, 0.0), (0.0, 10.0)),
+              ((0.0, 0.0), (1.0, 0.0)),
+              ((10.0, 10.0), (20.0, 10.0)),
+              ((5.0, 5.0), (0.0, 5.0)),
+              ((10.0, 0.0), (10.0, -10.0)),
+              ((-1.0, 0.0), (0.0, -1.0)),
+              ((11.0, 9.0), (9.0, -11.0)),
+              ((5.0, 5.00000000000001), (0.0, 5.0)),
+              ]
+    # one segment broadcast against the others
+    result = segments_cross(S1, others)
+
+    assert result.tolist() == [segment_cross(S1, S2) for S2 in others]
+
+
+def test_segments_cross_start_end():
+    a = random_segments(100, seed=3)
+    barrier = (np.array((5.0, 0.0)), np.array((5.0, 10.0)))
+
+    result = segments_cross((a[:, 0], a[:, 1]), barrier)
+
+    assert result.tolist() == [segment_cross(s, barrier) for s in a]
+    assert np.array_equal(result, segments_cross(a, np.array(barrier)))
+
+
+def test_segments_cross_pairwise():
+    a = random_segments(30, seed=4)
+    b = random_segments(20, seed=5)
+
+    result = segments_cross(a, b, pairwise=True)
+
+    assert result.shape == (30, 20)
+    assert np.array_equal(result, segments_cross(a[:, None], b[None, :]))
+    assert result[7].tolist() == [segment_cross(a[7], s) for s in b]
+
+
+def test_segments_cross_bad_shape():
+    with pytest.raises(ValueError):
+        segments_cross(np.zeros((10, 3, 2)), np.zeros((10, 2, 2)))
+    with pytest.raises(ValueError):
+        segments_cross(np.zeros((10, 2, 2)), np.zeros((9, 2, 2)))
+
+
+def test_segment_intersections():
+    a = random_segments(1000, seed=6)
+    b = random_segments(1000, seed=7)
+
+    crosses, points, t, u, collinear = segment_intersections(a, b)
+
+    assert np.array_equal(crosses, segments_cross(a, b))
+    assert not collinear.any()
+    assert points.shape == (1000, 2)
+    # the points are where the segments cross
+    assert np.allclose(points[crosses], (a[:, 0] + t[:, None] * (a[:, 1] - a[:, 0]))[crosses])
+    assert np.allclose(points[crosses], (b[:, 0] + u[:, None] * (b[:, 1] - b[:, 0]))[crosses])
+    assert np.all((t[crosses] >= 0.0) & (t[crosses] <= 1.0))
+    assert np.all((u[crosses] >= 0.0) & (u[crosses] <= 1.0))
+    assert np.isnan(points[~crosses]).all()
+    assert np.isnan(t[~crosses]).all() and np.isnan(u[~crosses]).all()
+
+
+def test_segment_intersections_special():
+    a = ((0.0, 0.0), (10.0, 0.0))
+    others = [((5.0, -5.0), (5.0, 5.0)),  # crossing
+              ((10.0, 0.0), (10.0, 5.0)),  # touching the end
+              ((5.0, 1.0), (15.0, 1.0)),  # parallel
+              ((4.0, 0.0), (20.0, 0.0)),  # overlapping
+              ((12.0, 0.0), (2.0, 0.0)),  # overlapping, the other way
+              ((10.0, 0.0), (12.0, 0.0)),  # end to end
+              ((11.0, 0.0), (12.0, 0.0)),  # collinear, not touching
+              ((3.0, 0.0), (3.0, 0.0)),  # a point on it
+              ]
+
+    crosses, points, t, u, collinear = segment_intersections(a, others)
+
+    assert crosses.tolist() == [True, True, False, True, True, True, False, True]
+    assert collinear.tolist() == [False, False, False, True, True, True, False, True]
+    assert points[crosses].tolist() == [[5.0, 0.0], [10.0, 0.0], [4.0, 0.0],
+                                        [2.0, 0.0], [10.0, 0.0], [3.0, 0.0]]
+    assert t[crosses].tolist() == [0.5, 1.0, 0.4, 0.2, 1.0, 0.3]
+    assert u[crosses].tolist() == [0.5, 0.0, 0.0, 1.0, 0.0, 0.0]
+    # segment_cross says all collinear segments cross
+    assert segment_cross(a, others[6])
+
+
+def test_segment_intersections_pairwise():
+    a = random_segments(30, seed=8)
+    b = random_segments(20, seed=9)
+
+    crosses, points, t, u, collinear = segment_intersections(a, b, pairwise=True)
+
+    assert crosses.shape == t.shape == u.shape == collinear.shape == (30, 20)
+    assert points.shape == (30, 20, 2)
+    one_to_one = segment_intersections(a[:, None], b[None, :])
+    for r1, r2 in zip((crosses, points, t, u, collinear), one_to_one):
+        assert np.array_equal(r1, r2, equal_nan=True)
+
+
 def test_multi_segment_cross():
     """
     tests the mult-segment cross function
@@ -127,7 +247,7 @@ def test_multi_segment_cross():
 
     crosses = multi_segment_cross(points, segments)
 
-    assert crosses == [(0, 1)]
+    assert crosses.tolist() == [[0, 1]]
 
 
 def test_multi_segment_cross_share_both_points():
@@ -153,7 +273,7 @@ def test_multi_segment_cross_share_both_points():
     ), dtype=np.int32)
 
     crosses = multi_segment_cross(points, segments)
-    assert crosses == [(0, 1), (2, 3)]
+    assert crosses.tolist() == [[0, 1], [2, 3]]
 
 
 def test_multi_segment_cross_share_point():
@@ -176,28 +296,28 @@ def test_multi_segment_cross_share_point():
         (1, 2),
     ), dtype=np.int32)
     crosses = multi_segment_cross(points, segments)
-    assert crosses == []
+    assert crosses.tolist() == []
 
     segments = np.array((
         (1, 2),
         (0, 1),
     ), dtype=np.int32)
     crosses = multi_segment_cross(points, segments)
-    assert crosses == []
+    assert crosses.tolist() == []
 
     segments = np.array((
         (0, 1),
         (2, 1),
     ), dtype=np.int32)
     crosses = multi_segment_cross(points, segments)
-    assert crosses == []
+    assert crosses.tolist() == []
 
     segments = np.array((
         (2, 1),
         (0, 1),
     ), dtype=np.int32)
     crosses = multi_segment_cross(points, segments)
-    assert crosses == []
+    assert crosses.tolist() == []
 
 
 # def test_as_mv_2x2_double():
@@ -206,3 +326,131 @@ def test_multi_segment_cross_share_point():
 #     print(mv)
 
 #     assert False
+
+
+def test_multi_segment_cross_share_point_then_cross():
+    """
+    sharing a point with one segment doesn't stop it crossing the next
+    """
+    points = np.array(((0.0, 0.0), (10.0, 10.0), (20.0, 0.0), (0.0, 10.0), (10.0, 0.0)))
+    segments = np.array(((0, 1), (1, 2), (3, 4)), dtype=np.int32)
+
+    crosses = multi_segment_cross(points, segments)
+
+    assert crosses.dtype == np.int32
+    assert crosses.tolist() == [[0, 2]]
+
+
+@pytest.mark.parametrize('far', [1e10, 1e11, 1e15, 1e300])
+def test_multi_segment_cross_spread_out(far):
+    """
+    a few short segments, very far apart: too many grid cells to count
+    """
+    points = np.array([(-1, -1), (1, 1), (-1, 1), (1, -1),
+                       (far, far), (far + 1, far), (-far, far), (-far, far + 1)],
+                      dtype=np.float64)
+    segments = np.array([(0, 1), (2, 3), (4, 5), (6, 7)], dtype=np.int32)
+
+    assert multi_segment_cross(points, segments).tolist() == [[0, 1]]
+
+
+def test_multi_segment_cross_huge_extent():
+    # x1 - x0 is infinite
+    points = np.array([(-1, -1), (1, 1), (-1, 1), (1, -1),
+                       (-1.7e308, 0), (-1.7e308, 1), (1.7e308, 0), (1.7e308, 1)])
+    segments = np.array([(0, 1), (2, 3), (4, 5), (6, 7)], dtype=np.int32)
+
+    assert multi_segment_cross(points, segments).tolist() == [[0, 1]]
+
+
+def test_multi_segment_cross_bad_index():
+    points = np.zeros((3, 2))
+    with pytest.raises(IndexError):
+        multi_segment_cross(points, np.array(((0, 1), (1, 3)), dtype=np.int32))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_multi_segment_cross_random(seed):
+    """
+    the same as checking all the pairs
+    """
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0.0, 100.0, (200, 2))
+    # mostly short segments, and a few long ones
+    segments = np.c_[np.arange(200), np.arange(1, 201) % 200].astype(np.int32)
+    segments = np.r_[segments, rng.integers(0, 200, (20, 2)).astype(np.int32)]
+    segments = segments[segments[:, 0] != segments[:, 1]]
+
+    crosses = multi_segment_cross(points, segments)
+
+    expected = []
+    for i, (a, b) in enumerate(segments):
+        for j in range(i + 1, len(segments)):
+            c, d = segments[j]
+            if {a, b} == {c, d}:
+                expected.append([i, j])
+            elif not {a, b} & {c, d} and segment_cross((points[a], points[b]),
+                                                       (points[c], points[d])):
+                expected.append([i, j])
+    assert crosses.tolist() == expected
+
+
+def test_side_of_polyline():
+    # a right turn then a left turn
+    line = [(0.0, 0.0), (2.0, 0.0), (2.0, -2.0), (4.0, -2.0)]
+    points = [(1.0, 1.0),  # left of the first segment
+              (1.0, -1.0),  # right
+              (3.0, 0.0),  # left, off the right turn
+              (3.0, -1.0),  # left, inside the left turn
+              (1.0, -3.0),  # right, off the left turn
+              (-1.0, 1.0),  # left, past the start
+              (5.0, -3.0),  # right, past the end
+              (1.0, 0.0),  # on it
+              (2.0, -1.0),  # on it
+              ]
+    assert side_of_polyline(points, line).tolist() == [1, -1, 1, 1, -1, 1, -1, 0, 0]
+
+
+def test_side_of_polyline_distance():
+    line = [(0.0, 0.0), (2.0, 0.0), (2.0, 0.0), (2.0, -2.0)]
+    points = np.array([(1.0, 1.0), (1.0, -0.5), (3.0, 1.0), (np.nan, 0.0)])
+
+    dist = side_of_polyline(points, line, distance=True)
+
+    assert np.allclose(dist[:3], (1.0, -0.5, np.sqrt(2.0)))
+    assert np.isnan(dist[3])
+    assert side_of_polyline(points, line).tolist() == [1, -1, 1, 0]
+    assert side_of_polyline((1.0, 1.0), line) == 1
+
+
+def test_side_of_polyline_bad():
+    with pytest.raises(ValueError):
+        side_of_polyline([(0.0, 0.0)], [(1.0, 1.0), (1.0, 1.0)])
+    with pytest.raises(ValueError):
+        side_of_polyline([(0.0, 0.0, 0.0)], [(0.0, 0.0), (1.0, 1.0)])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_side_of_polyline_random(seed):
+    """
+    a wiggly line from left to right: left of it is above it
+    """
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.uniform(0.0, 100.0, 300))
+    y = rng.uniform(0.0, 10.0, 300)
+    line = np.c_[x, y]
+    points = np.c_[rng.uniform(x[0], x[-1], 2000), rng.uniform(-5.0, 15.0, 2000)]
+
+    side = side_of_polyline(points, line)
+    dist = side_of_polyline(points, line, distance=True)
+
+    above = points[:, 1] > np.interp(points[:, 0], x, y)
+    assert np.array_equal(side == 1, above)
+    assert np.array_equal(side == -1, ~above)
+
+    # the distance to the closest of all the segments
+    start, end = line[:-1, None], line[1:, None]
+    d = end - start
+    t = np.clip(np.sum((points - start) * d, axis=2) / np.sum(d * d, axis=2), 0.0, 1.0)
+    closest = np.sqrt(np.sum((start + t[..., None] * d - points) ** 2, axis=2)).min(axis=0)
+    assert np.allclose(np.abs(dist), closest)
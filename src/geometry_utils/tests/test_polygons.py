@@ -3,16 +3,37 @@ test code for the polygons.py API
 """
 
 from pathlib import Path
+import tracemalloc
 
 import numpy as np
 import pytest
 
+import geometry_utils.polygons
+
 from geometry_utils import (polygon_inside,
                             polygon_rotation,
                             polygon_area,
                             polygon_centroid,
+                            polygons_area,
+                            polygons_centroid,
+                            polygons_rotation,
+                            polygon_properties,
+                            polygons_properties,
+                            orient_polygons,
                             polygon_is_simple,
+                            find_self_intersections,
+                            polygon_is_convex,
+                            validate_polygons,
+                            PreparedPolygon,
+                            locate_points,
+                            rasterize_polygon,
+                            polygon_inside_chunked,
+                            polygon_inside_indices,
+                            polygon_inside_count,
                             )
+from geometry_utils.cy_line_crossings import segment_cross
+from geometry_utils.polygons import (TOO_FEW_VERTICES, ZERO_AREA, REPEATED_VERTICES,
+                                     NOT_SIMPLE, NOT_FINITE)
 # from geometry_utils.cy_polygons import polygon_centroid
 
 try:
@@ -64,6 +85,562 @@ def test_polygon_inside_multiple_points():
     assert np.all(result == [False, True, False])
 
 
+def wiggly_polygon(nvert, seed=0):
+    """
+    a star-shaped polygon with lots of vertices -- kind of like a coastline
+    """
+    rng = np.random.default_rng(seed)
+    theta = np.linspace(0, 2 * np.pi, nvert, endpoint=False)
+    r = 10.0 + rng.uniform(-3.0, 3.0, nvert)
+    return np.c_[r * np.cos(theta), r * np.sin(theta)]
+
+
+def random_points(n, seed=1):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-14.0, 14.0, (n, 2))
+
+
+def test_polygon_inside_many_points():
+    """
+    lots of points uses the edge-major loop -- should be the same answer
+    """
+    points = np.r_[random_points(1000, seed=4) / 2.0, [pt1, pt2, pt3]]
+    result = polygon_inside(poly1, points)
+
+    assert np.all(result[-3:] == [False, True, False])
+    # small batches use the point-major loop
+    for i in range(0, len(points), 10):
+        assert np.array_equal(result[i:i + 10], polygon_inside(poly1, points[i:i + 10]))
+
+
+def test_polygon_inside_structured_array():
+    """
+    x and y can be passed in separately -- e.g. fields of a structured array
+    """
+    points = random_points(1000, seed=5) / 2.0
+    arr = np.zeros(len(points), dtype=[('x', np.float32), ('t', np.int64), ('y', np.float32)])
+    arr['x'] = points[:, 0]
+    arr['y'] = points[:, 1]
+    expected = polygon_inside(poly1, np.c_[arr['x'], arr['y']].astype(np.float64))
+
+    assert np.array_equal(polygon_inside(poly1, x=arr['x'], y=arr['y']), expected)
+    # and the point-major loop
+    assert np.array_equal(polygon_inside(poly1, x=arr['x'][:10], y=arr['y'][:10]),
+                          expected[:10])
+    assert np.array_equal(PreparedPolygon(poly1).inside(x=arr['x'], y=arr['y']), expected)
+
+
+@pytest.mark.parametrize('n_threads', [None, 3])
+@pytest.mark.parametrize('npoints', [0, 1, 600, 10_001])
+def test_polygon_inside_indices(npoints, n_threads):
+    poly = wiggly_polygon(50)
+    points = random_points(npoints)
+    inside = polygon_inside(poly, points)
+
+    indices = polygon_inside_indices(poly, points, n_threads=n_threads)
+    assert indices.dtype == np.intp
+    assert np.array_equal(indices, np.flatnonzero(inside))
+
+    count = polygon_inside_count(poly, points, n_threads=n_threads)
+    assert count == inside.sum()
+
+
+@pytest.mark.parametrize('nvert', [20_000, 600])
+def test_polygon_inside_indices_big_polygon(nvert, monkeypatch):
+    # uses the same loop as polygon_inside: the sweep, or monotone chains,
+    # a block at a time
+    monkeypatch.setattr(geometry_utils.polygons, "DEFAULT_CHUNK_SIZE", 3000)
+    if nvert > 1000:
+        poly = wiggly_polygon(nvert)
+    else:  # convex
+        theta = np.linspace(0, 2 * np.pi, nvert, endpoint=False)
+        poly = np.c_[10 * np.cos(theta), 7 * np.sin(theta)]
+    points = random_points(20_000)
+    inside = polygon_inside(poly, points)
+    assert 0 < inside.sum() < len(points)
+
+    for p in (poly, PreparedPolygon(poly)):
+        assert np.array_equal(polygon_inside_indices(p, points), np.flatnonzero(inside))
+        assert polygon_inside_count(p, points) == inside.sum()
+        assert polygon_inside_count(p, x=points[:, 0], y=points[:, 1]) == inside.sum()
+
+
+def test_polygon_inside_indices_int32():
+    points = random_points(1000)
+    expected = np.flatnonzero(polygon_inside(poly1, points))
+    for poly in (poly1, PreparedPolygon(poly1)):
+        indices = polygon_inside_indices(poly, points, dtype=np.int32)
+        assert indices.dtype == np.int32
+        assert np.array_equal(indices, expected)
+    with pytest.raises(ValueError):
+        polygon_inside_indices(poly1, points, dtype=np.float64)
+
+
+def test_polygon_inside_indices_ring_offsets():
+    verts = np.array([(0, 0), (10, 0), (10, 10), (0, 10),
+                      (4, 4), (6, 4), (6, 6), (4, 6)], dtype=np.float64)
+    points = [(2, 5), (5, 5), (11, 5), (8, 8)]
+
+    assert polygon_inside_indices(verts, points, ring_offsets=[0, 4, 8]).tolist() == [0, 3]
+    assert polygon_inside_count(verts, points, ring_offsets=[0, 4, 8]) == 2
+
+
+def test_polygon_inside_indices_x_y():
+    points = random_points(1000).astype(np.float32)
+    inside = polygon_inside(poly1, points)
+
+    assert np.array_equal(polygon_inside_indices(poly1, x=points[:, 0], y=points[:, 1]),
+                          np.flatnonzero(inside))
+    assert polygon_inside_count(poly1, x=points[:, 0], y=points[:, 1]) == inside.sum()
+
+
+@pytest.mark.parametrize('nvert', [5, 1000])
+def test_polygon_inside_chunked_memmap(tmp_path, nvert):
+    poly = wiggly_polygon(nvert)
+    points = np.lib.format.open_memmap(tmp_path / "points.npy", mode='w+',
+                                       dtype=np.float32, shape=(10_001, 2))
+    points[:] = random_points(10_001)
+    out = np.lib.format.open_memmap(tmp_path / "inside.npy", mode='w+',
+                                    dtype=bool, shape=(10_001,))
+
+    result = polygon_inside_chunked(poly, points, out=out, chunk_size=1000)
+
+    assert result is out
+    assert np.array_equal(out, polygon_inside(poly, points))
+
+
+def test_polygon_inside_chunked_generator():
+    points = random_points(2500)
+    chunks = [points[:1000], points[1000:1001], points[1001:]]
+    results = list(polygon_inside_chunked(poly1, iter(chunks)))
+
+    assert [len(r) for r in results] == [1000, 1, 1499]
+    assert np.array_equal(np.concatenate(results), polygon_inside(poly1, points))
+
+
+def test_polygon_inside_chunked_list():
+    # a list of points is the points, not chunks of them
+    points = [(1, 1), (20, 20)]
+    expected = polygon_inside(poly1, np.array(points, dtype=np.float64))
+
+    results = list(polygon_inside_chunked(poly1, points))
+    assert len(results) == 1
+    assert np.array_equal(results[0], expected)
+    # a single point
+    results = list(polygon_inside_chunked(poly1, np.array((1.0, 1.0))))
+    assert len(results) == 1 and results[0].shape == (1,)
+    # a list of chunks
+    results = list(polygon_inside_chunked(poly1, [np.array(points), np.array(points[:1])]))
+    assert [len(r) for r in results] == [2, 1]
+
+
+def test_polygon_inside_chunked_list_memory():
+    """
+    a list of chunks isn't all converted at once
+    """
+    chunks = [random_points(100_000) for _ in range(8)]
+    expected = polygon_inside(poly1, chunks[0])
+
+    tracemalloc.start()
+    try:
+        first = next(iter(polygon_inside_chunked(poly1, chunks)))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert np.array_equal(first, expected)
+    # one chunk is 1.6 MB -- all of them would be 12.8 MB
+    assert peak < 4_000_000
+
+
+def test_polygon_inside_chunked_x_y():
+    points = random_points(2500)
+    expected = polygon_inside(poly1, points)
+    results = polygon_inside_chunked(poly1, x=points[:, 0], y=points[:, 1], chunk_size=1000)
+
+    assert np.array_equal(np.concatenate(list(results)), expected)
+
+
+def test_polygon_inside_chunked_wrong_out():
+    points = random_points(2500)
+    with pytest.raises(ValueError):
+        polygon_inside_chunked(poly1, points, out=np.zeros(2000, dtype=bool))
+    with pytest.raises(ValueError):
+        polygon_inside_chunked(poly1, points, out=np.zeros(3000, dtype=bool))
+
+
+def test_polygon_inside_big_polygon():
+    """
+    lots of points in a big polygon uses the sweep line -- should be the same answer
+    """
+    poly = wiggly_polygon(2000)
+    points = np.r_[random_points(1000, seed=4), poly]
+    result = polygon_inside(poly, points)
+
+    for i in range(0, len(points), 50):
+        assert np.array_equal(result[i:i + 50], polygon_inside(poly, points[i:i + 50]))
+
+
+# polygons with holes and multiple parts -- GeoArrow style coords and offsets
+square_ccw = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 0.0)]
+hole_cw = [(2.0, 2.0), (2.0, 8.0), (8.0, 8.0), (8.0, 2.0), (2.0, 2.0)]
+island_ccw = [(4.0, 4.0), (6.0, 4.0), (6.0, 6.0), (4.0, 6.0), (4.0, 4.0)]
+other_ccw = [(20.0, 0.0), (30.0, 0.0), (30.0, 10.0), (20.0, 10.0)]
+
+multi_coords = square_ccw + hole_cw + island_ccw + other_ccw
+multi_ring_offsets = [0, 5, 10, 15, 19]
+# square with a hole, an island in the hole, and another square
+multi_part_offsets = [0, 2, 3, 4]
+
+multi_points = [(1.0, 1.0),  # in the square, but not the hole
+                (3.0, 3.0),  # in the hole
+                (5.0, 5.0),  # on the island
+                (25.0, 5.0),  # in the other square
+                (15.0, 5.0),  # between the squares
+                (-1.0, 5.0),  # outside everything
+                ]
+multi_result = [True, False, True, True, False, False]
+
+
+@pytest.mark.parametrize('fill_rule', ["evenodd", "nonzero"])
+def test_polygon_inside_multipolygon(fill_rule):
+    result = polygon_inside(multi_coords, multi_points,
+                            ring_offsets=multi_ring_offsets,
+                            part_offsets=multi_part_offsets,
+                            fill_rule=fill_rule)
+
+    assert np.array_equal(result, multi_result)
+
+
+def test_polygon_inside_hole_default_parts():
+    """
+    with no part offsets, it's a single polygon: all the rings after the first are holes
+    """
+    result = polygon_inside(square_ccw + hole_cw, multi_points[:3],
+                            ring_offsets=[0, 5, 10])
+
+    assert np.array_equal(result, [True, False, False])
+    assert polygon_inside(square_ccw + hole_cw, (1.0, 1.0), ring_offsets=[0, 5, 10]) is True
+
+
+def test_polygon_inside_rings_vertex_at_origin():
+    """
+    the old (0,0) separator trick would break on this one
+    """
+    tri = [(0.0, 0.0), (4.0, 0.0), (0.0, 4.0)]
+    result = polygon_inside(tri, [(1.0, 1.0), (3.0, 3.0)], ring_offsets=[0, 3])
+
+    assert np.array_equal(result, [True, False])
+
+
+def test_polygon_inside_rings_nonzero_overlap():
+    """
+    overlapping rings wound the same way: nonzero fills the overlap, evenodd doesn't
+    """
+    coords = square_ccw + [(x + 5.0, y) for x, y in square_ccw]
+    point = (7.0, 5.0)  # in both
+
+    assert polygon_inside(coords, point, ring_offsets=[0, 5, 10], fill_rule="nonzero")
+    assert not polygon_inside(coords, point, ring_offsets=[0, 5, 10], fill_rule="evenodd")
+
+
+def test_polygon_inside_single_ring_same():
+    poly = wiggly_polygon(500)
+    points = np.r_[random_points(5000), poly]
+
+    assert np.array_equal(polygon_inside(poly, points, ring_offsets=[0, len(poly)]),
+                          polygon_inside(poly, points))
+
+
+def test_polygon_inside_bad_fill_rule():
+    with pytest.raises(ValueError):
+        polygon_inside(square_ccw, (1.0, 1.0), ring_offsets=[0, 5], fill_rule="winding")
+
+
+def test_polygon_inside_bad_ring_offsets():
+    with pytest.raises(ValueError):
+        polygon_inside(square_ccw, (1.0, 1.0), ring_offsets=[0, 6])
+
+
+def test_polygon_inside_prepared_ring_offsets():
+    # a PreparedPolygon is one ring: the offsets can't be applied to it
+    verts = np.array([(0, 0), (10, 0), (10, 10), (0, 10),
+                      (4, 4), (6, 4), (6, 6), (4, 6)], dtype=np.float64)
+    assert polygon_inside(verts, [(2, 5)], ring_offsets=[0, 4, 8]).tolist() == [True]
+    with pytest.raises(ValueError):
+        polygon_inside(PreparedPolygon(verts), [(2, 5)], ring_offsets=[0, 4, 8])
+    with pytest.raises(ValueError):
+        polygon_inside(PreparedPolygon(verts), [(2, 5)], fill_rule="nonzero")
+
+
+def grid_of_squares(n):
+    """
+    n x n unit squares, each a polygon
+    """
+    unit = np.array([(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)])
+    return [unit + (i, j) for j in range(n) for i in range(n)]
+
+
+def test_locate_points():
+    squares = grid_of_squares(30)
+    points = np.random.default_rng(6).uniform(-1.0, 31.0, (5000, 2))
+
+    result = locate_points(points, squares)
+
+    # brute force
+    expected = np.full(len(points), -1)
+    for i, square in enumerate(squares):
+        expected[(expected == -1) & polygon_inside(square, points)] = i
+
+    assert result.dtype == np.intp
+    assert np.array_equal(result, expected)
+    assert np.array_equal(locate_points(points, squares, n_threads=3), expected)
+
+
+def test_locate_points_x_y():
+    points = np.random.default_rng(3).uniform(-1.0, 11.0, (500, 2)).astype(np.float32)
+    expected = locate_points(points, grid_of_squares(10))
+
+    assert np.array_equal(locate_points(None, grid_of_squares(10),
+                                        x=points[:, 0], y=points[:, 1]),
+                          expected)
+
+
+def test_locate_points_offsets():
+    squares = grid_of_squares(3)
+    coords = np.concatenate(squares)
+    offsets = np.arange(0, len(coords) + 1, 4)
+
+    assert locate_points((1.5, 2.5), coords, offsets) == 7
+    assert locate_points((5.5, 2.5), coords, offsets) == -1
+
+
+def test_locate_points_overlapping():
+    """
+    the lowest index polygon is returned
+    """
+    big = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0)]
+    small = [(4.0, 4.0), (6.0, 4.0), (6.0, 6.0), (4.0, 6.0)]
+
+    assert locate_points((5.0, 5.0), [small, big]) == 0
+    assert locate_points((5.0, 5.0), [big, small]) == 0
+    assert np.array_equal(locate_points([(5.0, 5.0), (1.0, 1.0)], [small, big]), [0, 1])
+
+
+def test_locate_points_no_polygons():
+    assert np.array_equal(locate_points([(5.0, 5.0), (1.0, 1.0)], []), [-1, -1])
+    assert locate_points(pt1, [poly1]) == -1
+    assert locate_points(pt2, [poly1]) == 0
+
+
+def test_polygon_inside_python_threads():
+    """
+    the GIL is released, so this should run in parallel -- and get the same answer
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    poly = wiggly_polygon(200)
+    points = random_points(10_000)
+    expected = polygon_inside(poly, points)
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda p: polygon_inside(poly, points), range(8)))
+    for result in results:
+        assert np.array_equal(result, expected)
+
+
+def cell_centers(grid_origin, cell_size, shape):
+    x = grid_origin[0] + (np.arange(shape[1]) + 0.5) * cell_size[0]
+    y = grid_origin[1] + (np.arange(shape[0]) + 0.5) * cell_size[1]
+    x, y = np.meshgrid(x, y)
+    return np.c_[x.ravel(), y.ravel()]
+
+
+@pytest.mark.parametrize('poly, grid_origin, cell_size, shape',
+                         [(wiggly_polygon(1000), (-15.0, -14.0), (0.1, 0.07), (400, 300)),
+                          (wiggly_polygon(5), (-15.0, -14.0), (0.3, 0.3), (100, 100)),
+                          (poly1, (-0.5, -0.5), (1.0, 1.0), (12, 14)),  # vertices on centers
+                          (poly1, (0.0, 0.0), (1.0, 1.0), (12, 14)),  # edges on centers
+                          (poly1, (3.0, -5.0), (0.5, 0.25), (10, 10)),  # grid partly outside
+                          ])
+def test_rasterize_polygon(poly, grid_origin, cell_size, shape):
+    mask = rasterize_polygon(poly, grid_origin, cell_size, shape)
+
+    assert mask.shape == shape
+    assert mask.dtype == bool
+    expected = polygon_inside(poly, cell_centers(grid_origin, cell_size, shape))
+    assert np.array_equal(mask.ravel(), expected)
+
+
+def test_rasterize_polygon_scalar_cell_size():
+    mask = rasterize_polygon(poly1, (0.0, 0.0), 1.0, (12, 14))
+
+    assert np.array_equal(mask, rasterize_polygon(poly1, (0.0, 0.0), (1.0, 1.0), (12, 14)))
+    assert mask.any()
+
+
+def test_rasterize_polygon_bad_cell_size():
+    with pytest.raises(ValueError):
+        rasterize_polygon(poly1, (0.0, 0.0), (1.0, -1.0), (12, 14))
+
+
+@pytest.mark.parametrize('nvert', [3, 20, 1000])
+def test_prepared_polygon_same_as_polygon_inside(nvert):
+    poly = wiggly_polygon(nvert)
+    # the vertices themselves are a good test of the boundary cases
+    points = np.r_[random_points(10_000), poly]
+
+    pp = PreparedPolygon(poly)
+
+    assert np.array_equal(pp.inside(points), polygon_inside(poly, points))
+    assert np.array_equal(pp.inside(points, n_threads=4), polygon_inside(poly, points))
+
+
+@pytest.mark.parametrize('nvert', [3, 20, 1000])
+def test_prepared_polygon_not_exact(nvert):
+    """
+    precomputed edge coefficients can only differ right on the edges
+    """
+    poly = wiggly_polygon(nvert)
+    points = random_points(10_000)
+
+    pp = PreparedPolygon(poly, exact=False)
+
+    assert np.array_equal(pp.inside(points), polygon_inside(poly, points))
+    assert np.array_equal(pp.inside(points, n_threads=4), polygon_inside(poly, points))
+    assert np.array_equal(pp.inside(x=points[:, 0].astype(np.float32),
+                                    y=points[:, 1].astype(np.float32)),
+                          polygon_inside(poly, points.astype(np.float32)))
+
+
+def test_prepared_polygon_not_exact_shared_edge():
+    """
+    with the edge coefficients, a point on an edge shared by two polygons
+    is in exactly one of them, whichever way they are wound
+    """
+    left = np.array([(0.0, 0.0), (0.3, 0.0), (0.7, 1.0), (0.0, 1.0)])
+    right = np.array([(0.3, 0.0), (1.0, 0.0), (1.0, 1.0), (0.7, 1.0)])
+    t = np.linspace(0.0, 1.0, 1001)[:-1]
+    points = np.c_[0.3 + 0.4 * t, t]
+
+    for r in (right, right[::-1]):
+        in_left = PreparedPolygon(left, exact=False).inside(points)
+        in_right = PreparedPolygon(r, exact=False).inside(points)
+        assert np.all(in_left != in_right)
+
+
+# The Gulf of Maine polygon from notes/point_in_polygon_performance.py
+gulf_of_maine = np.array([
+    [-69.0842494, 41.8576263],
+    [-69.3834133, 41.6994390],
+    [-69.4844079, 41.5818408],
+    [-69.7009389, 41.5498641],
+    [-70.0628678, 41.5884718],
+    [-70.3054548, 41.6810850],
+    [-70.6109682, 41.7607248],
+    [-70.8657576, 41.9553727],
+    [-71.1089099, 42.1369069],
+    [-71.1294295, 42.4274792],
+    [-70.8877302, 42.6500898],
+    [-70.7118900, 42.7635708],
+    [-70.4645152, 42.8363260],
+    [-70.1066827, 42.8113145],
+    [-69.9021696, 42.7796958],
+    [-69.7686684, 42.7210923],
+    [-69.4055325, 42.5535379],
+    [-69.1527168, 42.3072355],
+    [-68.9597074, 42.0243090],
+    [-68.9939291, 41.9264228],
+])
+
+
+@pytest.mark.parametrize('exact', [True, False])
+@pytest.mark.parametrize('poly', [gulf_of_maine, wiggly_polygon(20), wiggly_polygon(1000),
+                                  poly1, np.array(square_ccw)],
+                         ids=['gulf_of_maine', 'wiggly20', 'wiggly1000', 'poly1', 'square'])
+def test_prepared_polygon_fast_rects(poly, exact):
+    poly = np.asarray(poly)
+    (xmin, ymin), (xmax, ymax) = poly.min(axis=0), poly.max(axis=0)
+    rng = np.random.default_rng(7)
+    n = 20_000
+    # a box a bit bigger than the polygon, the vertices, and points on the edges
+    t = rng.uniform(0.0, 1.0, (n, 1))
+    i = rng.integers(len(poly), size=n)
+    on_edges = poly[i] + t * (poly[i - 1] - poly[i])
+    points = np.r_[np.c_[rng.uniform(xmin - 0.1 * (xmax - xmin), xmax + 0.1 * (xmax - xmin), n),
+                         rng.uniform(ymin - 0.1 * (ymax - ymin), ymax + 0.1 * (ymax - ymin), n)],
+                   poly,
+                   on_edges,
+                   [(np.nan, ymin), (xmin, np.nan), (-np.inf, ymin), (np.inf, ymin)],
+                   ]
+
+    pp = PreparedPolygon(poly, exact=exact, fast_rects=True)
+
+    assert pp.inner_rect is not None
+    expected = PreparedPolygon(poly, exact=exact).inside(points)
+    assert np.array_equal(pp.inside(points), expected)
+    assert np.array_equal(pp.inside(points, n_threads=3), expected)
+
+
+def test_prepared_polygon_fast_rects_inner_rect():
+    """
+    the inner rectangle should be a good part of a compact polygon
+    """
+    pp = PreparedPolygon(gulf_of_maine, fast_rects=True)
+
+    (x0, y0), (x1, y1) = pp.inner_rect
+    assert (x1 - x0) * (y1 - y0) > 0.4 * polygon_area(gulf_of_maine)
+    assert PreparedPolygon(gulf_of_maine).inner_rect is None
+
+
+def test_prepared_polygon_fast_rects_degenerate():
+    for poly in ([(0.0, 0.0), (1.0, 1.0)],
+                 [(0.0, 0.0), (1.0, 0.0), (2.0, 0.0)],
+                 [(0.0, 0.0), (1.0, 0.0), (np.nan, 1.0), (0.0, 1.0)]):
+        pp = PreparedPolygon(poly, fast_rects=True)
+        assert pp.inner_rect is None
+        points = random_points(100) / 10.0
+        assert np.array_equal(pp.inside(points), polygon_inside(poly, points))
+
+
+def test_prepared_polygon_single_point():
+    pp = PreparedPolygon(poly1)
+
+    assert pp.inside(pt1) is False
+    assert pp.inside(pt2) is True
+
+
+def test_polygon_inside_prepared():
+    pp = PreparedPolygon(poly1)
+    result = polygon_inside(pp, [pt1, pt2, pt3])
+
+    assert np.all(result == [False, True, False])
+
+
+def test_prepared_polygon_long_edges():
+    """
+    long edges span many slabs -- the number of slabs should be reduced
+    """
+    # a comb: lots of vertices, but long vertical edges
+    n_teeth = 200
+    xs = np.arange(n_teeth, dtype=np.float64)
+    comb = np.zeros((2 * n_teeth + 2, 2))
+    comb[0:-2:2, 0] = xs
+    comb[1:-2:2, 0] = xs + 0.5
+    comb[0:-2:4, 1] = 100.0
+    comb[1:-2:4, 1] = 100.0
+    comb[2:-2:4, 1] = 1.0
+    comb[3:-2:4, 1] = 1.0
+    comb[-2] = (n_teeth, 0.0)
+    comb[-1] = (0.0, 0.0)
+
+    pp = PreparedPolygon(comb)
+    assert pp.n_slabs < len(comb)
+
+    points = np.c_[np.random.default_rng(2).uniform(-1, n_teeth + 1, 10_000),
+                   np.random.default_rng(3).uniform(-1, 101, 10_000)]
+    assert np.array_equal(pp.inside(points), polygon_inside(comb, points))
+
+
 def test_rotation_cw():
     assert polygon_rotation(poly1_cw) == 1
 
@@ -72,6 +649,181 @@ def test_rotation_ccw():
     assert polygon_rotation(poly1_ccw) == 0
 
 
+u_shape = [(0, 0), (3, 0), (3, 3), (2, 3), (2, 1), (1, 1), (1, 3), (0, 3)]
+
+
+@pytest.mark.parametrize('n_threads', [None, 3])
+def test_polygons_area_centroid_rotation(n_threads):
+    polys = ([wiggly_polygon(n, seed=n) + n for n in range(3, 200)]
+             + [poly1, poly1[::-1], square_ccw, hole_cw])
+
+    areas = polygons_area(polys, n_threads=n_threads)
+    centroids = polygons_centroid(polys, n_threads=n_threads)
+    rotations = polygons_rotation(polys, n_threads=n_threads)
+
+    assert areas.shape == (len(polys),)
+    assert centroids.shape == (len(polys), 2)
+    for poly, area, centroid, rotation in zip(polys, areas, centroids, rotations):
+        # exactly the same as one at a time
+        assert area == polygon_area(poly)
+        assert tuple(centroid) == polygon_centroid(poly)
+        assert rotation == polygon_rotation(poly)
+
+
+def test_polygons_area_offsets():
+    coords = np.r_[np.array(square_ccw), np.array(hole_cw)]
+
+    assert np.array_equal(polygons_area(coords, offsets=[0, 5, 10]), [100.0, 36.0])
+    assert np.array_equal(polygons_rotation(coords, offsets=[0, 5, 10]), [False, True])
+    assert np.array_equal(polygons_centroid(coords, offsets=[0, 5, 10]), [(5.0, 5.0), (5.0, 5.0)])
+    # an empty polygon
+    assert np.array_equal(polygons_area(coords, offsets=[0, 5, 5]), [100.0, 0.0])
+    with pytest.raises(ValueError):
+        polygons_rotation(coords, offsets=[0, 5, 5])
+    with pytest.raises(ValueError):
+        polygons_area(coords, offsets=[0, 11])
+
+
+def test_polygons_area_centroid_zero_area():
+    # a collinear "polygon" has zero area, and no centroid
+    coords = np.r_[np.array([(0.0, 1.0), (1.0, 2.0), (2.0, 3.0)]), np.array(square_ccw)]
+
+    assert np.array_equal(polygons_area(coords, offsets=[0, 3, 8]), [0.0, 100.0])
+    centroids = polygons_centroid(coords, offsets=[0, 3, 8])
+    assert np.isnan(centroids[0]).all()
+    assert np.array_equal(centroids[1], (5.0, 5.0))
+
+
+def test_polygon_properties():
+    props = polygon_properties(square_ccw)
+
+    assert props.area == 100.0
+    assert props.centroid == (5.0, 5.0)
+    assert props.rotation is False
+    assert np.array_equal(props.bbox, [(0.0, 0.0), (10.0, 10.0)])
+    assert props.perimeter == 40.0
+    assert polygon_properties(hole_cw).rotation is True
+
+
+@pytest.mark.parametrize('n_threads', [None, 3])
+def test_polygons_properties(n_threads):
+    polys = [wiggly_polygon(n, seed=n) + n for n in range(3, 100)] + [poly1, hole_cw]
+
+    props = polygons_properties(polys, n_threads=n_threads)
+
+    assert len(props) == len(polys)
+    for poly, p in zip(polys, props):
+        poly = np.asarray(poly)
+        # same as the one at a time functions
+        assert p["area"] == polygon_area(poly)
+        assert tuple(p["centroid"]) == polygon_centroid(poly)
+        assert p["rotation"] == polygon_rotation(poly)
+        assert np.array_equal(p["bbox"], [poly.min(axis=0), poly.max(axis=0)])
+        edges = np.roll(poly, 1, axis=0) - poly
+        assert p["perimeter"] == pytest.approx(np.hypot(edges[:, 0], edges[:, 1]).sum())
+        assert polygon_properties(poly).perimeter == p["perimeter"]
+
+
+@pytest.mark.parametrize('n_threads', [None, 3])
+def test_orient_polygons(n_threads):
+    # square with a hole, and an island in the hole, all going the wrong way
+    rings = [square_ccw[::-1], hole_cw[::-1], island_ccw[::-1], other_ccw]
+    coords = np.array(sum(rings, []))
+    ring_offsets = np.cumsum([0] + [len(r) for r in rings])
+    part_offsets = [0, 2, 3, 4]
+    orig = coords.copy()
+
+    flipped = orient_polygons(coords, ring_offsets, part_offsets, n_threads=n_threads)
+
+    assert flipped == 3
+    assert list(polygons_rotation(coords, ring_offsets)) == [False, True, False, False]
+    # same vertices, just reversed
+    assert np.array_equal(coords[:ring_offsets[3]],
+                          np.concatenate([orig[s:e][::-1] for s, e
+                                          in zip(ring_offsets[:3], ring_offsets[1:4])]))
+    assert np.array_equal(coords[ring_offsets[3]:], orig[ring_offsets[3]:])
+    # doing it again doesn't change anything
+    assert orient_polygons(coords, ring_offsets, part_offsets, n_threads=n_threads) == 0
+
+    # all exteriors, the other way around
+    assert orient_polygons(coords, ring_offsets, exterior_ccw=False) == 3
+    assert all(polygons_rotation(coords, ring_offsets))
+
+
+def test_orient_polygons_bad_input():
+    coords = np.array(square_ccw[::-1])
+    with pytest.raises(TypeError):
+        orient_polygons(square_ccw, [0, 5])
+    with pytest.raises(ValueError):
+        orient_polygons(coords.astype(np.float32), [0, 5])
+    with pytest.raises(ValueError):
+        orient_polygons(np.asfortranarray(coords), [0, 5])
+    with pytest.raises(ValueError):
+        orient_polygons(coords, [0, 6])
+    with pytest.raises(ValueError):
+        orient_polygons(coords, [0, 5], [0, 2])
+    # nothing is changed on error
+    assert np.array_equal(coords, square_ccw[::-1])
+
+
+def test_rotation_convex():
+    square = np.array(square_ccw)
+    assert polygon_rotation(square, convex=True) == 0
+    assert polygon_rotation(square[::-1], convex=True) == 1
+    # starting with collinear vertices
+    assert polygon_rotation([(0, 0), (1, 0), (2, 0), (2, 2), (0, 2)], convex=True) == 0
+    with pytest.raises(ValueError):
+        polygon_rotation([(0, 0), (1, 1), (2, 2)], convex=True)
+
+
+@pytest.mark.parametrize('poly, result', [(square_ccw, True),
+                                          (square_ccw[::-1], True),
+                                          (poly1, True),
+                                          (np.c_[np.cos(np.linspace(0, 6, 100)),
+                                                 np.sin(np.linspace(0, 6, 100))], True),
+                                          ([(0, 0), (1, 0), (2, 0), (2, 2), (0, 2)], True),
+                                          (u_shape, False),
+                                          (gulf_of_maine, False),
+                                          # a pentagram turns the same way at every vertex
+                                          (np.c_[np.cos(np.arange(5) * 4 * np.pi / 5),
+                                                 np.sin(np.arange(5) * 4 * np.pi / 5)], False),
+                                          ([(0, 0), (1, 1), (2, 2)], False),
+                                          ([(0, 0), (1, 0)], False),
+                                          ([(0, 0), (1, 0), (np.nan, 1)], False),
+                                          ])
+def test_polygon_is_convex(poly, result):
+    assert polygon_is_convex(poly) is result
+
+
+@pytest.mark.parametrize('nvert', [4, 40, 1000])
+def test_polygon_inside_convex(nvert):
+    theta = np.linspace(0, 2 * np.pi, nvert, endpoint=False)
+    poly = np.c_[10 * np.cos(theta), 7 * np.sin(theta)]
+    points = np.r_[random_points(10_000), poly, [(np.nan, 0.0), (0.0, np.nan)]]
+    expected = np.zeros(len(points), dtype=bool)
+    for i in range(0, len(points), 50):  # small batches don't use the convex path
+        expected[i:i + 50] = polygon_inside(poly, points[i:i + 50])
+
+    assert np.array_equal(polygon_inside(poly, points), expected)
+    assert np.array_equal(polygon_inside(poly, points, convex=True), expected)
+    assert np.array_equal(polygon_inside(poly, points, convex=False), expected)
+    assert np.array_equal(polygon_inside(poly, points, n_threads=3, convex=True), expected)
+
+
+def test_polygon_inside_monotone():
+    """
+    the convex path works for anything that goes up then down in y
+    """
+    zigzag = np.array([(0.0, 0.0), (2.0, 1.0), (1.0, 2.0), (3.0, 3.0),
+                       (3.0, 3.0), (5.0, 3.0), (4.0, 1.5), (6.0, 0.0)])
+    points = random_points(1000) / 3.0
+
+    assert np.array_equal(polygon_inside(zigzag, points, convex=True),
+                          polygon_inside(zigzag, points, convex=False))
+    with pytest.raises(ValueError):
+        polygon_inside(u_shape, points, convex=True)
+
+
 def test_rotation_zero_area():
     poly = [(5.0, 5.0), (1.0, 3.1), (5.0, 5.0)]
     with pytest.raises(ValueError):
@@ -143,13 +895,24 @@ def test_polygon_is_simple_yes(poly, name, num_parallel_threads):
 #    assert False
 
 intersecting_polys = [
-               # ([(5, 5), (15, 15), (5, 15),  (15, 5)], 'AnX'), # simple square
+               ([(5, 5), (15, 15), (5, 15),  (15, 5)], 'AnX'), # simple square
                ([[-2., -7.], [-6., -3.], [-2., -7.]],  "zero_area_triangle"),  # triangle can only be bad if points repeat.
-               # ([(0, -100), (-100, 0), (100, 0), (0, 100)], "diamond"),  # diamond around origin
-               # # # more complicated, with the centroid outside the polygon looks right, so preserved the result
-               # ([(-700, 1000), (800, 1010), (1200, 200), (1100, 900), (-600, 890), (-1300, -20)], 'complex'),
-               # # duplicated point
-               # ([(5, 5), (5, 15), (5, 15), (15, 15), (15, 5)], "duplicated_point"),
+               ([(0, -100), (-100, 0), (100, 0), (0, 100)], "diamond"),  # diamond around origin
+               # more complicated, with the centroid outside the polygon looks right, so preserved the result
+               ([(-700, 1000), (800, 1010), (1200, 200), (1100, 900), (-600, 890), (-1300, -20)], 'complex'),
+               # duplicated point
+               ([(5, 5), (5, 15), (5, 15), (15, 15), (15, 5)], "duplicated_point"),
+               # vertex touching another edge
+               ([(0, 0), (10, 0), (10, 10), (5, 0), (0, 10)], "touching_vertex"),
+               # two vertices in the same place
+               ([(0, 0), (10, 0), (5, 5), (10, 10), (0, 10), (5, 5)], "figure_eight"),
+               # spike that goes back along the edge it came from
+               ([(0, 0), (10, 0), (5, 0), (5, 10)], "fold_back"),
+               # overlapping collinear edges
+               ([(0, 0), (4, 0), (4, 2), (2, 2), (2, 0), (6, 0), (6, 4), (0, 4)],
+                "collinear_overlap"),
+               # vertical edges crossing at the sweep line
+               ([(0, 0), (0, 10), (5, 10), (5, 5), (-5, 5), (-5, 0)], "vertical"),
                 ]
 
 @pytest.mark.parametrize(('poly', 'name'), intersecting_polys)
@@ -163,6 +926,172 @@ def test_polygon_is_simple_no(poly, name, num_parallel_threads):
     assert not polygon_is_simple(poly)
     # assert False
 
+def test_polygon_is_simple_collinear():
+    """
+    edges on the same line that don't overlap are OK
+    """
+    assert polygon_is_simple([(0, 0), (1, 0), (1, 1), (2, 1), (2, 0), (3, 0), (3, 2), (0, 2)])
+    # and so are neighboring edges that keep going the same way
+    assert polygon_is_simple([(0, 0), (1, 0), (2, 0), (2, 2), (0, 2), (0, 1)])
+
+
+def test_polygon_is_simple_closed():
+    poly = wiggly_polygon(50)
+    assert polygon_is_simple(poly)
+    assert polygon_is_simple(np.r_[poly, poly[:1]])
+
+
+def naive_is_simple(poly):
+    """
+    check every pair of edges -- O(N^2)
+    """
+    poly = np.asarray(poly, dtype=np.float64)
+    n = len(poly)
+    for i in range(n):
+        for j in range(i + 2, n):
+            if i == 0 and j == n - 1:
+                continue
+            if segment_cross((poly[i], poly[(i + 1) % n]), (poly[j], poly[(j + 1) % n])):
+                return False
+    return True
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_polygon_is_simple_random(seed):
+    rng = np.random.default_rng(seed)
+    # few enough vertices that some of them are simple
+    poly = rng.random((rng.integers(4, 8), 2))
+    assert polygon_is_simple(poly) == naive_is_simple(poly)
+
+    poly = wiggly_polygon(200, seed=seed)
+    assert polygon_is_simple(poly)
+    # move a vertex across the middle
+    poly[seed] = -poly[seed]
+    assert polygon_is_simple(poly) == naive_is_simple(poly)
+
+
+def test_polygon_is_simple_big():
+    assert polygon_is_simple(gulf_of_maine)
+    poly = wiggly_polygon(100_000)
+    assert polygon_is_simple(poly)
+    poly[10] = poly[50_000]
+    assert not polygon_is_simple(poly)
+
+
+def test_find_self_intersections_bowtie():
+    pairs, points = find_self_intersections([(5, 5), (15, 15), (5, 15), (15, 5)])
+
+    assert pairs.tolist() == [[0, 2]]
+    assert points.tolist() == [[10.0, 10.0]]
+
+
+def test_find_self_intersections_none():
+    pairs, points = find_self_intersections(wiggly_polygon(1000))
+
+    assert pairs.shape == (0, 2)
+    assert points.shape == (0, 2)
+
+
+def test_find_self_intersections_polyline():
+    # a Z with another segment back across the middle
+    line = [(0, 0), (10, 0), (0, 10), (10, 10), (0, 5)]
+    pairs, points = find_self_intersections(line, closed=False)
+
+    assert pairs.tolist() == [[1, 3]]
+    assert np.allclose(points, [(10 / 3, 20 / 3)])
+
+    # just the Z doesn't cross, until it's closed
+    pairs, _ = find_self_intersections(line[:4], closed=False)
+    assert len(pairs) == 0
+    pairs, points = find_self_intersections(line[:4])
+    assert pairs.tolist() == [[1, 3]]
+    assert np.allclose(points, [(5, 5)])
+
+
+def test_find_self_intersections_degenerate():
+    # figure eight at a vertex: all four segments touch there
+    pairs, points = find_self_intersections([(0, 0), (10, 0), (5, 5), (10, 10), (0, 10), (5, 5)])
+    assert pairs.tolist() == [[1, 4], [1, 5], [2, 4], [2, 5]]
+    assert np.all(points == (5, 5))
+
+    # overlapping collinear segments, at the first point they share
+    poly = [(0, 0), (4, 0), (4, 2), (2, 2), (2, 0), (6, 0), (6, 4), (0, 4)]
+    pairs, points = find_self_intersections(poly)
+    assert pairs.tolist() == [[0, 3], [0, 4], [1, 4]]
+    assert points.tolist() == [[2.0, 0.0], [2.0, 0.0], [4.0, 0.0]]
+
+    # fold back, at the shared vertex -- and the next one starts on the first
+    pairs, points = find_self_intersections([(0, 0), (10, 0), (5, 0), (5, 10)])
+    assert pairs.tolist() == [[0, 1], [0, 2]]
+    assert points.tolist() == [[10.0, 0.0], [5.0, 0.0]]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_find_self_intersections_random(seed):
+    """
+    random polygons -- lots of crossings
+    """
+    rng = np.random.default_rng(seed)
+    poly = rng.random((50, 2))
+    n = len(poly)
+
+    pairs, points = find_self_intersections(poly)
+
+    expected = [[i, j] for i in range(n) for j in range(i + 2, n)
+                if not (i == 0 and j == n - 1)
+                and segment_cross((poly[i], poly[(i + 1) % n]), (poly[j], poly[(j + 1) % n]))]
+    assert pairs.tolist() == expected
+    assert polygon_is_simple(poly) == (len(pairs) == 0)
+    # the points are on both segments
+    for (i, j), pt in zip(pairs, points):
+        for s in (i, j):
+            start, end = poly[s], poly[(s + 1) % n]
+            assert np.allclose(np.linalg.norm(pt - start) + np.linalg.norm(end - pt),
+                               np.linalg.norm(end - start))
+
+
+@pytest.mark.parametrize('n_threads', [None, 3])
+def test_validate_polygons(n_threads):
+    polys = [square_ccw,
+             hole_cw[:-1],
+             [(0, 0), (1, 1)],
+             [(0, 0), (1, 1), (2, 2)],
+             [(5, 5), (5, 15), (5, 15), (15, 15), (15, 5)],
+             [(5, 5), (15, 15), (5, 15), (15, 5), (5, 5)],
+             [(0, 0), (1, 0), (np.nan, 1)],
+             [(0, 0), (1, 0), (1, np.inf)],
+             ]
+
+    flags = validate_polygons(polys, n_threads=n_threads)
+
+    assert flags.dtype == np.uint8
+    assert flags.tolist() == [0,
+                              0,
+                              TOO_FEW_VERTICES | ZERO_AREA | NOT_SIMPLE,
+                              ZERO_AREA | NOT_SIMPLE,
+                              REPEATED_VERTICES | NOT_SIMPLE,
+                              ZERO_AREA | NOT_SIMPLE,
+                              NOT_FINITE | NOT_SIMPLE,
+                              NOT_FINITE | NOT_SIMPLE,
+                              ]
+
+
+@pytest.mark.parametrize('n_threads', [None, 4])
+def test_validate_polygons_same_as_one_at_a_time(n_threads):
+    rng = np.random.default_rng(5)
+    polys = ([wiggly_polygon(n, seed=n) for n in range(3, 200)]
+             + [rng.random((n, 2)) for n in range(3, 10)] * 20)
+    coords = np.concatenate(polys)
+    offsets = np.cumsum([0] + [len(p) for p in polys])
+
+    flags = validate_polygons(coords, offsets, n_threads=n_threads)
+
+    assert len(flags) == len(polys)
+    for poly, flag in zip(polys, flags):
+        assert bool(flag & NOT_SIMPLE) == (not polygon_is_simple(poly))
+        assert bool(flag & ZERO_AREA) == (polygon_area(poly) == 0.0)
+
+
 # plotting utility
 def plot_poly(poly, filename):
     poly = np.asarray(poly)